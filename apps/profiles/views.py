@@ -3,6 +3,7 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib import messages
 from .models import UserProfile
 from .forms import UserForm, UserProfileForm
+from apps.projects.roles import get_roles
 
 @login_required
 def edit_profile(request, pk):
@@ -27,6 +28,6 @@ def edit_profile(request, pk):
     context = {
         'u_form': u_form,
         'p_form': p_form,
-        'is_teacher': user.groups.filter(name='Teacher').exists(),
+        'is_teacher': get_roles(user).is_teacher,
     }
     return render(request, 'users/edit_profile.html', context)
@@ -2,8 +2,9 @@ from django.contrib import admin
 from .models import (
     ScoringScheme, Project, ControlCheck,
     LeaderEvaluation, OpponentEvaluation,
-    UserPreferences
+    UserPreferences, ExportJob
 )
+from .search import search_projects
 
 @admin.register(UserPreferences)
 class UserPreferencesAdmin(admin.ModelAdmin):
@@ -24,6 +25,12 @@ class ProjectAdmin(admin.ModelAdmin):
     list_filter = ('status', 'scheme', 'delayed_submission_date')
     search_fields = ('title', 'description')
 
+    def get_search_results(self, request, queryset, search_term):
+        # Fulltext (search.py) místo icontains přes celé popisy
+        if not search_term:
+            return queryset, False
+        return search_projects(queryset, search_term), False
+
 @admin.register(ControlCheck)
 class ControlCheckAdmin(admin.ModelAdmin):
     list_display = ('project', 'date', 'evaluation')
@@ -37,3 +44,10 @@ class LeaderEvalAdmin(admin.ModelAdmin):
 @admin.register(OpponentEvaluation)
 class OpponentEvalAdmin(admin.ModelAdmin):
     list_display = ('project', 'area1_points', 'area2_points')
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'user', 'status', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('user__username',)
@@ -0,0 +1,15 @@
+from django.core.checks import Warning, register
+from .docx_templates import registry
+
+
+@register()
+def check_docx_templates(app_configs, **kwargs):
+    """Upozorní při startu na chybějící DOCX šablony pro exporty."""
+    return [
+        Warning(
+            f"Chybí DOCX šablona '{name}'.",
+            hint=f"Export, který ji používá, nebude dostupný. Očekávané umístění: {registry.path(name)}",
+            id='projects.W001',
+        )
+        for name in registry.missing()
+    ]
@@ -0,0 +1,152 @@
+"""
+Statistiky připojení k databázi v jednom workeru (procesu).
+
+DatabaseMetricsMiddleware sleduje primární DB během requestu: signál
+connection_created (signals.py) označí nové spojení - jinak request použil
+trvalé spojení z minulého requestu (CONN_MAX_AGE); execute_wrapper změří
+první dotaz requestu. Request bez dotazů spojení nepřevezme (u poolu ho
+nevypůjčí) a započte se jen jako "idle". Samotné otevření spojení Django
+měřit nedovolí - jeho cena je vidět na době prvního dotazu a celého
+requestu (connection_benchmark), u poolu ve statistikách poolu.
+Údaj jde do hlavičky Server-Timing (db-first), součty za worker se každých
+DB_METRICS_LOG_EVERY requestů zalogují jako JSON do "apps.projects.db_metrics".
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+_request = ContextVar('db_metrics_request', default=None)
+
+
+class ConnectionStats:
+    """Součty za worker; vlákna workeru sdílí jednu instanci."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.connects = 0  # nové spojení (u poolu převzetí z poolu)
+            self.reuses = 0  # trvalé spojení z minulého requestu
+            self.idle = 0  # request bez dotazu do DB
+            self.first_query_seconds = 0.0
+
+    def record(self, reused, seconds):
+        """reused=None: request databázi nepoužil."""
+        with self._lock:
+            self.requests += 1
+            if reused is None:
+                self.idle += 1
+            elif reused:
+                self.reuses += 1
+            else:
+                self.connects += 1
+            self.first_query_seconds += seconds
+            return self.requests
+
+    def as_dict(self, conn=None):
+        with self._lock:
+            used = self.connects + self.reuses
+            values = {
+                'pid': os.getpid(),
+                'requests': self.requests,
+                'connects': self.connects,
+                'reuses': self.reuses,
+                'idle': self.idle,
+                'first_query_ms': round(self.first_query_seconds * 1000, 1),
+                'first_query_ms_per_request': round(self.first_query_seconds * 1000 / used, 3) if used else None,
+            }
+        values['pool'] = pool_stats(conn or connections[DEFAULT_DB_ALIAS])
+        return values
+
+
+stats = ConnectionStats()
+
+
+def pool_stats(conn):
+    """Statistiky psycopg_pool pro spojení s OPTIONS['pool'], jinak None."""
+    pool = getattr(conn, 'pool', None)  # jen PostgreSQL backend
+    if pool is None:
+        return None
+    values = pool.get_stats()
+    return {
+        'size': values.get('pool_size', 0),
+        'available': values.get('pool_available', 0),
+        'connections': values.get('connections_num', 0),
+        'connect_ms': values.get('connections_ms', 0),
+        'connection_errors': values.get('connections_errors', 0),
+        'checkouts': values.get('requests_num', 0),
+        'waiting': values.get('requests_waiting', 0),
+        'wait_ms': values.get('requests_wait_ms', 0),
+        'returned_bad': values.get('returns_bad', 0),
+    }
+
+
+class RequestUsage:
+    """Použití primární DB v jednom requestu."""
+
+    def __init__(self):
+        self.new_connection = False
+        self.first_query = None  # doba prvního dotazu v s
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        if self.first_query is not None:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.first_query = time.perf_counter() - started
+
+    @property
+    def reused(self):
+        """True/False podle původu spojení, None bez použití DB."""
+        if self.new_connection:
+            return False
+        return None if self.first_query is None else True
+
+
+def connection_opened(connection):
+    """Handler signálu connection_created: request otevřel (převzal z poolu) nové spojení."""
+    usage = _request.get()
+    if usage is not None and connection.alias == DEFAULT_DB_ALIAS:
+        usage.new_connection = True
+
+
+class DatabaseMetricsMiddleware:
+    """Sleduje spojení s DB během requestu a přidá ho do hlavičky Server-Timing."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        conn = connections[DEFAULT_DB_ALIAS]
+        usage = RequestUsage()
+        token = _request.set(usage)
+        try:
+            with conn.execute_wrapper(usage.execute_wrapper):
+                response = self.get_response(request)
+        finally:
+            _request.reset(token)
+
+        reused, seconds = usage.reused, usage.first_query or 0.0
+        count = stats.record(reused, seconds)
+        if reused is not None:
+            entry = f'db-first;dur={seconds * 1000:.1f};desc="{"reused" if reused else "new"}"'
+            if response.has_header('Server-Timing'):
+                entry = f"{response['Server-Timing']}, {entry}"
+            response['Server-Timing'] = entry
+
+        every = settings.DB_METRICS_LOG_EVERY
+        if every and count % every == 0:
+            logger.info(json.dumps(stats.as_dict(conn)))
+        return response
@@ -0,0 +1,133 @@
+"""
+Čtení přehledů a exportů z repliky databáze (alias "replica").
+
+Replika je volitelná (DB_REPLICA_HOST v nastavení). Exportní view se
+označí dekorátorem @read_from_replica, uvnitř kterého ReplicaRouter posílá
+čtení na repliku; zápisy jdou vždy do primární databáze, session také.
+
+Replika může za primární databází o pár sekund zaostávat. Kdo právě něco
+uložil, musí svou změnu vidět i v exportu - ReplicaLagMiddleware proto po
+requestu, který zapisoval, nastaví cookie a po dobu DB_REPLICA_LAG_SECONDS
+se tomuto uživateli čte z primární databáze.
+"""
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import FileResponse, StreamingHttpResponse
+
+REPLICA = 'replica'
+LAG_COOKIE = 'db_recent_write'
+
+# Aplikace, které se čtou vždy z primární databáze
+PRIMARY_APPS = {'sessions'}
+
+# None = bez určení, True = replika, False = vynuceně primární databáze
+_use_replica = ContextVar('use_replica', default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def lag_seconds():
+    return settings.DB_REPLICA_LAG_SECONDS
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and model._meta.app_label not in PRIMARY_APPS:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        # I objekt načtený z repliky se ukládá do primární databáze
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replika má stejná data jako primární databáze
+        return True
+
+
+@contextmanager
+def read_replica(enabled=True):
+    """
+    Čtení uvnitř bloku jdou na repliku (pokud je nastavená a enabled).
+    read_replica(False) vynutí primární databázi i pro vnořené bloky
+    (např. view s @read_from_replica volané z benchmarku nebo testu).
+    """
+    if not replica_configured() or _use_replica.get() is False:
+        yield
+        return
+    token = _use_replica.set(bool(enabled))
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def recently_wrote(request):
+    """Zapisoval uživatel v tomto requestu nebo před méně než DB_REPLICA_LAG_SECONDS?"""
+    writes = getattr(request, '_db_writes', None)
+    if writes is not None and writes.wrote:
+        return True
+    try:
+        written_at = float(request.COOKIES[LAG_COOKIE])
+    except (KeyError, ValueError):
+        return False
+    return time.time() - written_at < lag_seconds()
+
+
+def _stream(content, enabled):
+    # Streamovaná odpověď se generuje až po návratu z view - každý kus zvlášť v read_replica()
+    iterator = iter(content)
+    while True:
+        with read_replica(enabled):
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+        yield chunk
+
+
+def read_from_replica(view):
+    """Dekorátor exportního view - čte z repliky, pokud uživatel právě nezapisoval."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        enabled = not recently_wrote(request)
+        with read_replica(enabled):
+            response = view(request, *args, **kwargs)
+        if isinstance(response, StreamingHttpResponse) and not isinstance(response, FileResponse):
+            response.streaming_content = _stream(response.streaming_content, enabled)
+        return response
+    return wrapper
+
+
+class _WriteDetector:
+    def __init__(self):
+        self.wrote = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.wrote and sql.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            self.wrote = True
+        return execute(sql, params, many, context)
+
+
+class ReplicaLagMiddleware:
+    """Po requestu, který zapsal do primární databáze, nastaví cookie LAG_COOKIE."""
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._db_writes = writes = _WriteDetector()
+        with connections[DEFAULT_DB_ALIAS].execute_wrapper(writes):
+            response = self.get_response(request)
+        if writes.wrote:
+            response.set_cookie(LAG_COOKIE, f"{time.time():.3f}", max_age=lag_seconds(), httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,431 @@
+"""
+Generování dokumentů k jednotlivým projektům (posudky, konzultační list,
+zadání, závěrečný posudek). render_leader_eval, render_opponent_eval,
+render_consultation_list, render_assignment a render_final_report vrací
+otevřený hotový soubor z cache exportů (export_cache.py), takže je mohou
+používat jak jednotlivé exportní views, tak hromadný export do ZIPu.
+Soubor zavírá volající.
+
+Přehled projektu (render_project_docx, render_project_detail_pdf) a spojené
+dokumenty (render_merged*) se necachují a vrací obsah souboru (bytes).
+"""
+import hashlib
+import io
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from docx import Document
+from docx.shared import Cm
+from docxcompose.composer import Composer
+from docxtpl import InlineImage
+from .docx_templates import get_docx_template, registry
+from .export_cache import cache, make_key, project_namespace
+from .pdf import renderer, render_pdf
+from .signatures import SIGNATURE_WIDTH_CM, signature_image
+from .timing import stage
+
+DOCX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+PDF_CONTENT_TYPE = 'application/pdf'
+
+DOCUMENT_TYPE_CHOICES = [
+    ('leader_eval', 'Posudek vedoucího (DOCX)'),
+    ('opponent_eval', 'Posudek oponenta (DOCX)'),
+    ('consultation_list', 'Konzultační list (DOCX)'),
+    ('final_report', 'Závěrečný posudek (PDF)'),
+]
+
+FINAL_REPORT_STYLES = ['final_report.css']
+
+GRADE_TABLE = [
+    {"max": 100, "min": 85, "grade": "výborně"},
+    {"max": 84, "min": 70, "grade": "chvalitebně"},
+    {"max": 69, "min": 50, "grade": "dobře"},
+    {"max": 49, "min": 35, "grade": "dostatečně"},
+    {"max": 34, "min": 0, "grade": "nedostatečně"},
+]
+
+
+class DocumentNotAvailable(Exception):
+    """Dokument pro projekt nelze vygenerovat (chybí posudek, datum apod.)."""
+
+
+def _person_name(user):
+    """Titul + jméno + příjmení uživatele (vedoucí, oponent)."""
+    return f"{user.userprofile.title} {user.first_name} {user.last_name}"
+
+
+def _sorted_controls(project):
+    # Pracujeme se seznamem, aby se dal využít případný prefetch kontrol
+    return sorted(project.controls.all(), key=lambda c: c.date)
+
+
+def _render_docx(project, template_name, context, signature=None):
+    """
+    Vyrenderuje DOCX šablonu přes cache exportů a vrátí otevřený soubor.
+    Klíč tvoří verze šablony, celý kontext a hash připraveného podpisu.
+    """
+    signature_hash = hashlib.sha256(signature).hexdigest() if signature else None
+    key = make_key(template_name, registry.version(template_name), context, signature_hash)
+
+    def render():
+        with stage('render'):
+            doc = get_docx_template(template_name)
+            # Podpis se v šabloně odkazuje přes proměnnou "signature"
+            full_context = dict(context, signature=InlineImage(
+                doc, io.BytesIO(signature), width=Cm(SIGNATURE_WIDTH_CM)) if signature else "")
+            doc.render(full_context)
+            buffer = io.BytesIO()
+            doc.save(buffer)
+            return buffer.getvalue()
+
+    return cache.open_or_render(project_namespace(project.pk), key, '.docx', render)
+
+
+def leader_eval_context(project):
+    leader_eval = getattr(project, 'leader_eval', None)
+    if leader_eval is None:
+        raise DocumentNotAvailable("Posudek vedoucího neexistuje.")
+
+    submission_status = leader_eval.submission_status
+
+    return {
+        'student_name': f"{project.student.first_name} {project.student.last_name}",
+        'class_name': project.student.userprofile.class_name,
+        'school_year': project.scheme.year if project.scheme else "N/A",
+        'leader_name': project.external_leader or _person_name(project.leader),
+        'project_title': project.title,
+        'area1_text': leader_eval.area1_text,
+        'area1_points': leader_eval.area1_points,
+        'area2_text': leader_eval.area2_text,
+        'area2_points': leader_eval.area2_points,
+        'area3_text': leader_eval.area3_text,
+        'area3_points': leader_eval.area3_points,
+        'total_points': leader_eval.area1_points + leader_eval.area2_points + leader_eval.area3_points,
+        'max_points': (
+            project.scheme.leader_area1_max +
+            project.scheme.leader_area2_max +
+            project.scheme.leader_area3_max
+        ) if project.scheme else "N/A",
+        'review_date': leader_eval.export_date.strftime('%d.%m.%Y') if leader_eval.export_date else '',
+        # Zaškrtnutí příslušného pole
+        'submitted_on_time': 'X' if submission_status == 'on_time' else '',
+        'submitted_late': 'X' if submission_status == 'late' else '',
+        'not_submitted': 'X' if submission_status == 'not_submitted' else '',
+    }
+
+
+def render_leader_eval(project, signer=None):
+    """Posudek vedoucího jako DOCX. Podpis se vkládá jen u interního vedoucího."""
+    context = leader_eval_context(project)
+    # Externímu vedoucímu podpis nevkládáme
+    signature = None if project.external_leader else signature_image(signer)
+    return _render_docx(project, "leader_eval.docx", context, signature)
+
+
+def opponent_eval_context(project):
+    opponent_eval = getattr(project, 'opponent_eval', None)
+    if opponent_eval is None:
+        raise DocumentNotAvailable("Posudek oponenta neexistuje.")
+
+    return {
+        'student_name': f"{project.student.first_name} {project.student.last_name}",
+        'class_name': project.student.userprofile.class_name,
+        'school_year': project.scheme.year if project.scheme else "N/A",
+        'opponent_name': project.external_opponent or _person_name(project.opponent),
+        'project_title': project.title,
+        'area1_text': opponent_eval.area1_text,
+        'area1_points': opponent_eval.area1_points,
+        'area2_text': opponent_eval.area2_text,
+        'area2_points': opponent_eval.area2_points,
+        'total_points': opponent_eval.area1_points + opponent_eval.area2_points,
+        'max_points': (
+            project.scheme.opponent_area1_max +
+            project.scheme.opponent_area2_max
+        ) if project.scheme else "N/A",
+        'review_date': opponent_eval.export_date.strftime('%d.%m.%Y') if opponent_eval.export_date else '',
+    }
+
+
+def render_opponent_eval(project, signer=None):
+    """Posudek oponenta jako DOCX. Podpis se vkládá jen u interního oponenta."""
+    context = opponent_eval_context(project)
+    signature = None if project.external_opponent else signature_image(signer)
+    return _render_docx(project, "opponent_eval.docx", context, signature)
+
+
+def consultation_list_context(project, handover_date):
+    if handover_date is None:
+        raise DocumentNotAvailable("Není vyplněno datum odevzdání projektu.")
+
+    controls = _sorted_controls(project)[:3]  # První 3 kontroly
+
+    context = {
+        'student_name': f"{project.student.first_name} {project.student.last_name}",
+        'class_name': project.student.userprofile.class_name,
+        'school_year': project.scheme.year if project.scheme else "N/A",
+        'project_title': project.title,
+        'handover_date': handover_date.strftime('%d.%m.%Y'),
+    }
+    for i in range(3):
+        control = controls[i] if len(controls) > i else None
+        context[f'control_{i + 1}_date'] = control.date.strftime('%d.%m.%Y') if control else "N/A"
+        context[f'control_{i + 1}_eval'] = control.evaluation if control else "N/A"
+        context[f'control_{i + 1}_desc'] = control.content if control else "N/A"
+    return context
+
+
+def render_consultation_list(project, handover_date, signer=None):
+    """Konzultační list (první 3 kontroly) jako DOCX."""
+    context = consultation_list_context(project, handover_date)
+    return _render_docx(project, "consultation_list.docx", context, signature_image(signer))
+
+
+def render_assignment(project):
+    """Oficiální zadání práce jako DOCX (šablona podle oboru žáka)."""
+    leader = f'{project.leader.userprofile.title} {project.leader.first_name} {project.leader.last_name}' if project.leader else ""
+    template = "assignment_IT.docx" if project.student.userprofile.study_branch == "IT" else "assignment_E.docx"
+
+    context = {
+        'student_name': f"{project.student.first_name} {project.student.last_name}",
+        'class_name': project.student.userprofile.class_name,
+        'school_year': project.scheme.year if project.scheme else "N/A",
+        'project_title': project.title,
+        'assignment': project.assignment,
+        'leader': leader,
+    }
+    return _render_docx(project, template, context)
+
+
+def render_project_docx(project):
+    """Přehled projektu (zadání, kontroly, posudky) jako DOCX podle oboru žáka, vrací obsah souboru."""
+    # Zjištění oboru studenta
+    student_profile = getattr(project.student, 'userprofile', None)
+    branch = student_profile.study_branch if student_profile else 'E'  # pokud by student neměl profil, fallback = 'E'
+
+    # Podle oboru vybereme šablonu
+    template_name = "zadani_projektu_IT.docx" if branch == 'IT' else "zadani_projektu_E.docx"
+    try:
+        doc = get_docx_template(template_name)
+    except FileNotFoundError:
+        raise DocumentNotAvailable(f"Chybí šablona dokumentu ({template_name}).")
+
+    # Připrav data pro šablonu
+    class_name = student_profile.class_name if student_profile else ""
+
+    # Získání kontrol
+    controls_data = []
+    for c in project.controls.all():
+        controls_data.append({
+            'date': c.date.strftime("%d.%m.%Y"),  # formátování
+            'content': c.content,
+            'evaluation': c.evaluation,
+        })
+
+    leader_eval = project.leader_eval if hasattr(project, 'leader_eval') else None
+    opponent_eval = project.opponent_eval if hasattr(project, 'opponent_eval') else None
+
+    context = {
+        'student_name': f"{project.student.first_name} {project.student.last_name}",
+        'class_name': class_name,
+        'leader_name': project.leader.userprofile.title + " " + project.leader.get_full_name() if project.leader else "",
+        'opponent_name': project.opponent.userprofile.title + " " + project.opponent.get_full_name() if project.opponent else "",
+        'project_title': project.title,
+        'project_description': project.description,
+
+        'controls': controls_data,
+
+        'leader_eval': {
+            'area1_text': leader_eval.area1_text if leader_eval else "",
+            'area1_points': leader_eval.area1_points if leader_eval else 0,
+            # area2, area3 ...
+        } if leader_eval else {},
+        'opponent_eval': {
+            'area1_text': opponent_eval.area1_text if opponent_eval else "",
+            'area1_points': opponent_eval.area1_points if opponent_eval else 0,
+            # area2 ...
+        } if opponent_eval else {},
+    }
+
+    # Vygenerujeme soubor
+    with stage('render'):
+        doc.render(context)
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        return buffer.getvalue()
+
+
+def render_project_detail_pdf(project):
+    """Detail projektu s milníky jako PDF, vrací obsah souboru."""
+    context = {
+        'student_name': f"{project.student.first_name} {project.student.last_name}",
+        'class_name': project.student.userprofile.class_name,
+        'project_title': project.title,
+        'assignment': project.assignment,
+        'milestones': project.milestones.all()
+    }
+    with stage('template'):
+        html_string = render_to_string('projects/pdf_project_detail.html', context)
+    return render_pdf(html_string, ['project_detail.css'])
+
+
+def final_report_context(project):
+    """Kontext pro šablonu pdf/final_report.html."""
+    # Student
+    student_name = ""
+    class_name = ""
+    if project.student:
+        student_name = f"{project.student.first_name} {project.student.last_name}"
+        if hasattr(project.student, 'userprofile'):
+            class_name = project.student.userprofile.class_name or ""
+
+    leader_name = _person_name(project.leader) if project.leader else ""
+    opponent_name = _person_name(project.opponent) if project.opponent else ""
+
+    leader_eval = getattr(project, 'leader_eval', None)
+    opponent_eval = getattr(project, 'opponent_eval', None)
+
+    leader_area1_points = leader_eval.area1_points if leader_eval else 0
+    leader_area2_points = leader_eval.area2_points if leader_eval else 0
+    leader_area3_points = leader_eval.area3_points if leader_eval else 0
+    opponent_area1_points = opponent_eval.area1_points if opponent_eval else 0
+    opponent_area2_points = opponent_eval.area2_points if opponent_eval else 0
+
+    total_points = (leader_area1_points + leader_area2_points + leader_area3_points
+                    + opponent_area1_points + opponent_area2_points)
+
+    scheme = project.scheme
+    max_points = (scheme.leader_area1_max + scheme.leader_area2_max + scheme.leader_area3_max
+                  + scheme.opponent_area1_max + scheme.opponent_area2_max)
+
+    return {
+        "project": project,
+        "student_name": student_name,
+        "class_name": class_name,
+        "leader_name": leader_name,
+        "opponent_name": opponent_name,
+        "delivery_date": project.delivery_work_date.strftime('%d.%m.%Y') if project.delivery_work_date else "",
+        "documentation_date": project.delivery_documentation_date.strftime('%d.%m.%Y') if project.delivery_documentation_date else "",
+        "leader_area1_text": leader_eval.area1_text if leader_eval else "",
+        "leader_area2_text": leader_eval.area2_text if leader_eval else "",
+        "leader_area3_text": leader_eval.area3_text if leader_eval else "",
+        "leader_area1_points": leader_area1_points,
+        "leader_area2_points": leader_area2_points,
+        "leader_area3_points": leader_area3_points,
+        "opponent_area1_text": opponent_eval.area1_text if opponent_eval else "",
+        "opponent_area2_text": opponent_eval.area2_text if opponent_eval else "",
+        "opponent_area1_points": opponent_area1_points,
+        "opponent_area2_points": opponent_area2_points,
+        "total_points": total_points,
+        "max_points": max_points,
+        "grade_table": GRADE_TABLE,
+        "leader_max_1": scheme.leader_area1_max,
+        "leader_max_2": scheme.leader_area2_max,
+        "leader_max_3": scheme.leader_area3_max,
+        "opponent_max_1": scheme.opponent_area1_max,
+        "opponent_max_2": scheme.opponent_area2_max,
+        "defence_points": 100 - max_points,
+        "leader_questions": leader_eval.defense_questions if leader_eval else "",
+        "opponent_questions": opponent_eval.defense_questions if opponent_eval else "",
+    }
+
+
+def render_final_report(project):
+    """Závěrečný posudek (body vedoucího i oponenta) jako PDF, vrací otevřený soubor."""
+    if project.scheme is None:
+        raise DocumentNotAvailable("Projekt nemá přiřazené hodnoticí schéma.")
+    context = final_report_context(project)
+    with stage('template'):
+        html_string = render_to_string("pdf/final_report.html", context)
+    # HTML je levné vyrenderovat a obsahuje všechna data - jeho hash (spolu s verzí stylu) je klíčem do cache
+    key = make_key("pdf/final_report.html", html_string, renderer.style_version(FINAL_REPORT_STYLES[0]))
+    return cache.open_or_render(
+        project_namespace(project.pk), key, '.pdf',
+        lambda: render_pdf(html_string, FINAL_REPORT_STYLES)
+    )
+
+
+def document_filename(doc_type, project):
+    username = project.student.username if project.student else f"projekt_{project.pk}"
+    return {
+        'leader_eval': f"posudek_vedouciho_{username}.docx",
+        'opponent_eval': f"posudek_oponenta_{username}.docx",
+        'consultation_list': f"konzultacni_list_{username}.docx",
+        'final_report': f"zaverecny_posudek_{username}.pdf",
+    }[doc_type]
+
+
+def render_document(doc_type, project):
+    """
+    Vygeneruje dokument daného typu pro hromadný export, vrací otevřený soubor.
+    Podepisuje vždy ten, komu posudek patří (vedoucí / oponent projektu).
+    """
+    if project.student is None:
+        raise DocumentNotAvailable("Projekt nemá přiřazeného žáka.")
+    if doc_type == 'leader_eval':
+        return render_leader_eval(project, signer=project.leader)
+    if doc_type == 'opponent_eval':
+        return render_opponent_eval(project, signer=project.opponent)
+    if doc_type == 'consultation_list':
+        return render_consultation_list(project, project.delivery_work_date, signer=project.leader)
+    if doc_type == 'final_report':
+        return render_final_report(project)
+    raise ValueError(f"Neznámý typ dokumentu: {doc_type}")
+
+
+def merge_docx(files):
+    """Spojí více DOCX souborů do jednoho (docxcompose), každý začíná na nové stránce."""
+    with stage('render'):
+        composer = None
+        for f in files:
+            document = Document(f)
+            if composer is None:
+                composer = Composer(document)
+            else:
+                composer.doc.add_page_break()
+                composer.append(document)
+        buffer = io.BytesIO()
+        composer.save(buffer)
+        return buffer.getvalue()
+
+
+def render_merged_final_reports(projects):
+    """
+    Závěrečné posudky více projektů v jednom PDF. Posudky se spojí do jednoho
+    HTML dokumentu (každý na nové stránce), který WeasyPrint vysází jen jednou.
+    """
+    with stage('template'):
+        reports = [
+            mark_safe(render_to_string("pdf/final_report_body.html", final_report_context(project)))
+            for project in projects
+        ]
+        html_string = render_to_string("pdf/final_reports.html", {'reports': reports})
+    return render_pdf(html_string, FINAL_REPORT_STYLES)
+
+
+def render_merged(doc_type, projects):
+    """
+    Dokumenty daného typu pro všechny projekty spojené do jednoho souboru.
+    Vrací (obsah nebo None, přípona, seznam dvojic (projekt, důvod přeskočení)).
+    """
+    skipped = []
+    available = []
+    for project in projects:
+        if project.student is None:
+            skipped.append((project, "Projekt nemá přiřazeného žáka."))
+        elif doc_type == 'final_report' and project.scheme is None:
+            skipped.append((project, "Projekt nemá přiřazené hodnoticí schéma."))
+        elif doc_type == 'final_report':
+            available.append(project)
+        else:
+            try:
+                f = render_document(doc_type, project)
+            except DocumentNotAvailable as e:
+                skipped.append((project, str(e)))
+                continue
+            with f:  # nedržíme otevřené soubory všech projektů
+                available.append(io.BytesIO(f.read()))
+
+    if not available:
+        return None, None, skipped
+    if doc_type == 'final_report':
+        return render_merged_final_reports(available), '.pdf', skipped
+    return merge_docx(available), '.docx', skipped
@@ -0,0 +1,77 @@
+"""
+Registr DOCX šablon z templates/docx/.
+
+Každá šablona se načte (rozbalí a naparsuje) jen jednou za běh procesu
+a při každém exportu se předá její hluboká kopie - render docxtpl mění XML
+dokumentu na místě, takže originál musí zůstat nedotčený. Pokud se soubor
+na disku změní (jiné mtime), načte se znovu.
+"""
+import copy
+import io
+import os
+import threading
+from django.conf import settings
+from docx import Document
+from docxtpl import DocxTemplate
+
+TEMPLATE_DIR = os.path.join(settings.BASE_DIR, 'templates', 'docx')
+
+# Šablony, na které se odkazují exporty (kontrolují se při startu)
+REQUIRED_TEMPLATES = [
+    'leader_eval.docx',
+    'opponent_eval.docx',
+    'consultation_list.docx',
+    'assignment_IT.docx',
+    'assignment_E.docx',
+    'zadani_projektu_IT.docx',
+    'zadani_projektu_E.docx',
+]
+
+
+class DocxTemplateRegistry:
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self._cache = {}  # absolutní cesta -> (mtime, obsah souboru, naparsovaný Document)
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def missing(self, names=None):
+        """Seznam šablon, které na disku neexistují."""
+        return [name for name in (names or REQUIRED_TEMPLATES) if not os.path.isfile(self.path(name))]
+
+    def _load(self, path):
+        mtime = os.stat(path).st_mtime_ns  # FileNotFoundError, pokud šablona chybí
+        entry = self._cache.get(path)
+        if entry is None or entry[0] != mtime:
+            with self._lock:
+                entry = self._cache.get(path)
+                if entry is None or entry[0] != mtime:
+                    with open(path, 'rb') as f:
+                        raw = f.read()
+                    entry = (mtime, raw, Document(io.BytesIO(raw)))
+                    self._cache[path] = entry
+        return entry
+
+    def version(self, name):
+        """Verze šablony (mtime načteného souboru) - používá se v klíči cache exportů."""
+        return self._load(self.path(name))[0]
+
+    def get(self, name):
+        """Vrátí novou DocxTemplate připravenou k renderu (kopie načtené šablony)."""
+        _, raw, document = self._load(self.path(name))
+        template = DocxTemplate(io.BytesIO(raw))
+        template.docx = copy.deepcopy(document)
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+registry = DocxTemplateRegistry(TEMPLATE_DIR)
+
+
+def get_docx_template(name):
+    return registry.get(name)
@@ -0,0 +1,156 @@
+"""
+Diskový cache vygenerovaných exportů (DOCX/PDF).
+
+Klíčem je hash verze šablony a kompletního kontextu renderu, takže stejný
+vstup vždy vrátí již hotový soubor a jakákoli změna dat vede na nový klíč.
+Soubory jednoho projektu leží ve vlastním adresáři, který se při změně
+projektu (signály v signals.py) celý smaže. Velikost cache je omezená;
+při překročení se mažou nejdéle nepoužité soubory (LRU podle mtime).
+
+Velikost cache si proces průběžně přičítá; celý adresář se prochází, jen
+když odhad překročí limit, nebo každých RESCAN_EVERY zápisů (zápisy
+ostatních workerů). Soubor se vrací už otevřený - smazání souboru jiným
+requestem (evict, invalidate) tak rozpracované odeslání nepřeruší.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from django.conf import settings
+
+
+def make_key(*parts):
+    """SHA-256 z libovolných JSON-serializovatelných částí (ostatní přes str())."""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ExportCache:
+    # Po kolika zápisech se velikost cache zjistí znovu z disku
+    RESCAN_EVERY = 100
+    # Úklid maže až pod tento podíl limitu, aby neběžel po každém dalším zápisu
+    LOW_WATERMARK = 0.9
+
+    def __init__(self, directory, max_bytes):
+        self._lock = threading.Lock()
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @directory.setter
+    def directory(self, directory):
+        # Jiný adresář (benchmark, testy) - velikost se zjistí znovu
+        with self._lock:
+            self._directory = directory
+            self._size = None  # odhad velikosti v bajtech (None = zatím nezjištěno)
+            self._writes = 0
+
+    def _namespace_dir(self, namespace):
+        return os.path.join(self.directory, namespace)
+
+    def path(self, namespace, key, suffix):
+        return os.path.join(self._namespace_dir(namespace), f"{key}{suffix}")
+
+    def open_or_render(self, namespace, key, suffix, render):
+        """
+        Vrátí otevřený soubor (binární, na začátku) z cache; pokud chybí,
+        zavolá render() (vrací bytes) a výsledek uloží. Zápis přes dočasný
+        soubor + os.replace je atomický. Soubor zavírá volající.
+        """
+        path = self.path(namespace, key, suffix)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            pass
+        else:
+            try:
+                os.utime(f.fileno())  # zásah - posuneme v LRU
+            except OSError:
+                pass
+            return f
+
+        content = render()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        f = os.fdopen(fd, 'w+b')
+        try:
+            f.write(content)
+            f.flush()
+            os.replace(tmp_path, path)
+        except BaseException:
+            f.close()
+            raise
+        f.seek(0)
+        self._written(len(content))
+        return f
+
+    def invalidate(self, namespace):
+        """Smaže všechny soubory jmenného prostoru (např. jednoho projektu)."""
+        directory = self._namespace_dir(namespace)
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return
+        removed = 0
+        for entry in entries:
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            removed += size
+        with self._lock:
+            if self._size is not None:
+                self._size = max(0, self._size - removed)
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield st.st_mtime_ns, st.st_size, path
+
+    def _written(self, size):
+        with self._lock:
+            self._writes += 1
+            if self._size is not None and self._writes % self.RESCAN_EVERY:
+                self._size += size
+                if self._size <= self.max_bytes:
+                    return
+            self._evict()
+
+    def _evict(self):
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        if total > self.max_bytes:
+            target = self.max_bytes * self.LOW_WATERMARK
+            for _, size, path in files:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+        self._size = total
+
+    def evict(self):
+        """Maže nejdéle nepoužité soubory, pokud je cache větší než max_bytes."""
+        with self._lock:
+            self._evict()
+
+
+cache = ExportCache(settings.EXPORT_CACHE_ROOT, settings.EXPORT_CACHE_MAX_BYTES)
+
+
+def project_namespace(project_id):
+    return f"project_{project_id}"
@@ -0,0 +1,79 @@
+"""
+Fronta exportů nad běžnou databází (bez externího brokeru).
+
+View založí ExportJob a přesměruje na stránku se stavem, worker
+(manage.py export_worker) si úlohy postupně bere, vygeneruje soubor
+a uloží ho na disk do EXPORT_JOBS_ROOT. Data přehledu čte z repliky,
+pokud úloha nevznikla před méně než DB_REPLICA_LAG_SECONDS.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from .db_router import lag_seconds, read_replica
+from .models import ExportJob
+from .reports import render_report
+from .timing import collect
+
+logger = logging.getLogger(__name__)
+
+# Úloha, která je "running" déle, se považuje za opuštěnou (spadlý worker)
+STALE_AFTER = timedelta(minutes=30)
+
+
+def enqueue(user, kind, params):
+    return ExportJob.objects.create(user=user, kind=kind, params=params)
+
+
+def claim_next_job():
+    """
+    Vezme nejstarší čekající úlohu. Přepnutí stavu je podmíněný UPDATE,
+    takže i při více workerech úlohu dostane jen jeden z nich.
+    """
+    while True:
+        job = ExportJob.objects.filter(status='pending').order_by('created_at').first()
+        if job is None:
+            return None
+        claimed = ExportJob.objects.filter(pk=job.pk, status='pending').update(
+            status='running', started_at=timezone.now()
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    # Čerstvě založená úloha může potřebovat data, která replika ještě nemá
+    replica = timezone.now() - job.created_at >= timedelta(seconds=lag_seconds())
+    try:
+        with collect(f"job:{job.kind}", job=job.pk, user=job.user_id), read_replica(replica):
+            filename, content = render_report(job.kind, job.user, job.params)
+    except Exception as e:
+        logger.exception("Export %s selhal", job.pk)
+        job.status = 'failed'
+        job.error = str(e)
+    else:
+        job.filename = filename
+        job.file.save(filename, ContentFile(content), save=False)
+        job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def requeue_stale_jobs():
+    limit = timezone.now() - STALE_AFTER
+    return ExportJob.objects.filter(status='running', started_at__lt=limit).update(status='pending', started_at=None)
+
+
+def cleanup_old_jobs():
+    """Smaže dokončené úlohy (i soubory) starší než EXPORT_JOBS_KEEP_DAYS."""
+    limit = timezone.now() - timedelta(days=settings.EXPORT_JOBS_KEEP_DAYS)
+    count = 0
+    for job in ExportJob.objects.filter(status__in=['done', 'failed'], finished_at__lt=limit):
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        count += 1
+    return count
@@ -6,6 +6,8 @@ from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Field
 from datetime import date
 from apps.projects.models import ScoringScheme
+from .documents import DOCUMENT_TYPE_CHOICES
+from . import reference_data
 
 class MilestoneForm(forms.ModelForm):
     class Meta:
@@ -387,3 +389,46 @@ class ExportForm(forms.Form):
         # Skryjeme pole submission_status pokud exportujeme konzultační list nebo posudek oponenta
         if export_type in ['export_opponent_eval', 'export_consultation_list']:
             self.fields.pop('submission_status')
+
+
+class BulkExportForm(forms.Form):
+    """Filtr pro hromadný export dokumentů (ZIP archiv nebo jeden sloučený soubor)."""
+    OUTPUT_CHOICES = [
+        ('zip', 'ZIP archiv (samostatné soubory)'),
+        ('merged', 'Jeden sloučený soubor'),
+    ]
+
+    document_type = forms.ChoiceField(
+        choices=DOCUMENT_TYPE_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label="Typ dokumentu"
+    )
+    output = forms.ChoiceField(
+        choices=OUTPUT_CHOICES,
+        initial='zip',
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label="Výstup"
+    )
+    year = forms.ChoiceField(
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label="Školní rok"
+    )
+    class_name = forms.ChoiceField(
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label="Třída"
+    )
+    leader = forms.ModelChoiceField(
+        queryset=User.objects.filter(groups__name='Teacher').order_by('last_name'),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label="Vedoucí"
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        years = reversed(reference_data.school_years())
+        self.fields['year'].choices = [('', '-- Vše --')] + [(y, y) for y in years]
+        self.fields['class_name'].choices = [('', '-- Vše --')] + [(c, c) for c in reference_data.class_names()]
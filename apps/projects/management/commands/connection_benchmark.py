@@ -0,0 +1,128 @@
+import io
+import json
+import sys
+import time
+from importlib import import_module
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client, override_settings
+from ...db_metrics import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Změří režii připojení k DB na request: pošle N requestů přes celý WSGI cyklus "
+        "(včetně zavírání spojení na konci requestu) pro každou hodnotu CONN_MAX_AGE "
+        "a vypíše JSON s počtem nových / převzatých spojení a časem na request. "
+        "S DB_POOL se měří jen pool (ten trvalá spojení nepodporuje)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Počet requestů v každém měření.")
+        parser.add_argument('--path', default='/projects/project-details-overview/', help="Měřená stránka.")
+        parser.add_argument('--username', help="Přihlášený uživatel (jinak první superuser).")
+        parser.add_argument('--max-age', type=int, nargs='*',
+                            help="Hodnoty CONN_MAX_AGE k porovnání (výchozí 0 a hodnota z nastavení).")
+        parser.add_argument('--output', help="Soubor pro JSON výsledek (jinak standardní výstup).")
+
+    def handle(self, *args, **options):
+        conn = connections[DEFAULT_DB_ALIAS]
+        configured_max_age = conn.settings_dict['CONN_MAX_AGE']
+        pooled = bool(conn.settings_dict['OPTIONS'].get('pool'))
+        if pooled:
+            modes = [0]
+        elif options['max_age']:
+            modes = options['max_age']
+        else:
+            modes = [0] if configured_max_age == 0 else [0, configured_max_age]
+
+        user = self.get_user(options['username'])
+        client = Client()
+        client.force_login(user)
+        session_key = client.cookies[settings.SESSION_COOKIE_NAME].value
+        path, _, query = options['path'].partition('?')
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'HTTP_HOST': 'testserver',
+            'HTTP_COOKIE': f"{settings.SESSION_COOKIE_NAME}={session_key}",
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': sys.stderr,
+        }
+
+        results = []
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver'], DB_METRICS_LOG_EVERY=0):
+                for max_age in modes:
+                    results.append(self.measure(conn, environ, max_age, options['requests'], pooled))
+                    self.stderr.write(
+                        f"CONN_MAX_AGE={max_age}: {results[-1]['wall_ms_per_request']} ms/request, "
+                        f"{results[-1]['connects']} nových spojení, první dotaz {results[-1]['first_query_ms_per_request']} ms"
+                    )
+        finally:
+            conn.settings_dict['CONN_MAX_AGE'] = configured_max_age
+            conn.close()
+            import_module(settings.SESSION_ENGINE).SessionStore(session_key).delete()
+
+        report = {
+            'database': conn.vendor,
+            'path': options['path'],
+            'pool': pooled,
+            'health_checks': conn.settings_dict['CONN_HEALTH_CHECKS'],
+            'results': results,
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + "\n")
+            self.stderr.write(f"Výsledek uložen do {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    @staticmethod
+    def get_user(username):
+        users = User.objects.filter(is_active=True)
+        user = users.filter(username=username).first() if username else users.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError("Uživatel nenalezen, zadejte --username.")
+        return user
+
+    @staticmethod
+    def measure(conn, environ, max_age, count, pooled):
+        """Jedno měření: count requestů se zadaným CONN_MAX_AGE."""
+        conn.close()
+        conn.settings_dict['CONN_MAX_AGE'] = max_age
+        handler = WSGIHandler()
+        statuses = set()
+
+        def start_response(status, headers):
+            statuses.add(int(status.split()[0]))
+
+        stats.reset()
+        started = time.perf_counter()
+        for _ in range(count):
+            response = handler(dict(environ, **{'wsgi.input': io.BytesIO()}), start_response)
+            try:
+                for _chunk in response:
+                    pass
+            finally:
+                response.close()  # request_finished - tady se spojení zavře nebo ponechá
+        wall = time.perf_counter() - started
+
+        result = {
+            'conn_max_age': max_age,
+            'requests': count,
+            'wall_ms_per_request': round(wall * 1000 / count, 3),
+            'status_codes': sorted(statuses),
+        }
+        result.update(stats.as_dict(conn))
+        del result['pid']
+        if not pooled:
+            del result['pool']
+        return result
@@ -0,0 +1,237 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import date, timedelta
+from django.conf import settings
+from django.contrib.auth.models import User, Group
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished
+from django.db import close_old_connections, connection, connections, transaction
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from ...db_router import read_replica
+from ...export_cache import cache
+from ...models import Project, ScoringScheme, ControlCheck, Milestone, LeaderEvaluation, OpponentEvaluation
+from ...views.export_views import (
+    export_leader_eval, export_opponent_eval, export_consultation_list,
+    export_final_report_pdf, export_control_check_pdf, export_milestones_pdf,
+    export_project_details_pdf, export_projects_xlsx
+)
+
+LOREM = (
+    "Projekt se zabývá návrhem a realizací zařízení včetně dokumentace, "
+    "měření a vyhodnocení výsledků. "
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Změří rychlost exportů nad syntetickými daty: založí N projektů (kontroly, milníky, "
+        "posudky), změří každý export (čas, počet dotazů, špička paměti) a vypíše JSON. "
+        "Data se po měření vrátí zpět (rollback), pokud není zadáno --keep. Exporty čtou "
+        "z primární databáze (založená data v replice nejsou), dotazy se počítají na všech spojeních."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=50, help="Počet založených projektů.")
+        parser.add_argument('--sample', type=int, default=10,
+                            help="Na kolika projektech se měří exporty jednoho projektu (posudky, PDF).")
+        parser.add_argument('--repeat', type=int, default=1, help="Počet opakování každého měření.")
+        parser.add_argument('--warm', action='store_true',
+                            help="Nemazat cache exportů mezi opakováními (měří i zásahy do cache).")
+        parser.add_argument('--output', help="Soubor pro JSON výsledek (jinak standardní výstup).")
+        parser.add_argument('--keep', action='store_true', help="Ponechat založená data v databázi.")
+
+    def handle(self, *args, **options):
+        cache_dir = tempfile.mkdtemp(prefix='export_benchmark_')
+        original_cache_dir = cache.directory
+        cache.directory = cache_dir  # neměříme nad (ani nezaplňujeme) ostrou cache
+        # response.close() by jinak uprostřed transakce zavřel spojení s DB (stejně jako v test Clientu)
+        request_finished.disconnect(close_old_connections)
+        try:
+            with override_settings(EXPORT_JOBS_ASYNC=False), transaction.atomic():
+                data = self.seed(options['projects'])
+                results = self.run_benchmarks(data, options, cache_dir)
+                if not options['keep']:
+                    transaction.set_rollback(True)
+        finally:
+            request_finished.connect(close_old_connections)
+            cache.directory = original_cache_dir
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+        report = {
+            'projects': options['projects'],
+            'sample': min(options['sample'], options['projects']),
+            'repeat': options['repeat'],
+            'warm': options['warm'],
+            'database': connection.vendor,
+            'debug': settings.DEBUG,
+            'results': results,
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + "\n")
+            self.stderr.write(f"Výsledek uložen do {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    def seed(self, count):
+        """Založí schéma, dva učitele a count projektů se žáky, kontrolami, milníky a posudky."""
+        token = str(int(time.time()))[-8:]
+        year = f"bench-{token}"
+        scheme = ScoringScheme.objects.create(year=year, active=False)
+        teachers, _ = Group.objects.get_or_create(name='Teacher')
+        students, _ = Group.objects.get_or_create(name='Student')
+
+        leader = User.objects.create(username=f"bench_{token}_leader", first_name="Vedoucí",
+                                     last_name="Benchmark", is_staff=True)
+        opponent = User.objects.create(username=f"bench_{token}_opponent", first_name="Oponent",
+                                       last_name="Benchmark")
+        for teacher in (leader, opponent):
+            teacher.groups.add(teachers)
+            teacher.userprofile.title = "Ing."
+            teacher.userprofile.abbreviation = teacher.last_name[:3]
+            teacher.userprofile.save()
+
+        today = date.today()
+        for i in range(count):
+            student = User.objects.create(username=f"bench_{token}_s{i}", first_name="Žák",
+                                          last_name=f"Benchmark{i:05d}")
+            student.groups.add(students)
+            student.userprofile.class_name = f"4.{'AB'[i % 2]}"
+            student.userprofile.study_branch = 'IT' if i % 2 else 'E'
+            student.userprofile.save()
+
+            project = Project.objects.create(
+                title=f"Benchmark projekt {i}", description=LOREM * 10, assignment=LOREM * 5,
+                status='approved', student=student, leader=leader, opponent=opponent, scheme=scheme,
+                delivery_work_date=today, delivery_documentation_date=today,
+            )
+            ControlCheck.objects.bulk_create([
+                ControlCheck(project=project, date=today - timedelta(days=30 * (3 - j)),
+                             content=LOREM, evaluation=f"{j + 5}/10")
+                for j in range(3)
+            ])
+            Milestone.objects.bulk_create([
+                Milestone(project=project, title=f"Milník {j + 1}", deadline=today + timedelta(days=14 * (j - 1)),
+                          note=LOREM)
+                for j in range(3)
+            ])
+            LeaderEvaluation.objects.create(
+                project=project, area1_text=LOREM * 3, area1_points=12, area2_text=LOREM * 3, area2_points=7,
+                area3_text=LOREM * 3, area3_points=15, defense_questions=LOREM,
+            )
+            OpponentEvaluation.objects.create(
+                project=project, area1_text=LOREM * 3, area1_points=10, area2_text=LOREM * 3, area2_points=11,
+                defense_questions=LOREM,
+            )
+
+        return {
+            'year': year,
+            'leader': leader,
+            'opponent': opponent,
+            'project_ids': list(Project.objects.filter(scheme=scheme).order_by('pk').values_list('pk', flat=True)),
+        }
+
+    def run_benchmarks(self, data, options, cache_dir):
+        factory = RequestFactory()
+        leader, opponent, year = data['leader'], data['opponent'], data['year']
+        sample = data['project_ids'][:options['sample']]
+
+        def get(view, user, params=None, **kwargs):
+            request = factory.get('/', params or {})
+            request.user = user
+            return view(request, **kwargs)
+
+        def post(view, user, params, **kwargs):
+            request = factory.post('/', params)
+            request.user = user
+            return view(request, **kwargs)
+
+        # (název, počet položek, funkce vracející seznam odpovědí)
+        benchmarks = [
+            ('leader_eval_docx', len(sample),
+             lambda: [get(export_leader_eval, leader, pk=pk) for pk in sample]),
+            ('opponent_eval_docx', len(sample),
+             lambda: [get(export_opponent_eval, opponent, pk=pk) for pk in sample]),
+            ('consultation_list_docx', len(sample),
+             lambda: [post(export_consultation_list, leader, {'handover_date': date.today().isoformat()}, pk=pk)
+                      for pk in sample]),
+            ('final_report_pdf', len(sample),
+             lambda: [get(export_final_report_pdf, leader, pk=pk) for pk in sample]),
+            ('control_check_pdf', 1,
+             lambda: [get(export_control_check_pdf, leader, {'year': year})]),
+            ('milestones_pdf', 1,
+             lambda: [get(export_milestones_pdf, leader, {'year': year})]),
+            ('project_details_pdf', 1,
+             lambda: [get(export_project_details_pdf, leader, {'year': year, 'view_type': 'leader'})]),
+            ('projects_xlsx', 1,
+             lambda: [get(export_projects_xlsx, leader)]),
+        ]
+
+        results = []
+        for name, items, run in benchmarks:
+            runs = []
+            for _ in range(options['repeat']):
+                if not options['warm']:
+                    self._clear_directory(cache_dir)
+                runs.append(self.measure(run))
+                self.stderr.write(f"{name}: {runs[-1]['wall_seconds']:.3f} s")
+            results.append({
+                'name': name,
+                'items': items,
+                'runs': runs,
+                'wall_seconds_min': min(r['wall_seconds'] for r in runs),
+                'wall_seconds_per_item': min(r['wall_seconds'] for r in runs) / items if items else None,
+            })
+        return results
+
+    def measure(self, run):
+        """Čas, počet SQL dotazů a špička alokované paměti (tracemalloc) jednoho běhu."""
+        tracemalloc.start()
+        try:
+            # Data jsou v neuzavřené transakci primární databáze - views s @read_from_replica
+            # proto musí číst z ní; dotazy se počítají na všech spojeních
+            with ExitStack() as stack:
+                stack.enter_context(read_replica(False))
+                captured = {alias: stack.enter_context(CaptureQueriesContext(connections[alias]))
+                            for alias in connections}
+                started = time.perf_counter()
+                responses = run()
+                size = sum(self._consume(response) for response in responses)
+                wall = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        statuses = sorted({response.status_code for response in responses})
+        return {
+            'wall_seconds': round(wall, 4),
+            'queries': sum(len(queries) for queries in captured.values()),
+            'queries_by_database': {alias: len(queries) for alias, queries in captured.items()},
+            'peak_memory_bytes': peak,
+            'response_bytes': size,
+            'status_codes': statuses,
+        }
+
+    @staticmethod
+    def _consume(response):
+        """Přečte celé tělo odpovědi (i streamované), vrací jeho velikost."""
+        try:
+            if response.streaming:
+                return sum(len(chunk) for chunk in response.streaming_content)
+            return len(response.content)
+        finally:
+            response.close()
+
+    @staticmethod
+    def _clear_directory(directory):
+        for entry in os.scandir(directory):
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
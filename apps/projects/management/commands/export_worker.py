@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from ...export_jobs import claim_next_job, run_job, requeue_stale_jobs, cleanup_old_jobs
+
+
+class Command(BaseCommand):
+    help = "Zpracovává frontu exportů (ExportJob). Spouštějte jako samostatný proces vedle webu."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Zpracuje čekající úlohy a skončí.")
+        parser.add_argument('--sleep', type=float, default=2.0, help="Prodleva mezi dotazy na frontu (s).")
+
+    def handle(self, *args, **options):
+        requeue_stale_jobs()
+        removed = cleanup_old_jobs()
+        if removed:
+            self.stdout.write(f"Smazáno starých exportů: {removed}")
+
+        last_cleanup = time.monotonic()
+        while True:
+            close_old_connections()
+            job = claim_next_job()
+            if job is not None:
+                run_job(job)
+                self.stdout.write(f"Export #{job.pk} ({job.kind}): {job.status}")
+                continue
+
+            if options['once']:
+                break
+
+            if time.monotonic() - last_cleanup > 3600:
+                requeue_stale_jobs()
+                cleanup_old_jobs()
+                last_cleanup = time.monotonic()
+            time.sleep(options['sleep'])
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from ...scores import recompute_scores
+
+
+class Command(BaseCommand):
+    help = "Dopočítá uložený souhrn bodů projektů (leader_total, opponent_total, max_total, final_total)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Počet projektů v jedné dávce.")
+
+    def handle(self, *args, **options):
+        changed = recompute_scores(batch_size=options['batch_size'])
+        self.stdout.write(f"Přepočítáno projektů: {changed}")
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-18 06:47
+
+import apps.projects.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0024_alter_project_delayed_submission_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('control_check', 'Přehled kontrol (PDF)'), ('milestones', 'Přehled milníků (PDF)'), ('project_details', 'Přehled projektů (PDF)')], max_length=30, verbose_name='Typ exportu')),
+                ('params', models.JSONField(blank=True, default=dict, help_text='Parametry exportu (školní rok, pohled)', verbose_name='Parametry')),
+                ('status', models.CharField(choices=[('pending', 'Čeká ve frontě'), ('running', 'Zpracovává se'), ('done', 'Hotovo'), ('failed', 'Chyba')], db_index=True, default='pending', max_length=20, verbose_name='Stav')),
+                ('file', models.FileField(blank=True, storage=apps.projects.models.export_storage, upload_to='%Y/%m/', verbose_name='Soubor')),
+                ('filename', models.CharField(blank=True, max_length=200, verbose_name='Název souboru')),
+                ('error', models.TextField(blank=True, verbose_name='Chyba')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Uživatel')),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
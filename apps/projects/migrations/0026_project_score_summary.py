@@ -0,0 +1,71 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:02
+
+from django.db import migrations, models
+
+
+def fill_score_summary(apps, schema_editor):
+    """Doplní souhrn bodů existujících projektů (stejný výpočet jako scores.py)."""
+    Project = apps.get_model('projects', 'Project')
+    db_alias = schema_editor.connection.alias
+    projects = Project.objects.using(db_alias).order_by('pk').values(
+        'pk',
+        'leader_eval__id', 'leader_eval__area1_points', 'leader_eval__area2_points', 'leader_eval__area3_points',
+        'opponent_eval__id', 'opponent_eval__area1_points', 'opponent_eval__area2_points',
+        'scheme__leader_area1_max', 'scheme__leader_area2_max', 'scheme__leader_area3_max',
+        'scheme__opponent_area1_max', 'scheme__opponent_area2_max',
+    )
+    updates = []
+    for row in projects.iterator(chunk_size=500):
+        leader_total = None
+        if row['leader_eval__id'] is not None:
+            leader_total = row['leader_eval__area1_points'] + row['leader_eval__area2_points'] + row['leader_eval__area3_points']
+        opponent_total = None
+        if row['opponent_eval__id'] is not None:
+            opponent_total = row['opponent_eval__area1_points'] + row['opponent_eval__area2_points']
+        max_total = None
+        if row['scheme__leader_area1_max'] is not None:
+            max_total = sum(row[f'scheme__{field}'] for field in (
+                'leader_area1_max', 'leader_area2_max', 'leader_area3_max', 'opponent_area1_max', 'opponent_area2_max'))
+        final_total = None
+        if leader_total is not None or opponent_total is not None:
+            final_total = (leader_total or 0) + (opponent_total or 0)
+        updates.append(Project(
+            pk=row['pk'],
+            leader_total=leader_total,
+            opponent_total=opponent_total,
+            max_total=max_total,
+            final_total=final_total,
+        ))
+    Project.objects.using(db_alias).bulk_update(
+        updates, ['leader_total', 'opponent_total', 'max_total', 'final_total'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0025_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='final_total',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Body celkem'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='leader_total',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Body vedoucího celkem'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='max_total',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Maximum bodů'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='opponent_total',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Body oponenta celkem'),
+        ),
+        migrations.RunPython(fill_score_summary, migrations.RunPython.noop),
+    ]
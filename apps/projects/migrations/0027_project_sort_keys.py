@@ -0,0 +1,63 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_sort_keys(apps, schema_editor):
+    """Doplní rok, třídu a jméno žáka u existujících projektů."""
+    Project = apps.get_model('projects', 'Project')
+    db_alias = schema_editor.connection.alias
+    projects = Project.objects.using(db_alias).values(
+        'pk', 'scheme__year', 'student__first_name', 'student__last_name', 'student__userprofile__class_name',
+    )
+    updates = []
+    for row in projects.iterator(chunk_size=500):
+        first_name, last_name = row['student__first_name'] or '', row['student__last_name'] or ''
+        updates.append(Project(
+            pk=row['pk'],
+            school_year=row['scheme__year'] or '',
+            student_class=row['student__userprofile__class_name'] or '',
+            student_sort_name=f"{last_name} {first_name}".strip(),
+        ))
+    Project.objects.using(db_alias).bulk_update(updates, ['school_year', 'student_class', 'student_sort_name'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0007_userprofile_abbreviation'),
+        ('projects', '0026_project_score_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='school_year',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20, verbose_name='Školní rok'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='student_class',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50, verbose_name='Třída žáka'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='student_sort_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=301, verbose_name='Žák (řazení)'),
+        ),
+        migrations.RunPython(fill_sort_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['school_year', 'leader'], name='project_year_leader_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['school_year', 'opponent'], name='project_year_opponent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['school_year', 'student_class', 'student_sort_name'], name='project_year_class_name_idx'),
+        ),
+    ]
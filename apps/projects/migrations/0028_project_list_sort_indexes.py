@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0027_project_sort_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='project',
+            name='project_year_class_name_idx',
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['school_year', 'student_class', 'student_sort_name', 'id'], name='project_year_class_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['school_year', 'title', 'id'], name='project_year_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['school_year', 'created_at', 'id'], name='project_year_created_idx'),
+        ),
+    ]
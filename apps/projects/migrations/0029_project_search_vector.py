@@ -0,0 +1,59 @@
+# Generated by Django 5.1.4 on 2026-10-18 07:41
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import UnaccentExtension
+from django.db import migrations
+
+# Jednoduchý slovník bez stemmingu, diakritika pryč přes unaccent (viz search.py)
+CREATE_CONFIG = """
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'cs_unaccent') THEN
+        CREATE TEXT SEARCH CONFIGURATION cs_unaccent (COPY = simple);
+        ALTER TEXT SEARCH CONFIGURATION cs_unaccent
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple;
+    END IF;
+END
+$$;
+"""
+
+CREATE_INDEX = "CREATE INDEX IF NOT EXISTS project_search_vector_idx ON projects_project USING gin (search_vector);"
+
+FILL_VECTORS = """
+UPDATE projects_project SET search_vector =
+    setweight(to_tsvector('cs_unaccent', coalesce(title, '')), 'A')
+    || setweight(to_tsvector('cs_unaccent', coalesce(assignment, '')), 'B')
+    || setweight(to_tsvector('cs_unaccent', coalesce(description, '')), 'C');
+"""
+
+
+def create_search(apps, schema_editor):
+    """Konfigurace, GIN index a naplnění sloupce - jen na PostgreSQL."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_CONFIG)
+    schema_editor.execute(CREATE_INDEX)
+    schema_editor.execute(FILL_VECTORS)
+
+
+def drop_search(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS project_search_vector_idx;")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0028_project_list_sort_indexes'),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.AddField(
+            model_name='project',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(create_search, drop_search),
+    ]
@@ -1,9 +1,11 @@
 from datetime import date
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
 from PIL import Image
 from django.core.exceptions import ValidationError
 import os
@@ -257,6 +259,34 @@ class Project(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Souhrn bodů uložený kvůli řazení a agregacím v DB. Udržují ho signály
+    # posudků a schématu (scores.py), existující projekty doplní migrace 0026,
+    # po změnách mimo Django ho přepočítá příkaz recompute_scores.
+    leader_total = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Body vedoucího celkem")
+    opponent_total = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Body oponenta celkem")
+    max_total = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Maximum bodů")
+    final_total = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Body celkem")
+
+    # Kopie školního roku, třídy a jména žáka pro filtrování a řazení bez joinů
+    # přes schéma a profil. Udržují je signály (sort_keys.py).
+    school_year = models.CharField(max_length=20, blank=True, default='', editable=False, verbose_name="Školní rok")
+    student_class = models.CharField(max_length=50, blank=True, default='', editable=False, verbose_name="Třída žáka")
+    # "Příjmení Jméno" (150 + mezera + 150 znaků)
+    student_sort_name = models.CharField(max_length=301, blank=True, default='', editable=False, verbose_name="Žák (řazení)")
+
+    # Fulltext nad názvem, zadáním a popisem (jen PostgreSQL, GIN index a plnění viz search.py)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['school_year', 'leader'], name='project_year_leader_idx'),
+            models.Index(fields=['school_year', 'opponent'], name='project_year_opponent_idx'),
+            # Řazení seznamu (navigation.ORDERINGS), id je koncový klíč pro keyset stránkování
+            models.Index(fields=['school_year', 'student_class', 'student_sort_name', 'id'], name='project_year_class_name_idx'),
+            models.Index(fields=['school_year', 'title', 'id'], name='project_year_title_idx'),
+            models.Index(fields=['school_year', 'created_at', 'id'], name='project_year_created_idx'),
+        ]
+
 
     def __str__(self):
         return self.title
@@ -265,8 +295,8 @@ class Project(models.Model):
         return reverse('projects:detail', kwargs={'pk': self.pk})
     
     def leader_total_points(self):
-        if hasattr(self, 'leader_eval'):
-            return self.leader_eval.area1_points + self.leader_eval.area2_points + self.leader_eval.area3_points
+        if self.leader_total is not None:
+            return self.leader_total
         return "X"
 
     def max_leader_points(self):
@@ -276,8 +306,8 @@ class Project(models.Model):
         return 0  # Pokud není přiřazený scheme
 
     def opponent_total_points(self):
-        if hasattr(self, 'opponent_eval'):
-            return self.opponent_eval.area1_points + self.opponent_eval.area2_points
+        if self.opponent_total is not None:
+            return self.opponent_total
         return "X"
 
     def max_opponent_points(self):
@@ -431,3 +461,48 @@ class OpponentEvaluation(models.Model):
             if self.area2_points > scheme.opponent_area2_max:
                 raise ValidationError("Přesáhli jste povolené maximum bodů za oblast 2!")
 
+
+
+def export_storage():
+    """Exporty se ukládají mimo MEDIA_ROOT, aby nebyly veřejně dostupné."""
+    return FileSystemStorage(location=settings.EXPORT_JOBS_ROOT)
+
+
+class ExportJob(models.Model):
+    """Export zařazený do fronty, který zpracuje worker (manage.py export_worker)."""
+    KIND_CHOICES = [
+        ('control_check', 'Přehled kontrol (PDF)'),
+        ('milestones', 'Přehled milníků (PDF)'),
+        ('project_details', 'Přehled projektů (PDF)'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Čeká ve frontě'),
+        ('running', 'Zpracovává se'),
+        ('done', 'Hotovo'),
+        ('failed', 'Chyba'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs', verbose_name="Uživatel")
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES, verbose_name="Typ exportu")
+    params = models.JSONField(default=dict, blank=True, help_text="Parametry exportu (školní rok, pohled)", verbose_name="Parametry")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True, verbose_name="Stav")
+    file = models.FileField(upload_to='%Y/%m/', storage=export_storage, blank=True, verbose_name="Soubor")
+    filename = models.CharField(max_length=200, blank=True, verbose_name="Název souboru")
+    error = models.TextField(blank=True, verbose_name="Chyba")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} ({self.user.username}, {self.get_status_display()})"
+
+    def get_absolute_url(self):
+        return reverse('projects:export_job', kwargs={'pk': self.pk})
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
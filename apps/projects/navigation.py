@@ -0,0 +1,205 @@
+"""
+Filtr, řazení a stránkování seznamu projektů a navigace předchozí / další
+projekt v detailu.
+
+Seznam uloží použitý filtr (jen zadané GET parametry) do podepsané cookie
+- session se nemění. Detail z ní filtr obnoví a sousední projekty najde
+keyset dotazem: první projekt za / před aktuálním v pořadí seznamu
+(řazení vždy končí id, takže je jednoznačné). Dotazy jdou po indexech,
+seznam ID celého roku se nikam neukládá.
+
+Seznam se stránkuje stejně (keyset): odkaz na další stránku nese id
+posledního řádku, na předchozí id prvního. Řadit lze jen podle klíčů
+z ORDERINGS, pro každý je v Project.Meta index (rok, klíč, id); při
+hledání navíc podle relevance.
+"""
+import json
+from django.db.models import Q
+from .models import Project
+from .reference_data import active_scheme
+from .roles import get_roles
+from .search import search_projects, search_terms
+
+# GET parametry seznamu, které určují vybrané projekty a jejich pořadí
+FILTER_PARAMS = ('q', 'filter_type', 'my_projects', 'class', 'status', 'leader', 'opponent', 'ordering', 'year')
+
+# Povolené řazení seznamu: hodnota GET parametru "ordering" -> (pole, popisek).
+# Řazení podle relevance platí jen při hledání (anotace rank, search.py).
+ORDERINGS = {
+    'relevance': (('-rank',), 'Relevance'),
+    'class': (('student_class', 'student_sort_name'), 'Třída a žák'),
+    'title': (('title',), 'Název (A-Z)'),
+    '-title': (('-title',), 'Název (Z-A)'),
+    'created_at': (('created_at',), 'Datum (staré nahoře)'),
+    '-created_at': (('-created_at',), 'Datum (nové nahoře)'),
+}
+DEFAULT_ORDERING = 'class'
+
+FILTER_NAMES = {
+    'my_projects': 'Všechny moje projekty (vedoucí i oponent)',
+    'my_leading': 'Projekty, kde jsem vedoucí',
+    'my_opponent': 'Projekty, kde jsem oponent',
+    'no_leader': 'Projekty bez určeného vedoucího',
+}
+
+NAV_COOKIE = 'project_nav'
+NAV_SALT = 'projects.navigation'
+NAV_MAX_AGE = 86400  # 1 den, stejně jako session
+
+
+def filter_params(query):
+    """Zadané (neprázdné) filtrovací parametry z GET, neznámé řazení se vynechá."""
+    params = {key: query[key] for key in FILTER_PARAMS if query.get(key)}
+    if params.get('ordering') not in ORDERINGS:
+        params.pop('ordering', None)
+    return params
+
+
+def project_ordering(params):
+    """Pořadí seznamu; id (ve směru prvního klíče) na konci dělá pořadí jednoznačné."""
+    searching = bool(search_terms(params.get('q')))
+    ordering = params.get('ordering') or ('relevance' if searching else DEFAULT_ORDERING)
+    if ordering == 'relevance' and not searching:
+        ordering = DEFAULT_ORDERING
+    fields = ORDERINGS[ordering][0]
+    return (*fields, '-id' if fields[0].startswith('-') else 'id')
+
+
+def filter_projects(user, params, queryset=None):
+    """Projekty odpovídající filtru seznamu, seřazené jako v seznamu."""
+    qs = queryset if queryset is not None else Project.objects.all()
+
+    filter_type = params.get('filter_type', 'all')
+
+    if filter_type == 'my_projects':
+        qs = qs.filter(Q(leader=user) | Q(opponent=user))
+    elif filter_type == 'my_leading':
+        qs = qs.filter(leader=user)
+    elif filter_type == 'my_opponent':
+        qs = qs.filter(opponent=user)
+    elif filter_type == 'no_leader':
+        qs = qs.filter(leader__isnull=True)
+
+    # Zpracování parametru "Pouze moje projekty"
+    if params.get('my_projects', '0') == '1':
+        qs = qs.filter(Q(leader=user) | Q(opponent=user))
+
+    # Pokud je user ve skupině 'Student', zobrazí jen své projekty
+    if get_roles(user).is_student:
+        qs = qs.filter(student=user)
+
+    if class_name := params.get('class'):
+        qs = qs.filter(student_class=class_name)
+
+    if status := params.get('status'):
+        qs = qs.filter(status=status)
+
+    if leader_id := params.get('leader'):
+        qs = qs.filter(leader_id=leader_id)
+
+    if opponent_id := params.get('opponent'):
+        qs = qs.filter(opponent_id=opponent_id)
+
+    # Rok z GET, jinak z preferencí uživatele
+    selected_year = params.get('year')
+    if not selected_year and hasattr(user, 'preferences'):
+        selected_year = user.preferences.default_year
+
+    if selected_year:
+        qs = qs.filter(school_year=selected_year)
+    elif get_roles(user).is_teacher or user.is_superuser:
+        # Výchozí: učitel vidí projekty aktivního schématu (přes rok, kvůli indexům)
+        if (scheme := active_scheme()) is not None:
+            qs = qs.filter(school_year=scheme.year)
+
+    # Fulltext (anotace rank pro řazení podle relevance)
+    qs = search_projects(qs, params.get('q'))
+
+    return qs.order_by(*project_ordering(params))
+
+
+def filter_name(params):
+    return FILTER_NAMES.get(params.get('filter_type'), '')
+
+
+def save_navigation(request, response, params):
+    """Uloží filtr seznamu do podepsané cookie (jen pokud se změnil)."""
+    value = json.dumps(params, separators=(',', ':'), sort_keys=True)
+    if request.get_signed_cookie(NAV_COOKIE, default=None, salt=NAV_SALT, max_age=NAV_MAX_AGE) != value:
+        response.set_signed_cookie(
+            NAV_COOKIE, value, salt=NAV_SALT, max_age=NAV_MAX_AGE, httponly=True, samesite='Lax',
+        )
+    return response
+
+
+def load_navigation(request):
+    """Filtr posledního zobrazeného seznamu, nebo None (chybí, prošlý, podvržený)."""
+    value = request.get_signed_cookie(NAV_COOKIE, default=None, salt=NAV_SALT, max_age=NAV_MAX_AGE)
+    if value is None:
+        return None
+    try:
+        params = json.loads(value)
+    except ValueError:
+        return None
+    if not isinstance(params, dict):
+        return None
+    return {key: str(params[key]) for key in FILTER_PARAMS if params.get(key)}
+
+
+def _seek(ordering, values, backwards):
+    """Podmínka "za aktuálním řádkem" (backwards: před ním) pro dané pořadí."""
+    condition = Q()
+    equal = Q()
+    for field in ordering:
+        name = field.lstrip('-')
+        descending = field.startswith('-')
+        lookup = 'lt' if descending != backwards else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': values[name]})
+        equal &= Q(**{name: values[name]})
+    return condition
+
+
+def _sort_values(queryset, project_id):
+    """Hodnoty řadicích polí projektu (nebo None, pokud projekt neexistuje)."""
+    fields = [field.lstrip('-') for field in queryset.query.order_by]
+    return queryset.filter(pk=project_id).values(*fields).first()
+
+
+def keyset_page(queryset, size, after=None, before=None):
+    """
+    Jedna stránka seřazeného querysetu za projektem after (před projektem before).
+    Vrací (projekty, id pro odkaz na předchozí stránku, id pro další stránku);
+    bez kurzoru nebo s projektem, který už do výběru nepatří, jde o první stránku.
+    """
+    ordering = queryset.query.order_by
+    cursor = after or before
+    values = _sort_values(queryset, cursor) if cursor else None
+
+    if values is not None and before:
+        rows = list(queryset.filter(_seek(ordering, values, backwards=True)).reverse()[:size + 1])
+        has_previous = len(rows) > size
+        rows = rows[:size][::-1]
+        return rows, rows[0].pk if has_previous else None, rows[-1].pk if rows else None
+
+    if values is not None:
+        queryset = queryset.filter(_seek(ordering, values, backwards=False))
+    rows = list(queryset[:size + 1])
+    has_next = len(rows) > size
+    rows = rows[:size]
+    previous = rows[0].pk if values is not None and rows else None
+    return rows, previous, rows[-1].pk if has_next else None
+
+
+def neighbours(queryset, project_id):
+    """
+    (id předchozího, id dalšího) projektu v seřazeném querysetu.
+    Projekt mimo queryset nemá sousedy (None, None).
+    """
+    ordering = queryset.query.order_by
+    values = _sort_values(queryset, project_id)
+    if values is None:
+        return None, None
+    ids = queryset.values_list('pk', flat=True)
+    next_id = ids.filter(_seek(ordering, values, backwards=False)).first()
+    prev_id = ids.filter(_seek(ordering, values, backwards=True)).reverse().first()
+    return prev_id, next_id
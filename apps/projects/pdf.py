@@ -0,0 +1,128 @@
+"""
+Sdílený kontext pro generování PDF přes WeasyPrint.
+
+Každý export dříve volal HTML(string=...).write_pdf() "za studena" - znovu se
+hledala písma a parsovaly styly. Tady se drží:
+  * FontConfiguration a zkompilované CSS z pdf_styles/ - jednou pro každé
+    vlákno (objekty WeasyPrint nejsou určené pro souběžné použití),
+    styl se znovu načte jen při změně souboru,
+  * url_fetcher, který static a media soubory čte z disku jen poprvé
+    a dál je vrací z paměti.
+"""
+import mimetypes
+import os
+import threading
+from urllib.parse import unquote, urlsplit
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from weasyprint import CSS, HTML, default_url_fetcher
+from weasyprint.text.fonts import FontConfiguration
+from .timing import stage
+
+STYLE_DIR = os.path.join(os.path.dirname(__file__), 'pdf_styles')
+
+# Relativní odkazy v šablonách (/static/..., /media/...) se vztahují k této
+# adrese a url_fetcher je obslouží z disku/paměti, nikoli přes HTTP.
+BASE_URL = 'http://evidence.local/'
+
+ASSET_MAX_BYTES = 5 * 1024 * 1024        # větší soubory se necachují
+ASSET_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+
+def _local_path(url):
+    """Cesta k souboru na disku pro static/media URL, jinak None."""
+    parts = urlsplit(url)
+    if f"{parts.scheme}://{parts.netloc}/" != BASE_URL:
+        return None
+    path = unquote(parts.path)
+    if path.startswith(settings.STATIC_URL):
+        relative = path[len(settings.STATIC_URL):]
+        found = finders.find(relative)
+        if found:
+            return found
+        root = settings.STATIC_ROOT
+    elif path.startswith(settings.MEDIA_URL):
+        relative = path[len(settings.MEDIA_URL):]
+        root = settings.MEDIA_ROOT
+    else:
+        return None
+    if not root:
+        return None
+    root = os.path.abspath(root)
+    full = os.path.abspath(os.path.join(root, relative))
+    # ochrana proti ../ mimo adresář
+    if not full.startswith(root + os.sep):
+        return None
+    return full
+
+
+class PdfRenderer:
+    def __init__(self, style_dir):
+        self.style_dir = style_dir
+        self._local = threading.local()
+        self._assets = {}  # (cesta, mtime) -> (obsah, mime type)
+        self._assets_size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def font_config(self):
+        font_config = getattr(self._local, 'font_config', None)
+        if font_config is None:
+            font_config = self._local.font_config = FontConfiguration()
+            self._local.stylesheets = {}
+        return font_config
+
+    def style_version(self, name):
+        """Verze stylu (mtime) - patří do klíče cache hotových PDF."""
+        return os.stat(os.path.join(self.style_dir, name)).st_mtime_ns
+
+    def stylesheet(self, name):
+        """Zkompilovaný CSS z pdf_styles/ (pro aktuální vlákno)."""
+        font_config = self.font_config
+        path = os.path.join(self.style_dir, name)
+        mtime = os.stat(path).st_mtime_ns
+        entry = self._local.stylesheets.get(name)
+        if entry is None or entry[0] != mtime:
+            css = CSS(filename=path, font_config=font_config, url_fetcher=self.url_fetcher, base_url=BASE_URL)
+            entry = self._local.stylesheets[name] = (mtime, css)
+        return entry[1]
+
+    def url_fetcher(self, url, **kwargs):
+        path = _local_path(url)
+        if path is None:
+            return default_url_fetcher(url, **kwargs)
+        mtime = os.stat(path).st_mtime_ns
+        key = (path, mtime)
+        entry = self._assets.get(key)
+        if entry is None:
+            with open(path, 'rb') as f:
+                content = f.read()
+            entry = (content, mimetypes.guess_type(path)[0])
+            if len(content) <= ASSET_MAX_BYTES:
+                with self._lock:
+                    if self._assets_size + len(content) > ASSET_CACHE_MAX_BYTES:
+                        self._assets.clear()
+                        self._assets_size = 0
+                    if key not in self._assets:
+                        self._assets[key] = entry
+                        self._assets_size += len(content)
+        content, mime_type = entry
+        return {'string': content, 'mime_type': mime_type, 'redirected_url': url}
+
+    def _html(self, html_string):
+        return HTML(string=html_string, base_url=BASE_URL, url_fetcher=self.url_fetcher)
+
+    def write_pdf(self, html_string, styles=()):
+        with stage('pdf'):
+            return self._html(html_string).write_pdf(
+                stylesheets=[self.stylesheet(name) for name in styles],
+                font_config=self.font_config,
+            )
+
+
+renderer = PdfRenderer(STYLE_DIR)
+
+
+def render_pdf(html_string, styles=()):
+    """HTML -> PDF (bytes) se sdílenými písmy, styly z pdf_styles/ a url_fetcherem."""
+    return renderer.write_pdf(html_string, styles)
@@ -0,0 +1,112 @@
+"""
+Hromadný import projektů z CSV.
+
+Žáci, vedoucí a oponenti ze všech řádků, už existující projekty žáků
+(název + žák) a aktivní schéma se načtou předem (schéma přímo z DB, ne
+z cache číselníků), řádky se zkontrolují v paměti a nové projekty se
+vloží přes bulk_create v jedné transakci.
+
+bulk_create neposílá signály - klíče řazení a maximum bodů se proto
+nastaví přímo na instancích a fulltext se přepočítá jedním UPDATE.
+Nové projekty nemají hodnocení ani vygenerované exporty, takže souhrn
+bodů zůstává prázdný a není co zneplatnit.
+"""
+import csv
+import io
+from django.contrib.auth.models import User
+from django.db import transaction
+from .models import Project, ScoringScheme
+from .scores import scheme_max_total
+from .search import update_search_vectors
+from .sort_keys import apply_sort_keys
+
+# student_username;title;description;[leader_username];[opponent_username]
+MIN_COLUMNS = 3
+TITLE_MAX_LENGTH = Project._meta.get_field('title').max_length
+
+
+def _parse(file_content):
+    """Řádky CSV -> [(číslo řádku, hodnoty)], [chyby]."""
+    reader = csv.reader(io.StringIO(file_content), delimiter=';', quotechar='"')
+    rows, log_entries = [], []
+    for row_num, row in enumerate(reader, start=1):
+        # Očekávaný minimální počet sloupců = 3 (student, title, description)
+        if len(row) < MIN_COLUMNS:
+            log_entries.append((row_num, f"Řádek {row_num}: Nedostatečný počet sloupců."))
+            continue
+        rows.append((row_num, {
+            'student': row[0].strip(),
+            'title': row[1].strip(),
+            'description': row[2].strip(),
+            'leader': row[3].strip() if len(row) > 3 else "",
+            'opponent': row[4].strip() if len(row) > 4 else "",
+        }))
+    return rows, log_entries
+
+
+def _row_error(row_num, data, users, taken):
+    """Chyba řádku (stejné pořadí kontrol i texty jako dřív), jinak None."""
+    if data['student'] not in users:
+        return f"Řádek {row_num}: Student '{data['student']}' neexistuje."
+    if data['leader'] and data['leader'] not in users:
+        return f"Řádek {row_num}: Vedoucí '{data['leader']}' neexistuje. Přeskakuji."
+    if data['opponent'] and data['opponent'] not in users:
+        return f"Řádek {row_num}: Oponent '{data['opponent']}' neexistuje. Přeskakuji."
+    # Kontrola duplicity (stejný title + stejný student) v DB i dříve v souboru
+    if (data['title'], users[data['student']].pk) in taken:
+        return f"Řádek {row_num}: Projekt '{data['title']}' pro studenta '{data['student']}' už existuje."
+    if len(data['title']) > TITLE_MAX_LENGTH:
+        return f"Řádek {row_num}: Název je delší než {TITLE_MAX_LENGTH} znaků."
+    return None
+
+
+def import_projects(file_content):
+    """
+    Naimportuje projekty z obsahu CSV (oddělené středníkem).
+    Vrací (počet vytvořených projektů, [záznamy o přeskočených řádcích]).
+    """
+    rows, log_entries = _parse(file_content)
+
+    usernames = {data[role] for _, data in rows for role in ('student', 'leader', 'opponent')} - {""}
+    users = {
+        user.username: user
+        for user in User.objects.filter(username__in=usernames).select_related('userprofile')
+    }
+    student_ids = {users[data['student']].pk for _, data in rows if data['student'] in users}
+    taken = set(Project.objects.filter(student_id__in=student_ids).values_list('title', 'student_id'))
+    scheme = ScoringScheme.objects.filter(active=True).first()
+    max_total = scheme_max_total(scheme)
+
+    projects = []
+    for row_num, data in rows:
+        error = _row_error(row_num, data, users, taken)
+        if error:
+            log_entries.append((row_num, error))
+            continue
+        student = users[data['student']]
+        taken.add((data['title'], student.pk))
+        project = Project(
+            student=student,
+            title=data['title'],
+            description=data['description'],
+            assignment=data['description'],
+            leader=users.get(data['leader']),
+            opponent=users.get(data['opponent']),
+            status='approved',
+            scheme=scheme,
+            max_total=max_total,
+        )
+        apply_sort_keys(project)  # relace jsou načtené, žádný dotaz
+        projects.append(project)
+
+    with transaction.atomic():
+        created = Project.objects.bulk_create(projects, batch_size=500)
+        project_ids = [project.pk for project in created if project.pk is not None]
+        if len(project_ids) < len(created):  # databáze bez RETURNING
+            project_ids = list(Project.objects.filter(
+                student_id__in={project.student_id for project in created},
+                title__in={project.title for project in created},
+            ).values_list('pk', flat=True))
+        update_search_vectors(project_ids)
+
+    return len(created), [entry for _, entry in sorted(log_entries, key=lambda item: item[0])]
@@ -0,0 +1,76 @@
+"""
+Číselníky pro filtry a formuláře: školní roky, učitelé, třídy a aktivní
+schéma hodnocení.
+
+Drží se v cache Djanga (výchozí alias - lokální paměť i sdílená cache).
+Změna schématu, profilu, jména uživatele nebo členství ve skupině Teacher
+položku hned smaže (signals.py). U lokální paměti se to týká jen procesu,
+který změnu provedl, ostatní procesy načtou nová data nejpozději po
+REFERENCE_DATA_TIMEOUT sekundách.
+
+Aktivní schéma určuje rok nových projektů a výchozí filtr seznamu, proto
+je v aliasu 'reference' sdíleném všemi workery - smazání položky po změně
+schématu platí hned pro všechny procesy.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from apps.profiles.models import UserProfile
+from .models import ScoringScheme
+from .roles import TEACHER
+
+YEARS = 'years'
+TEACHERS = 'teachers'
+CLASSES = 'classes'
+ACTIVE_SCHEME = 'active_scheme'
+
+# Uložené None by nešlo odlišit od chybějící položky
+_MISSING = 'missing'
+
+# Položky ve sdílené cache (ostatní jsou ve výchozím aliasu)
+SHARED = {ACTIVE_SCHEME}
+
+
+def _cache_key(name):
+    return f"projects:reference:{name}"
+
+
+def _cache(name):
+    return caches['reference'] if name in SHARED else cache
+
+
+def _cached(name, load):
+    key = _cache_key(name)
+    value = _cache(name).get(key)
+    if value is None:
+        value = load()
+        _cache(name).set(key, _MISSING if value is None else value, settings.REFERENCE_DATA_TIMEOUT)
+    return None if value == _MISSING else value
+
+
+def invalidate(*names):
+    cache.delete_many([_cache_key(name) for name in names if name not in SHARED])
+    caches['reference'].delete_many([_cache_key(name) for name in names if name in SHARED])
+
+
+def school_years():
+    """Školní roky všech schémat, vzestupně."""
+    return _cached(YEARS, lambda: list(ScoringScheme.objects.values_list('year', flat=True).order_by('year')))
+
+
+def teachers():
+    """Učitelé (id, username, jméno, příjmení) seřazení podle příjmení."""
+    return _cached(TEACHERS, lambda: list(
+        User.objects.filter(groups__name=TEACHER).order_by('last_name').values('id', 'username', 'first_name', 'last_name')))
+
+
+def class_names():
+    """Vyplněné třídy z profilů, abecedně."""
+    return _cached(CLASSES, lambda: list(
+        UserProfile.objects.exclude(class_name='').exclude(class_name__isnull=True)
+        .values_list('class_name', flat=True).distinct().order_by('class_name')))
+
+
+def active_scheme():
+    """Aktivní schéma hodnocení, nebo None."""
+    return _cached(ACTIVE_SCHEME, lambda: ScoringScheme.objects.filter(active=True).first())
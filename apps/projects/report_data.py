@@ -0,0 +1,165 @@
+"""
+Data pro souhrnné přehledy přes více projektů (kontroly, milníky, přehled
+projektů vedoucího/oponenta).
+
+Všechny řádky se sestaví nad jedním querysetem s select_related (žák,
+vedoucí, oponent, profily) a seřazenými Prefetch pro kontroly a milníky
+- počet dotazů nezávisí na počtu projektů. Součty bodů jsou uložené přímo
+v projektu. Používá je HTML přehled i jeho PDF verze (reports.py).
+"""
+from datetime import datetime
+from django.db.models import Prefetch
+from .models import Project, ControlCheck, Milestone
+
+
+def role_projects(user, year=None, view_type='leader', order_by=('student_sort_name',),
+                  controls=False, milestones=False):
+    """
+    Projekty, kde je uživatel vedoucím (view_type='leader') nebo oponentem.
+    Seřazené kontroly jsou v project.sorted_checks, milníky v project.sorted_milestones.
+    """
+    if view_type == 'opponent':
+        projects = Project.objects.filter(opponent=user)
+    else:
+        projects = Project.objects.filter(leader=user)
+    if year:
+        projects = projects.filter(school_year=year)
+
+    projects = projects.select_related(
+        'student', 'student__userprofile',
+        'leader', 'leader__userprofile',
+        'opponent', 'opponent__userprofile',
+    ).order_by(*order_by)
+
+    prefetches = []
+    if controls:
+        prefetches.append(Prefetch('controls', queryset=ControlCheck.objects.order_by('date'), to_attr='sorted_checks'))
+    if milestones:
+        prefetches.append(Prefetch('milestones', queryset=Milestone.objects.order_by('deadline'), to_attr='sorted_milestones'))
+    return projects.prefetch_related(*prefetches)
+
+
+def bulk_export_projects(year=None, class_name=None, leader=None):
+    """
+    Projekty pro hromadný export dokumentů (jen s přiřazeným žákem) se vším,
+    co dokumenty potřebují, seřazené podle třídy a příjmení žáka.
+    """
+    projects = Project.objects.filter(student__isnull=False).select_related(
+        'student', 'student__userprofile', 'leader', 'leader__userprofile',
+        'opponent', 'opponent__userprofile', 'scheme', 'leader_eval', 'opponent_eval',
+    ).prefetch_related(
+        Prefetch('controls', queryset=ControlCheck.objects.order_by('date'))
+    ).order_by('student_class', 'student_sort_name')
+
+    if year:
+        projects = projects.filter(school_year=year)
+    if class_name:
+        projects = projects.filter(student_class=class_name)
+    if leader:
+        projects = projects.filter(leader=leader)
+    return projects
+
+
+def _control_display(controls, index):
+    """Hodnocení kontroly, jinak její datum ('Ano' bez data), 'Ne' pokud kontrola není."""
+    if len(controls) <= index:
+        return 'Ne'
+    control = controls[index]
+    if control.evaluation:
+        return control.evaluation
+    return control.date.strftime('%d.%m.%Y') if control.date else 'Ano'
+
+
+def _teacher(project, role):
+    """Zkratka a celé jméno vedoucího / oponenta projektu (externí = 'Ext')."""
+    external = project.external_leader if role == 'leader' else project.external_opponent
+    person = project.leader if role == 'leader' else project.opponent
+    if external:
+        return "Ext", external
+    if person and hasattr(person, 'userprofile'):
+        abbreviation = person.userprofile.abbreviation or person.last_name[:3]
+        fullname = f"{person.userprofile.title} {person.first_name} {person.last_name}".strip()
+        return abbreviation, fullname
+    return "-", ""
+
+
+def project_details_rows(user, year=None, view_type='leader'):
+    """
+    Řádky přehledu projektů vedoucího / oponenta.
+    Vrací (seznam řádků, seznam zkratek učitelů s celými jmény).
+    """
+    projects = role_projects(
+        user, year, view_type,
+        order_by=('student_class', 'student_sort_name'),
+        controls=True,
+    )
+
+    projects_data = []
+    unique_teachers = {}  # zkratka -> celé jméno
+    for project in projects:
+        controls = project.sorted_checks
+
+        leader_points = project.leader_total if project.leader_total is not None else '-'
+        opponent_points = project.opponent_total if project.opponent_total is not None else '-'
+
+        # Ve pohledu oponenta se zobrazuje vedoucí a naopak
+        teacher_abbreviation, teacher_fullname = _teacher(project, 'leader' if view_type == 'opponent' else 'opponent')
+        if teacher_abbreviation and teacher_abbreviation != "-" and teacher_fullname:
+            unique_teachers[teacher_abbreviation] = teacher_fullname
+
+        projects_data.append({
+            'id': project.id,
+            # Příjmení Jméno
+            'student_name': f"{project.student.last_name} {project.student.first_name}" if project.student else "N/A",
+            'class_name': project.student.userprofile.class_name if project.student and hasattr(project.student, 'userprofile') else "N/A",
+            'title': project.title,
+            'teacher_abbreviation': teacher_abbreviation,
+            'teacher_fullname': teacher_fullname,
+            'control_1': _control_display(controls, 0),
+            'control_2': _control_display(controls, 1),
+            'control_3': _control_display(controls, 2),
+            'work_delivered': project.delivery_work_date.strftime('%d.%m.%Y') if project.delivery_work_date else 'Ne',
+            'docs_delivered': project.delivery_documentation_date.strftime('%d.%m.%Y') if project.delivery_documentation_date else 'Ne',
+            'delay_granted': project.delayed_submission_date.strftime('%d.%m.%Y') if project.delayed_submission_date else 'Ne',
+            'leader_points': leader_points,
+            'opponent_points': opponent_points,
+        })
+
+    unique_teacher_list = [{'abbreviation': abbr, 'fullname': name} for abbr, name in unique_teachers.items()]
+    return projects_data, unique_teacher_list
+
+
+def control_check_projects(user, year=None):
+    """Projekty vedoucího se seřazenými kontrolami (project.sorted_checks)."""
+    return role_projects(user, year, controls=True)
+
+
+def _milestone_row_color(milestone, today):
+    status = milestone.get_status_display()
+    overdue = milestone.deadline and milestone.deadline < today
+    if status == 'Dokončeno':
+        return 'green'
+    if status == 'Rozpracováno':
+        if overdue:
+            return 'red'
+        return 'yellow' if milestone.deadline else 'white'
+    return 'red' if overdue else 'white'
+
+
+def milestone_rows(user, year=None):
+    """Milníky projektů vedoucího seskupené podle projektů a seřazené podle termínu."""
+    today = datetime.now().date()
+    projects_data = []
+    for project in role_projects(user, year, milestones=True):
+        projects_data.append({
+            'project_title': project.title,
+            'milestones': [{
+                'title': milestone.title,
+                'deadline': milestone.deadline.strftime('%d.%m.%Y') if milestone.deadline else "N/A",
+                'status': milestone.get_status_display(),
+                'note': milestone.note,
+                'row_color': _milestone_row_color(milestone, today),
+            } for milestone in project.sorted_milestones],
+            'student_name': f"{project.student.first_name} {project.student.last_name}",
+        })
+    return projects_data
@@ -0,0 +1,79 @@
+"""
+Souhrnné PDF přehledy přes více projektů (kontroly, milníky, přehled projektů).
+
+Funkce dostávají uživatele a parametry filtru (ne request), aby je šlo
+spouštět jak přímo ve view, tak ve frontě exportů (ExportJob).
+"""
+from datetime import datetime
+from django.template.loader import render_to_string
+from .report_data import control_check_projects, milestone_rows, project_details_rows
+from .pdf import render_pdf
+from .timing import stage
+
+
+def render_control_check_pdf(user, year=None):
+    """Přehled kontrol u projektů, kde je uživatel vedoucím."""
+    projects = control_check_projects(user, year)
+    with stage('template'):
+        html_string = render_to_string('projects/pdf_control_check.html', {'projects': projects})
+    return render_pdf(html_string, ['control_check.css'])
+
+
+def render_milestones_pdf(user, year=None):
+    """
+    Všechny milníky pro projekty, kde je uživatel vedoucím.
+    Milníky jsou seskupeny podle projektů a seřazeny podle data.
+    """
+    context = {
+        'projects': milestone_rows(user, year),
+        'current_date': datetime.now()
+    }
+    with stage('template'):
+        html_string = render_to_string('projects/pdf_milestones.html', context)
+    return render_pdf(html_string, ['milestones.css'])
+
+
+def render_project_details_pdf(user, year=None, view_type='leader'):
+    """
+    Přehled projektů vedoucího / oponenta s opakovanou hlavičkou tabulky na každé stránce.
+    """
+    projects_data, unique_teacher_list = project_details_rows(user, year, view_type)
+
+    context = {
+        'projects': projects_data,
+        'selected_year': year,
+        'current_date': datetime.now(),
+        'username': f"{user.userprofile.title} {user.first_name} {user.last_name}",
+        'view_type': view_type,
+        'role': "Oponent" if view_type == 'opponent' else "Vedoucí",
+        'unique_teachers': unique_teacher_list
+    }
+
+    with stage('template'):
+        html_string = render_to_string('projects/pdf_project_details.html', context)
+    return render_pdf(html_string, ['project_details.css'])
+
+
+def report_filename(kind, params):
+    if kind == 'control_check':
+        return "prehled_kontrol.pdf"
+    if kind == 'milestones':
+        return "milestones_report.pdf"
+    if kind == 'project_details':
+        role_text = "oponent" if params.get('view_type') == 'opponent' else "vedouci"
+        return f"projekty_prehled_{role_text}_{datetime.now().strftime('%Y-%m-%d')}.pdf"
+    raise ValueError(f"Neznámý typ přehledu: {kind}")
+
+
+def render_report(kind, user, params):
+    """Vygeneruje přehled daného typu, vrací (název souboru, obsah PDF)."""
+    year = params.get('year')
+    if kind == 'control_check':
+        content = render_control_check_pdf(user, year)
+    elif kind == 'milestones':
+        content = render_milestones_pdf(user, year)
+    elif kind == 'project_details':
+        content = render_project_details_pdf(user, year, params.get('view_type', 'leader'))
+    else:
+        raise ValueError(f"Neznámý typ přehledu: {kind}")
+    return report_filename(kind, params), content
@@ -0,0 +1,64 @@
+"""
+Role přihlášeného uživatele (skupiny Teacher / Student).
+
+Skupiny se načtou jedním dotazem a výsledek se uloží přímo na objekt
+uživatele, takže další kontroly během stejného requestu už do databáze
+nejdou. UserRolesMiddleware je zpřístupní jako request.user_roles,
+context processor roles() jako user_roles / is_teacher / is_student v šablonách.
+"""
+from django.utils.functional import SimpleLazyObject
+
+TEACHER = 'Teacher'
+STUDENT = 'Student'
+
+
+class UserRoles:
+    def __init__(self, group_names):
+        self.groups = frozenset(group_names)
+
+    def __contains__(self, group_name):
+        return group_name in self.groups
+
+    @property
+    def is_teacher(self):
+        return TEACHER in self.groups
+
+    @property
+    def is_student(self):
+        return STUDENT in self.groups
+
+    def __repr__(self):
+        return f"<UserRoles {sorted(self.groups)}>"
+
+
+def get_roles(user):
+    """Role uživatele; skupiny se z databáze čtou jen jednou pro daný objekt uživatele."""
+    roles = getattr(user, '_user_roles', None)
+    if roles is None:
+        if user.is_authenticated:
+            roles = UserRoles(user.groups.values_list('name', flat=True))
+        else:
+            roles = UserRoles(())
+        user._user_roles = roles
+    return roles
+
+
+class UserRolesMiddleware:
+    """Nastaví request.user_roles (líně - dotaz proběhne až při prvním použití)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.user_roles = SimpleLazyObject(lambda: get_roles(request.user))
+        return self.get_response(request)
+
+
+def roles(request):
+    """Context processor - role přihlášeného uživatele pro šablony."""
+    user_roles = getattr(request, 'user_roles', None) or get_roles(request.user)
+    return {
+        'user_roles': user_roles,
+        'is_teacher': user_roles.is_teacher,
+        'is_student': user_roles.is_student,
+    }
@@ -0,0 +1,110 @@
+"""
+Uložený souhrn bodů projektu (Project.leader_total, opponent_total,
+max_total, final_total).
+
+Součty se počítají jen tady; signály je přepočítají po uložení/smazání
+posudku, změně schématu a před uložením projektu (viz signals.py).
+Zápis jde přes UPDATE, takže nespouští signály projektu. Chybějící
+posudek znamená None, final_total je součet existujících posudků.
+"""
+from django.db.models import Q
+from .models import Project
+
+SCORE_FIELDS = ('leader_total', 'opponent_total', 'max_total', 'final_total')
+
+_VALUES = (
+    'leader_eval__id', 'leader_eval__area1_points', 'leader_eval__area2_points', 'leader_eval__area3_points',
+    'opponent_eval__id', 'opponent_eval__area1_points', 'opponent_eval__area2_points',
+    'scheme__leader_area1_max', 'scheme__leader_area2_max', 'scheme__leader_area3_max',
+    'scheme__opponent_area1_max', 'scheme__opponent_area2_max',
+)
+
+
+def scheme_max_total(scheme):
+    """Maximum bodů vedoucího a oponenta podle schématu (None bez schématu)."""
+    if scheme is None:
+        return None
+    return (scheme.leader_area1_max + scheme.leader_area2_max + scheme.leader_area3_max
+            + scheme.opponent_area1_max + scheme.opponent_area2_max)
+
+
+def _scores(row):
+    """Souhrn bodů z řádku .values(*_VALUES)."""
+    leader_total = None
+    if row['leader_eval__id'] is not None:
+        leader_total = row['leader_eval__area1_points'] + row['leader_eval__area2_points'] + row['leader_eval__area3_points']
+    opponent_total = None
+    if row['opponent_eval__id'] is not None:
+        opponent_total = row['opponent_eval__area1_points'] + row['opponent_eval__area2_points']
+
+    max_total = None
+    if row['scheme__leader_area1_max'] is not None:
+        max_total = sum(row[f'scheme__{field}'] for field in (
+            'leader_area1_max', 'leader_area2_max', 'leader_area3_max', 'opponent_area1_max', 'opponent_area2_max'))
+
+    final_total = None
+    if leader_total is not None or opponent_total is not None:
+        final_total = (leader_total or 0) + (opponent_total or 0)
+
+    return {
+        'leader_total': leader_total,
+        'opponent_total': opponent_total,
+        'max_total': max_total,
+        'final_total': final_total,
+    }
+
+
+def project_scores(project_id):
+    """Aktuální souhrn bodů projektu načtený jedním dotazem."""
+    row = Project.objects.filter(pk=project_id).values(*_VALUES).first()
+    return _scores(row) if row else None
+
+
+def refresh_project_scores(project_id, instance=None):
+    """
+    Přepočítá a uloží souhrn bodů jednoho projektu. Předaná instance
+    projektu dostane nové hodnoty také, aby je pozdější save() nepřepsal.
+    """
+    scores = project_scores(project_id)
+    if scores is None:
+        return None
+    Project.objects.filter(pk=project_id).update(**scores)
+    if instance is not None:
+        for field, value in scores.items():
+            setattr(instance, field, value)
+    return scores
+
+
+def refresh_scheme_scores(scheme):
+    """Po změně maxim ve schématu přepíše max_total všech jeho projektů jedním UPDATE."""
+    max_total = scheme_max_total(scheme)
+    return Project.objects.filter(scheme=scheme).exclude(
+        Q(max_total=max_total) if max_total is not None else Q(max_total__isnull=True)
+    ).update(max_total=max_total)
+
+
+def clear_orphaned_max_total():
+    """Projekty, kterým smazání schématu nastavilo scheme=NULL, už maximum nemají."""
+    return Project.objects.filter(scheme__isnull=True, max_total__isnull=False).update(max_total=None)
+
+
+def recompute_scores(batch_size=500):
+    """
+    Přepočítá souhrn bodů všech projektů (backfill), po dávkách podle pk.
+    Vrací počet projektů, u kterých se souhrn změnil.
+    """
+    queryset = Project.objects.order_by('pk').values('pk', *SCORE_FIELDS, *_VALUES)
+    changed = 0
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not rows:
+            return changed
+        last_pk = rows[-1]['pk']
+        updates = []
+        for row in rows:
+            scores = _scores(row)
+            if any(row[field] != value for field, value in scores.items()):
+                updates.append(Project(pk=row['pk'], **scores))
+        Project.objects.bulk_update(updates, SCORE_FIELDS)
+        changed += len(updates)
@@ -0,0 +1,124 @@
+"""
+Fulltextové hledání v projektech (název, zadání, popis).
+
+Na PostgreSQL se hledá v uloženém sloupci Project.search_vector (GIN
+index) s konfigurací cs_unaccent - jednoduchý slovník bez stemmingu,
+diakritika se odstraní přes unaccent, takže "reseni" najde "řešení".
+Sloupec přepočítá signál po uložení projektu. Každé slovo dotazu se
+hledá i jako prefix, výsledky se řadí podle ts_rank (název má největší
+váhu). Na SQLite (vývoj, testy) se místo toho hledá přes icontains
+a pořadí dává počet polí, ve kterých se slovo našlo.
+
+Zvýraznění shod (highlight) se dělá v Pythonu nad textem bez HTML
+značek pro obě databáze, aby do stránky nešel neescapovaný obsah
+z editoru.
+"""
+import html
+import re
+import unicodedata
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+from .models import Project
+
+SEARCH_CONFIG = 'cs_unaccent'
+MAX_TERMS = 8
+SNIPPET_LENGTH = 200
+
+# Váhy polí: název A, zadání B, popis C (SQLite: body za shodu v poli)
+SEARCH_FIELDS = (('title', 'A', 3), ('assignment', 'B', 2), ('description', 'C', 1))
+
+
+def uses_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def search_terms(query):
+    """Slova dotazu (jen písmena a číslice, max. MAX_TERMS)."""
+    return re.findall(r'\w+', query or '')[:MAX_TERMS]
+
+
+def project_search_vector():
+    """Výraz pro Project.search_vector (stejný jako v migraci 0029)."""
+    vector = None
+    for field, weight, _ in SEARCH_FIELDS:
+        part = SearchVector(field, config=SEARCH_CONFIG, weight=weight)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def update_search_vector(project_id):
+    """Přepočítá uložený search_vector projektu (jen PostgreSQL)."""
+    if uses_postgres():
+        Project.objects.filter(pk=project_id).update(search_vector=project_search_vector())
+
+
+def update_search_vectors(project_ids):
+    """Přepočítá search_vector více projektů jedním UPDATE (po bulk_create)."""
+    if uses_postgres() and project_ids:
+        Project.objects.filter(pk__in=project_ids).update(search_vector=project_search_vector())
+
+
+def search_projects(queryset, query):
+    """
+    Projekty odpovídající všem slovům dotazu s anotací rank (vyšší = lepší).
+    Prázdný dotaz queryset nemění.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+
+    if uses_postgres():
+        # Slova jsou jen \w, takže je lze bezpečně poskládat do tsquery
+        tsquery = SearchQuery(' & '.join(f"{term}:*" for term in terms), config=SEARCH_CONFIG, search_type='raw')
+        return queryset.filter(search_vector=tsquery).annotate(rank=SearchRank(F('search_vector'), tsquery))
+
+    rank = Value(0)
+    for term in terms:
+        matches = Q()
+        for field, _, points in SEARCH_FIELDS:
+            matches |= Q(**{f'{field}__icontains': term})
+            rank = rank + Case(When(**{f'{field}__icontains': term}, then=Value(points)),
+                               default=Value(0), output_field=IntegerField())
+        queryset = queryset.filter(matches)
+    return queryset.annotate(rank=rank)
+
+
+def _fold(char):
+    """Znak bez diakritiky, malým písmenem (vždy jeden znak, aby seděly pozice)."""
+    base = unicodedata.normalize('NFKD', char)[:1].lower()
+    return base if base and not unicodedata.combining(base) else char.lower()
+
+
+def highlight(text, query, length=SNIPPET_LENGTH):
+    """
+    Úryvek textu (bez HTML) kolem první shody se zvýrazněnými slovy dotazu (<mark>).
+    Bez shody vrací začátek textu; výsledek je escapovaný.
+    """
+    text = ' '.join(html.unescape(strip_tags(text or '')).split())
+    terms = [''.join(_fold(c) for c in term) for term in search_terms(query)]
+    folded = ''.join(_fold(c) for c in text)
+    matches = []
+    if terms:
+        pattern = re.compile('|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)))
+        matches = [m.span() for m in pattern.finditer(folded)]
+
+    start = 0
+    if matches and len(text) > length:
+        start = max(0, min(matches[0][0] - length // 4, len(text) - length))
+    end = min(len(text), start + length)
+
+    parts = ['…' if start > 0 else '']
+    position = start
+    for match_start, match_end in matches:
+        if match_end <= start or match_start >= end:
+            continue
+        match_start, match_end = max(match_start, start), min(match_end, end)
+        parts.append(escape(text[position:match_start]))
+        parts.append(f'<mark>{escape(text[match_start:match_end])}</mark>')
+        position = match_end
+    parts.append(escape(text[position:end]))
+    parts.append('…' if end < len(text) else '')
+    return mark_safe(''.join(parts))
@@ -0,0 +1,25 @@
+"""
+Session uložená v DB s cache před ní (cached_db) a s limitem velikosti hodnot.
+
+Čtení session obslouží cache SESSION_CACHE_ALIAS, do django_session se
+zapisuje jen při změně. Aby řádek session zůstal malý, nesmí jedna hodnota
+po serializaci přesáhnout SESSION_VALUE_MAX_BYTES - objemná data (logy
+importů, hesla) patří do krátkodobého úložiště (transient.py) a session
+drží jen jejich ID.
+"""
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+
+class SessionValueTooLarge(ValueError):
+    pass
+
+
+class SessionStore(CachedDBStore):
+    def __setitem__(self, key, value):
+        size = len(self.serializer().dumps(value))
+        if size > settings.SESSION_VALUE_MAX_BYTES:
+            raise SessionValueTooLarge(
+                f"Hodnota session '{key}' má {size} B (limit {settings.SESSION_VALUE_MAX_BYTES} B)."
+            )
+        super().__setitem__(key, value)
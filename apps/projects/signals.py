@@ -0,0 +1,186 @@
+"""
+Signály aplikace projects. Registrují se v ProjectsConfig.ready().
+"""
+import os
+from django.contrib.auth.models import Group, User
+from django.core.files.base import ContentFile
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from apps.profiles.models import UserProfile
+from .models import Project, LeaderEvaluation, OpponentEvaluation, ControlCheck, ScoringScheme, UserPreferences
+from .export_cache import cache, project_namespace
+from . import db_metrics, reference_data
+from .roles import TEACHER
+from .scores import refresh_project_scores, refresh_scheme_scores, clear_orphaned_max_total
+from .sort_keys import (
+    SOURCE_FIELDS, SORT_KEY_FIELDS, apply_sort_keys, refresh_scheme_year, clear_orphaned_year,
+    refresh_student_name, refresh_student_class, clear_orphaned_student,
+)
+from .search import update_search_vector
+from .signatures import normalize_signature
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_project_exports(sender, instance, **kwargs):
+    """Změna projektu zneplatní všechny jeho vygenerované exporty."""
+    cache.invalidate(project_namespace(instance.pk))
+
+
+@receiver(post_save, sender=LeaderEvaluation)
+@receiver(post_delete, sender=LeaderEvaluation)
+@receiver(post_save, sender=OpponentEvaluation)
+@receiver(post_delete, sender=OpponentEvaluation)
+@receiver(post_save, sender=ControlCheck)
+@receiver(post_delete, sender=ControlCheck)
+def invalidate_related_exports(sender, instance, **kwargs):
+    cache.invalidate(project_namespace(instance.project_id))
+
+
+@receiver(pre_save, sender=Project)
+def set_project_sort_keys(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Rok, třída a jméno žáka pro řazení podle aktuálního schématu a žáka."""
+    if raw:
+        return
+    if update_fields is not None and not SOURCE_FIELDS & set(update_fields):
+        return
+    apply_sort_keys(instance)
+
+
+@receiver(post_save, sender=Project)
+def save_partial_sort_keys(sender, instance, update_fields=None, raw=False, **kwargs):
+    """save(update_fields=[... 'scheme'/'student' ...]) klíče sám neuloží."""
+    if raw or update_fields is None or not SOURCE_FIELDS & set(update_fields):
+        return
+    if not set(SORT_KEY_FIELDS) <= set(update_fields):
+        Project.objects.filter(pk=instance.pk).update(
+            **{field: getattr(instance, field) for field in SORT_KEY_FIELDS})
+
+
+@receiver(post_save, sender=ScoringScheme)
+def sync_scheme_year(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        refresh_scheme_year(instance)
+
+
+@receiver(post_save, sender=User)
+def sync_student_name(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    # Přihlášení ukládá jen last_login
+    if raw or created or (update_fields is not None and not {'first_name', 'last_name'} & set(update_fields)):
+        return
+    refresh_student_name(instance)
+
+
+@receiver(post_save, sender=UserProfile)
+def sync_student_class(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        refresh_student_class(instance)
+
+
+@receiver(post_delete, sender=User)
+def clear_student_keys(sender, instance, **kwargs):
+    clear_orphaned_student()
+
+
+@receiver(post_save, sender=Project)
+def sync_search_vector(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Fulltext se přepočítá, jen pokud se mohl změnit název, zadání nebo popis."""
+    if raw or (update_fields is not None and not {'title', 'assignment', 'description'} & set(update_fields)):
+        return
+    update_search_vector(instance.pk)
+
+
+@receiver(post_save, sender=Project)
+def sync_project_scores(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """
+    Plné uložení projektu mohlo přepsat souhrn bodů hodnotami z instance
+    nebo změnit schéma - přepočítá se. save(update_fields=...) bez schématu
+    souhrn nemění.
+    """
+    if raw:
+        return
+    if update_fields is not None and 'scheme' not in update_fields:
+        return
+    refresh_project_scores(instance.pk, instance)
+
+
+@receiver(post_save, sender=LeaderEvaluation)
+@receiver(post_delete, sender=LeaderEvaluation)
+@receiver(post_save, sender=OpponentEvaluation)
+@receiver(post_delete, sender=OpponentEvaluation)
+def sync_evaluation_scores(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Projekt načtený u posudku (typicky ten, se kterým pracuje view) dostane nové součty také
+    project = instance._state.fields_cache.get('project')
+    refresh_project_scores(instance.project_id, project)
+
+
+@receiver(post_save, sender=ScoringScheme)
+def sync_scheme_scores(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_scheme_scores(instance)
+
+
+@receiver(post_delete, sender=ScoringScheme)
+def clear_scheme_scores(sender, instance, **kwargs):
+    clear_orphaned_max_total()
+    clear_orphaned_year()
+
+
+@receiver(post_save, sender=ScoringScheme)
+@receiver(post_delete, sender=ScoringScheme)
+def invalidate_scheme_reference_data(sender, instance, **kwargs):
+    reference_data.invalidate(reference_data.YEARS, reference_data.ACTIVE_SCHEME)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_class_reference_data(sender, instance, **kwargs):
+    reference_data.invalidate(reference_data.CLASSES)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_teacher_reference_data(sender, instance, update_fields=None, **kwargs):
+    # Přihlášení ukládá jen last_login
+    if update_fields is not None and not {'username', 'first_name', 'last_name'} & set(update_fields):
+        return
+    reference_data.invalidate(reference_data.TEACHERS)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_teacher_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    """Přidání / odebrání uživatele ve skupině Teacher (z obou stran vazby)."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        affected = instance.name == TEACHER
+    else:
+        affected = pk_set is None or Group.objects.filter(pk__in=pk_set, name=TEACHER).exists()
+    if affected:
+        reference_data.invalidate(reference_data.TEACHERS)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_teacher_group(sender, instance, **kwargs):
+    reference_data.invalidate(reference_data.TEACHERS)
+
+
+@receiver(pre_save, sender=UserPreferences)
+def prepare_signature(sender, instance, **kwargs):
+    """Nově nahraný podpis se hned upraví na tiskovou velikost (viz signatures.py)."""
+    signature = instance.signature
+    if not signature or signature._committed:
+        return
+    data = normalize_signature(signature.file)
+    name = os.path.splitext(os.path.basename(signature.name))[0] + '.png'
+    signature.save(name, ContentFile(data), save=False)
+
+
+@receiver(connection_created)
+def count_new_connection(sender, connection, **kwargs):
+    """Statistiky spojení (db_metrics.py): request otevřel nové spojení."""
+    db_metrics.connection_opened(connection)
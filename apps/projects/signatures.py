@@ -0,0 +1,76 @@
+"""
+Podpisy učitelů pro exportované dokumenty.
+
+Podpis se upraví už při nahrání (oříznutí okrajů, zmenšení na tiskovou
+velikost, nová komprese) a připravená data se drží v cache Djanga
+(SIGNATURE_CACHE_TIMEOUT). Klíč obsahuje název souboru podpisu - nově
+nahraný podpis má jiný název, takže ho hned použijí všechny procesy,
+i když mají vlastní lokální cache.
+"""
+import hashlib
+import io
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image, ImageChops, ImageOps
+from .models import UserPreferences
+
+SIGNATURE_WIDTH_CM = 2.5   # šířka podpisu v dokumentech
+SIGNATURE_DPI = 300
+SIGNATURE_WIDTH_PX = round(SIGNATURE_WIDTH_CM / 2.54 * SIGNATURE_DPI)
+
+# Pixely světlejší než tato odchylka od bílé se berou jako pozadí
+TRIM_THRESHOLD = 20
+
+
+def _cache_key(user_id, name):
+    digest = hashlib.sha256(name.encode('utf-8')).hexdigest()[:16]
+    return f"projects:signature:{user_id}:{digest}"
+
+
+def normalize_signature(image_file):
+    """Oříznutý, zmenšený a znovu zkomprimovaný podpis jako PNG (bytes)."""
+    image = ImageOps.exif_transpose(Image.open(image_file))
+    image = image.convert('RGBA')
+
+    # Oříznutí prázdných okrajů - bílé nebo průhledné pixely
+    white = Image.new('RGB', image.size, 'white')
+    ink = ImageChops.difference(image.convert('RGB'), white).convert('L')
+    ink = ink.point(lambda p: 255 if p > TRIM_THRESHOLD else 0)
+    ink = ImageChops.multiply(ink, image.getchannel('A'))
+    bbox = ink.getbbox()
+    if bbox:
+        image = image.crop(bbox)
+
+    if image.width > SIGNATURE_WIDTH_PX:
+        height = max(1, round(image.height * SIGNATURE_WIDTH_PX / image.width))
+        image = image.resize((SIGNATURE_WIDTH_PX, height), Image.LANCZOS)
+
+    if image.getchannel('A').getextrema() == (255, 255):
+        image = image.convert('RGB')  # bez průhlednosti je PNG menší
+
+    output = io.BytesIO()
+    image.save(output, format='PNG', optimize=True, dpi=(SIGNATURE_DPI, SIGNATURE_DPI))
+    return output.getvalue()
+
+
+def signature_image(user):
+    """Připravený podpis uživatele (PNG bytes) pro vložení do dokumentu, nebo None."""
+    if user is None:
+        return None
+    try:
+        user_prefs = user.preferences
+    except UserPreferences.DoesNotExist:
+        return None
+    if not user_prefs.signature:
+        return None
+    key = _cache_key(user.pk, user_prefs.signature.name)
+    data = cache.get(key)
+    if data is None:
+        try:
+            with user_prefs.signature.open('rb') as f:
+                # starší podpisy nahrané před úpravou se připraví tady
+                data = normalize_signature(f)
+        except (OSError, ValueError):
+            data = b""
+        cache.set(key, data, settings.SIGNATURE_CACHE_TIMEOUT)
+    return data or None
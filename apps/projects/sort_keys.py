@@ -0,0 +1,109 @@
+"""
+Kopie řadicích a filtrovacích klíčů v projektu (Project.school_year,
+student_class, student_sort_name).
+
+Seznamy a exporty filtrují podle roku a řadí podle třídy a příjmení;
+díky kopiím v projektu k tomu nepotřebují join přes schéma, uživatele
+a profil a stačí jim složené indexy z Project.Meta. Hodnoty nastaví
+pre_save projektu, změny schématu, uživatele a profilu se promítnou
+hromadným UPDATE (viz signals.py).
+"""
+from django.contrib.auth.models import User
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Trim
+from apps.profiles.models import UserProfile
+from .models import Project, ScoringScheme
+
+SORT_KEY_FIELDS = ('school_year', 'student_class', 'student_sort_name')
+# Změna těchto polí projektu mění i klíče
+SOURCE_FIELDS = {'scheme', 'student'}
+
+
+def sort_name(first_name, last_name):
+    """Jméno pro řazení: "Příjmení Jméno"."""
+    return f"{last_name} {first_name}".strip()
+
+
+def _student_keys(student_id, student=None):
+    if student_id is None:
+        return '', ''
+    if student is not None:
+        profile = getattr(student, 'userprofile', None)
+        return (profile.class_name or '') if profile else '', sort_name(student.first_name, student.last_name)
+    row = User.objects.filter(pk=student_id).values('first_name', 'last_name', 'userprofile__class_name').first()
+    if row is None:
+        return '', ''
+    return row['userprofile__class_name'] or '', sort_name(row['first_name'], row['last_name'])
+
+
+def project_sort_keys(project):
+    """
+    Klíče projektu podle jeho schématu a žáka. Již načtené relace se použijí,
+    jinak stačí jeden malý dotaz na každou z nich.
+    """
+    fields_cache = project._state.fields_cache
+    scheme = fields_cache.get('scheme')
+    if project.scheme_id is None:
+        school_year = ''
+    elif scheme is not None:
+        school_year = scheme.year
+    else:
+        school_year = ScoringScheme.objects.filter(pk=project.scheme_id).values_list('year', flat=True).first() or ''
+    student_class, student_sort_name = _student_keys(project.student_id, fields_cache.get('student'))
+    return {
+        'school_year': school_year,
+        'student_class': student_class,
+        'student_sort_name': student_sort_name,
+    }
+
+
+def apply_sort_keys(project):
+    """Nastaví klíče na instanci (před uložením)."""
+    keys = project_sort_keys(project)
+    for field, value in keys.items():
+        setattr(project, field, value)
+    return keys
+
+
+def refresh_scheme_year(scheme):
+    """Přejmenování školního roku ve schématu."""
+    return Project.objects.filter(scheme=scheme).exclude(school_year=scheme.year).update(school_year=scheme.year)
+
+
+def clear_orphaned_year():
+    """Projekty, kterým smazání schématu nastavilo scheme=NULL."""
+    return Project.objects.filter(scheme__isnull=True).exclude(school_year='').update(school_year='')
+
+
+def refresh_student_name(user):
+    """Změna jména žáka."""
+    name = sort_name(user.first_name, user.last_name)
+    return Project.objects.filter(student=user).exclude(student_sort_name=name).update(student_sort_name=name)
+
+
+def refresh_student_class(profile):
+    """Změna třídy v profilu žáka."""
+    class_name = profile.class_name or ''
+    return Project.objects.filter(student_id=profile.user_id).exclude(
+        student_class=class_name).update(student_class=class_name)
+
+
+def refresh_students(user_ids):
+    """
+    Jméno a třída žáků po hromadné změně uživatelů / profilů (bulk_update
+    neposílá signály) - jeden UPDATE pro všechny jejich projekty.
+    """
+    users = User.objects.filter(pk=OuterRef('student_id'))
+    profiles = UserProfile.objects.filter(user_id=OuterRef('student_id'))
+    return Project.objects.filter(student_id__in=user_ids).update(
+        student_class=Coalesce(Subquery(profiles.values('class_name')[:1]), Value('')),
+        student_sort_name=Trim(Concat(
+            Subquery(users.values('last_name')[:1]), Value(' '), Subquery(users.values('first_name')[:1]),
+        )),
+    )
+
+
+def clear_orphaned_student():
+    """Projekty, kterým smazání žáka nastavilo student=NULL."""
+    return Project.objects.filter(student__isnull=True).exclude(
+        student_class='', student_sort_name='').update(student_class='', student_sort_name='')
@@ -0,0 +1,47 @@
+"""
+Pomocné nástroje pro streamované odpovědi (ZIP archivy generované za běhu).
+"""
+import zipfile
+
+
+class _StreamBuffer:
+    """
+    Minimální "soubor" pro zipfile, který si jen drží zapsané bloky.
+    Nemá seek(), takže zipfile zapisuje v režimu bez převíjení
+    (data descriptor za každým souborem) a archiv lze posílat průběžně.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(entries):
+    """
+    Generátor ZIP archivu. `entries` je iterovatelný zdroj dvojic
+    (název souboru, obsah v bytes); každý soubor se zapíše a odešle hned,
+    jak je k dispozici, v paměti je tedy vždy nejvýš jeden dokument.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in entries:
+            archive.writestr(name, content)
+            yield buffer.pop()
+    # Centrální adresář se zapisuje až při zavření archivu
+    yield buffer.pop()
@@ -1,3 +1,1008 @@
-from django.test import TestCase
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
 
 # Create your tests here.
+from datetime import date
+from django.contrib.auth.models import User, Group
+from django.core.cache import cache, caches
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .models import Project, ScoringScheme, LeaderEvaluation, OpponentEvaluation
+
+
+class ProjectDataMixin:
+    """Učitelé, schéma a generování projektů s posudky (22 / 17 bodů)."""
+
+    def setUp(self):
+        # Číselníky v cache (reference_data.py) nesmí přežít rollback předchozího testu
+        cache.clear()
+        caches['reference'].clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        teachers = Group.objects.create(name='Teacher')
+        cls.students = Group.objects.create(name='Student')
+        cls.scheme = ScoringScheme.objects.create(year='2024/2025', active=True)
+        cls.teacher = User.objects.create_user('ucitel', password='heslo', last_name='Učitel')
+        cls.teacher.groups.add(teachers)
+        cls.opponent = User.objects.create_user('oponent', password='heslo', last_name='Oponent')
+        cls.opponent.groups.add(teachers)
+
+    def create_projects(self, count):
+        start = Project.objects.count()
+        for i in range(start, start + count):
+            student = User.objects.create_user(f'zak{i}', last_name=f'Žák{i}')
+            student.groups.add(self.students)
+            student.userprofile.class_name = '4.A'
+            student.userprofile.save()
+            project = Project.objects.create(
+                title=f'Projekt {i}', description='popis', student=student, leader=self.teacher,
+                opponent=self.opponent, scheme=self.scheme, delivery_work_date=date(2025, 4, 1),
+            )
+            LeaderEvaluation.objects.create(project=project, area1_points=10, area2_points=5, area3_points=7)
+            OpponentEvaluation.objects.create(project=project, area1_points=8, area2_points=9)
+
+
+class ProjectListQueryCountTest(ProjectDataMixin, TestCase):
+    """Seznam projektů musí mít stejný počet dotazů bez ohledu na počet řádků."""
+
+    # Celá stránka včetně uživatele a skupin; session a číselníky pro filtry jsou v cache
+    EXPECTED_QUERIES = 4
+
+    def get_list(self):
+        url = reverse('projects:list') + '?my_projects=0&class='
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_is_constant(self):
+        self.client.force_login(self.teacher)
+
+        # Vždy až druhé zobrazení - číselníky jsou už v cache
+        self.create_projects(2)
+        self.get_list()
+        response, small = self.get_list()
+        self.assertEqual(len(response.context['projects']), 2)
+
+        self.create_projects(10)
+        self.get_list()
+        response, large = self.get_list()
+        self.assertEqual(len(response.context['projects']), 12)
+
+        self.assertEqual(small, large)
+        self.assertEqual(large, self.EXPECTED_QUERIES)
+
+    def test_points_are_listed(self):
+        self.client.force_login(self.teacher)
+        self.create_projects(1)
+        response, _ = self.get_list()
+        project = response.context['projects'][0]
+        self.assertEqual(project.leader_total, 22)
+        self.assertEqual(project.opponent_total, 17)
+        self.assertContains(response, '22 / 17')
+
+
+class ReferenceDataTest(ProjectDataMixin, TestCase):
+    """Číselníky v cache se zneplatní změnou schématu, profilu a skupiny Teacher."""
+
+    def test_invalidation(self):
+        from . import reference_data
+        self.assertEqual(reference_data.active_scheme(), self.scheme)
+        self.assertEqual([t['id'] for t in reference_data.teachers()], [self.opponent.pk, self.teacher.pk])
+        self.assertEqual(reference_data.class_names(), [])
+
+        with self.assertNumQueries(0):
+            reference_data.active_scheme()
+            reference_data.teachers()
+            reference_data.class_names()
+
+        self.scheme.active = False
+        self.scheme.save()
+        ScoringScheme.objects.create(year='2025/2026', active=True)
+        self.assertEqual(reference_data.active_scheme().year, '2025/2026')
+        self.assertEqual(reference_data.school_years(), ['2024/2025', '2025/2026'])
+
+        self.teacher.groups.clear()
+        self.assertEqual([t['id'] for t in reference_data.teachers()], [self.opponent.pk])
+        self.create_projects(1)
+        self.assertEqual(reference_data.class_names(), ['4.A'])
+
+    def test_active_scheme_shared_between_workers(self):
+        # Jiný worker má vlastní lokální paměť, signál smaže jen sdílenou položku
+        from django.core.cache.backends.locmem import LocMemCache
+        from . import reference_data
+        other_worker = LocMemCache('other-worker', {})
+        with mock.patch.object(reference_data, 'cache', other_worker):
+            self.assertEqual(reference_data.active_scheme(), self.scheme)
+
+        self.scheme.active = False
+        self.scheme.save()
+        scheme = ScoringScheme.objects.create(year='2025/2026', active=True)
+        with mock.patch.object(reference_data, 'cache', other_worker):
+            self.assertEqual(reference_data.active_scheme(), scheme)
+
+
+class ProjectScoreSummaryTest(ProjectDataMixin, TestCase):
+    """Uložený souhrn bodů projektu drží krok s posudky a schématem."""
+
+    def test_totals_follow_evaluations(self):
+        self.create_projects(1)
+        project = Project.objects.get()
+        self.assertEqual((project.leader_total, project.opponent_total, project.final_total), (22, 17, 39))
+        self.assertEqual(project.max_total, 70)
+
+        project.leader_eval.area1_points = 1
+        project.leader_eval.save()
+        self.assertEqual(project.leader_total, 13)
+        project.opponent_eval.delete()
+        project.save()
+        project.refresh_from_db()
+        self.assertEqual((project.leader_total, project.opponent_total, project.final_total), (13, None, 13))
+
+    def test_scheme_change_updates_max_total(self):
+        self.create_projects(2)
+        self.scheme.opponent_area2_max = 5
+        self.scheme.save()
+        self.assertEqual(set(Project.objects.values_list('max_total', flat=True)), {60})
+
+    def test_backfill(self):
+        from .scores import recompute_scores
+        self.create_projects(2)
+        Project.objects.update(leader_total=None, opponent_total=None, max_total=None, final_total=None)
+        self.assertEqual(recompute_scores(), 2)
+        self.assertEqual(set(Project.objects.values_list('final_total', flat=True)), {39})
+        self.assertEqual(recompute_scores(), 0)
+
+    def test_migration_backfill(self):
+        import importlib
+        from django.db.migrations.loader import MigrationLoader
+        migration = importlib.import_module('apps.projects.migrations.0026_project_score_summary')
+        self.create_projects(2)
+        OpponentEvaluation.objects.filter(project__title='Projekt 1').delete()
+        totals = Project.objects.order_by('pk').values_list('leader_total', 'opponent_total', 'max_total', 'final_total')
+        self.assertEqual(list(totals), [(22, 17, 70, 39), (22, None, 70, 22)])
+        Project.objects.update(leader_total=None, opponent_total=None, max_total=None, final_total=None)
+
+        apps = MigrationLoader(connection).project_state(('projects', '0026_project_score_summary')).apps
+        # Backfill používá ze schema editoru jen alias spojení (SQLite v transakci editor neotevře)
+        migration.fill_score_summary(apps, mock.Mock(connection=connection))
+        self.assertEqual(list(totals), [(22, 17, 70, 39), (22, None, 70, 22)])
+
+
+class ProjectSortKeysTest(ProjectDataMixin, TestCase):
+    """Kopie roku, třídy a jména žáka v projektu sledují schéma, uživatele i profil."""
+
+    def keys(self, project):
+        project.refresh_from_db()
+        return project.school_year, project.student_class, project.student_sort_name
+
+    def test_keys_follow_changes(self):
+        self.create_projects(1)
+        project = Project.objects.get()
+        student = project.student
+        self.assertEqual(self.keys(project), ('2024/2025', '4.A', 'Žák0'))
+
+        student.first_name = 'Jan'
+        student.save()
+        student.userprofile.class_name = '3.B'
+        student.userprofile.save()
+        self.scheme.year = '2025/2026'
+        self.scheme.save()
+        self.assertEqual(self.keys(project), ('2025/2026', '3.B', 'Žák0 Jan'))
+
+        project.student = None
+        project.save(update_fields=['student'])
+        self.assertEqual(self.keys(project), ('2025/2026', '', ''))
+
+    def test_deleted_student_and_scheme(self):
+        self.create_projects(1)
+        project = Project.objects.get()
+        project.student.delete()
+        self.scheme.delete()
+        self.assertEqual(self.keys(project), ('', '', ''))
+
+
+class ProjectListPaginationTest(ProjectDataMixin, TestCase):
+    """Keyset stránkování a povolené řazení seznamu projektů."""
+
+    def get_page(self, query):
+        response = self.client.get(reverse('projects:list') + query)
+        self.assertEqual(response.status_code, 200)
+        return response.context
+
+    @override_settings(PROJECT_LIST_PAGE_SIZE=5)
+    def test_pages_cover_list_once(self):
+        self.client.force_login(self.teacher)
+        self.create_projects(12)
+        expected = list(Project.objects.order_by('-title', '-id').values_list('pk', flat=True))
+
+        seen = []
+        context = self.get_page('?my_projects=0&class=&ordering=-title')
+        self.assertIsNone(context['previous_page_url'])
+        seen += [project.pk for project in context['projects']]
+        while context['next_page_url']:
+            context = self.get_page(context['next_page_url'])
+            seen += [project.pk for project in context['projects']]
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(context['projects']), 2)
+
+        context = self.get_page(context['previous_page_url'])
+        self.assertEqual([project.pk for project in context['projects']], expected[5:10])
+
+    def test_unknown_ordering_is_ignored(self):
+        self.client.force_login(self.teacher)
+        self.create_projects(2)
+        context = self.get_page('?my_projects=0&class=&ordering=student__password')
+        self.assertEqual(context['selected_ordering'], '')
+        self.assertEqual(len(context['projects']), 2)
+
+
+class ProjectSearchTest(ProjectDataMixin, TestCase):
+    """Hledání v seznamu projektů (na SQLite přes icontains) a zvýraznění shod."""
+
+    def test_search_filters_and_ranks(self):
+        self.client.force_login(self.teacher)
+        self.create_projects(3)
+        first, second, third = Project.objects.order_by('pk')
+        first.description = '<p>Meteostanice s čidlem teploty</p>'
+        first.save()
+        second.title = 'Meteostanice pro školu'
+        second.save()
+
+        response = self.client.get(reverse('projects:list') + '?my_projects=0&class=&q=meteostanice')
+        projects = response.context['projects']
+        # Shoda v názvu má přednost před shodou v popisu
+        self.assertEqual([project.pk for project in projects], [second.pk, first.pk])
+        self.assertContains(response, '<mark>Meteostanice</mark> pro školu', html=False)
+        self.assertEqual(str(projects[1].search_snippet), '<mark>Meteostanice</mark> s čidlem teploty')
+
+    def test_highlight_ignores_accents_and_escapes(self):
+        from .search import highlight
+        self.assertEqual(str(highlight('Řešení <b>úlohy</b> & test', 'reseni')), '<mark>Řešení</mark> úlohy &amp; test')
+        snippet = str(highlight('slovo ' * 100 + 'hledané ' + 'slovo ' * 100, 'hledane', length=40))
+        self.assertTrue(snippet.startswith('…') and snippet.endswith('…'))
+        self.assertIn('<mark>hledané</mark>', snippet)
+
+
+class ProjectNavigationTest(ProjectDataMixin, TestCase):
+    """Předchozí / další projekt v detailu podle filtru posledního seznamu."""
+
+    def test_neighbours_follow_list_order(self):
+        self.client.force_login(self.teacher)
+        self.create_projects(4)
+        response = self.client.get(reverse('projects:list') + '?my_projects=0&class=&ordering=-title')
+        ids = [project.pk for project in response.context['projects']]
+        self.assertEqual(len(ids), 4)
+        self.assertNotIn('filtered_projects', self.client.session.keys())
+
+        response = self.client.get(reverse('projects:detail', args=[ids[1]]))
+        self.assertEqual((response.context['prev_project'], response.context['next_project']), (ids[0], ids[2]))
+        response = self.client.get(reverse('projects:detail', args=[ids[0]]))
+        self.assertEqual((response.context['prev_project'], response.context['next_project']), (None, ids[1]))
+
+    def test_project_outside_filter_has_no_neighbours(self):
+        self.client.force_login(self.teacher)
+        self.create_projects(2)
+        project = Project.objects.first()
+        self.client.get(reverse('projects:list') + '?my_projects=0&class=&status=finished')
+        response = self.client.get(reverse('projects:detail', args=[project.pk]))
+        self.assertEqual((response.context['prev_project'], response.context['next_project']), (None, None))
+
+    def test_tampered_cookie_is_ignored(self):
+        self.client.force_login(self.teacher)
+        self.create_projects(2)
+        self.client.cookies['project_nav'] = '{"status":""}'
+        response = self.client.get(reverse('projects:detail', args=[Project.objects.first().pk]))
+        self.assertIsNone(response.context['next_project'])
+
+
+class ProjectDetailQueryCountTest(ProjectDataMixin, TestCase):
+    """Detail projektu nesmí dělat dotaz na každou kontrolu, milník nebo posudek."""
+
+    # Uživatel, skupiny, projekt se vším přes select_related, kontroly, milníky (session je v cache)
+    EXPECTED_QUERIES = 5
+
+    def test_query_count_is_constant(self):
+        self.client.force_login(self.teacher)
+        self.create_projects(1)
+        project = Project.objects.get()
+        for i in range(5):
+            project.controls.create(date=date(2025, 1, 10 + i), content='kontrola', evaluation='OK' if i % 2 else '')
+            project.milestones.create(title=f'Milník {i}', status='done' if i < 2 else 'not_started')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('projects:detail', args=[project.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), self.EXPECTED_QUERIES)
+        self.assertEqual(response.context['completion_percentage'], 40)
+        self.assertEqual(response.context['control1_status'], 'overdue')
+        self.assertEqual(response.context['control2_status'], 'evaluated')
+        self.assertEqual(response.context['leader_total_points'], 22)
+
+
+# Replika jako samostatný SQLite soubor (evidence_mp.test_settings)
+SQLITE_REPLICA = settings.DATABASES.get('replica', {}).get('ENGINE', '').endswith('sqlite3')
+
+
+@skipUnless(SQLITE_REPLICA, "Spusťte s --settings=evidence_mp.test_settings")
+class ReplicaRoutingTest(ProjectDataMixin, TransactionTestCase):
+    """Přehledy se čtou z repliky, dokud uživatel sám nezapíše do primární databáze."""
+
+    databases = {'default', 'replica'} if SQLITE_REPLICA else {'default'}
+
+    def setUp(self):
+        super().setUp()
+        self.setUpTestData()
+
+    def replicate(self):
+        # "Replikace" = kopie primárního SQLite souboru do repliky
+        for alias in ('default', 'replica'):
+            connections[alias].ensure_connection()
+        connections['default'].connection.backup(connections['replica'].connection)
+
+    def overview_titles(self):
+        response = self.client.get(reverse('projects:project_details_overview') + '?year=2024%2F2025')
+        self.assertEqual(response.status_code, 200)
+        return [row['title'] for row in response.context['projects']], response
+
+    def test_lag_guard(self):
+        from .db_router import LAG_COOKIE
+        self.create_projects(1)
+        project = Project.objects.get()
+        self.replicate()
+        # Replika zatím změnu nemá
+        Project.objects.filter(pk=project.pk).update(title='Nový název')
+        self.client.force_login(self.teacher)
+
+        titles, response = self.overview_titles()
+        self.assertEqual(titles, ['Projekt 0'])
+        self.assertNotIn(LAG_COOKIE, response.cookies)
+
+        response = self.client.post(reverse('projects:update_status', args=[project.pk]), {'status': project.status})
+        self.assertIn(LAG_COOKIE, response.cookies)
+        self.assertEqual(self.overview_titles()[0], ['Nový název'])
+
+        with override_settings(DB_REPLICA_LAG_SECONDS=0):
+            self.assertEqual(self.overview_titles()[0], ['Projekt 0'])
+
+    def test_forced_primary_overrides_decorator(self):
+        from .db_router import read_replica
+        self.create_projects(1)
+        self.replicate()
+        Project.objects.update(title='Jen v primární')
+        self.client.force_login(self.teacher)
+        # Např. export_benchmark: data v primární databázi, která replika nemá
+        with read_replica(False):
+            self.assertEqual(self.overview_titles()[0], ['Jen v primární'])
+        self.assertEqual(self.overview_titles()[0], ['Projekt 0'])
+
+    def test_writes_go_to_primary(self):
+        from .db_router import read_replica
+        self.create_projects(1)
+        self.replicate()
+        with read_replica():
+            project = Project.objects.get()
+            self.assertEqual(project._state.db, 'replica')
+            project.title = 'Uloženo'
+            project.save()
+        self.assertEqual(Project.objects.using('default').get().title, 'Uloženo')
+        self.assertEqual(Project.objects.using('replica').get().title, 'Projekt 0')
+
+
+class DatabaseMetricsTest(ProjectDataMixin, TestCase):
+    """Převzetí spojení s DB se počítá a hlásí v hlavičce Server-Timing."""
+
+    def test_reused_connection_is_reported(self):
+        from .db_metrics import stats
+        self.client.force_login(self.teacher)
+        stats.reset()
+        response = self.client.get(reverse('projects:list') + '?my_projects=0&class=')
+        # V testu zůstává spojení otevřené mezi requesty jako při CONN_MAX_AGE
+        self.assertRegex(response['Server-Timing'], r'^db-first;dur=[\d.]+;desc="reused"$')
+        self.assertEqual((stats.requests, stats.connects, stats.reuses), (1, 0, 1))
+        self.assertIsNone(stats.as_dict()['pool'])
+
+    def test_new_connection_is_reported(self):
+        from django.db.backends.signals import connection_created
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .db_metrics import DatabaseMetricsMiddleware, stats
+
+        def view(request):
+            # Spojení otevřené během requestu (signál posílá connect())
+            connection_created.send(sender=type(connection), connection=connection)
+            Project.objects.count()
+            return HttpResponse()
+
+        stats.reset()
+        response = DatabaseMetricsMiddleware(view)(RequestFactory().get('/'))
+        self.assertRegex(response['Server-Timing'], r'^db-first;dur=[\d.]+;desc="new"$')
+        self.assertEqual((stats.requests, stats.connects, stats.reuses), (1, 1, 0))
+
+    def test_request_without_queries_does_not_connect(self):
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .db_metrics import DatabaseMetricsMiddleware, stats
+        stats.reset()
+        middleware = DatabaseMetricsMiddleware(lambda request: HttpResponse())
+        with self.assertNumQueries(0):
+            response = middleware(RequestFactory().get('/'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual((stats.requests, stats.idle, stats.connects, stats.reuses), (1, 1, 0, 0))
+        self.assertEqual(connection.execute_wrappers, [])
+
+
+class SessionPayloadTest(ProjectDataMixin, TestCase):
+    """Objemná data importu jdou do krátkodobého úložiště, session drží jen ID."""
+
+    def test_import_log_is_referenced_by_id(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        admin = User.objects.create_superuser('admin', password='heslo')
+        self.client.force_login(admin)
+        csv_file = SimpleUploadedFile('projekty.csv', 'neexistuje;Projekt;popis\nkratky;radek\n'.encode('utf-8'))
+        self.client.post(reverse('projects:import_projects'), {'file': csv_file})
+
+        token = self.client.session['import_logs']
+        self.assertIsInstance(token, str)
+        response = self.client.get(reverse('projects:import_projects_result'))
+        self.assertEqual(response.context['log_entries'], [
+            "Řádek 1: Student 'neexistuje' neexistuje.",
+            "Řádek 2: Nedostatečný počet sloupců.",
+        ])
+        self.assertNotIn('import_logs', self.client.session.keys())
+        response = self.client.get(reverse('projects:import_projects_result'))
+        self.assertEqual(response.context['log_entries'], [])
+
+    @override_settings(SESSION_VALUE_MAX_BYTES=100)
+    def test_session_value_size_is_capped(self):
+        from .sessions import SessionStore, SessionValueTooLarge
+        session = SessionStore()
+        session['small'] = list(range(10))
+        with self.assertRaises(SessionValueTooLarge):
+            session['large'] = list(range(100))
+        self.assertNotIn('large', session)
+
+
+class UserImportTest(ProjectDataMixin, TestCase):
+    """Hromadný import uživatelů: nové účty s hesly, změny existujících a chyby po řádcích."""
+
+    @override_settings(USER_IMPORT_HASH_WORKERS=2)
+    def test_import(self):
+        from .user_import import import_users
+        self.create_projects(1)
+        student = Project.objects.get().student
+        content = "\n".join([
+            f"{student.username};Jan;Nový;jan@example.com;student;3.B;IT;;2024/2025",
+            "novy1;Eva;Malá;;student;4.A;;;2024/2025",
+            "novy2;Petr;Velký;petr@example.com;teacher;;;Ing.",
+            "novy3;Kratky;radek",
+            "novy4;Ota;Zlý;;student;4.A;XX",
+            "novy1;Eva;Znovu;;student;4.A;E",
+            "ucitel;;Učitel;;student;1.A;E",
+        ])
+        count, passwords, errors = import_users(content)
+
+        self.assertEqual(count, 4)
+        self.assertEqual([item['username'] for item in passwords], ['novy1', 'novy2'])
+        self.assertEqual(errors, [
+            "Řádek 4: Příliš málo sloupců (očekáváno aspoň 7).",
+            "Řádek 5: Neznámý obor 'XX'.",
+            "Řádek 6: Uživatel 'novy1' je v souboru vícekrát.",
+        ])
+
+        eva = User.objects.get(username='novy1')
+        self.assertTrue(eva.check_password(passwords[0]['password']))
+        self.assertEqual((eva.userprofile.class_name, eva.userprofile.study_branch), ('4.A', 'E'))
+        self.assertEqual(list(eva.groups.values_list('name', flat=True)), ['Student'])
+        teacher = User.objects.get(username='novy2')
+        self.assertEqual(teacher.userprofile.title, 'Ing.')
+        self.assertEqual(list(teacher.groups.values_list('name', flat=True)), ['Teacher'])
+
+        # Učitel přeřazený mezi žáky je jen ve skupině Student
+        self.assertEqual(list(self.teacher.groups.values_list('name', flat=True)), ['Student'])
+        # Změna jména a třídy existujícího žáka se promítne do projektu
+        project = Project.objects.get()
+        self.assertEqual((project.student_class, project.student_sort_name), ('3.B', 'Nový Jan'))
+        self.assertFalse(User.objects.filter(username__in=['novy3', 'novy4']).exists())
+
+
+class ProjectImportTest(ProjectDataMixin, TestCase):
+    """Hromadný import projektů: stejný log jako dřív a pevný počet dotazů."""
+
+    def test_import(self):
+        from .project_import import import_projects
+        from .scores import scheme_max_total
+        self.create_projects(1)
+        student = Project.objects.get().student
+        rows = [
+            f"{student.username};Projekt 0;popis",
+            f"{student.username};Nový;Popis nového;ucitel;oponent",
+            f"{student.username};Nový;znovu",
+            "nikdo;Název;popis",
+            f"{student.username};Název;popis;nikdo",
+            f"{student.username};Název;popis;;nikdo",
+            "kratky;radek",
+        ] + [f"{student.username};Další {i};popis" for i in range(20)]
+        # Uživatelé, existující projekty, aktivní schéma, vložení (+ savepoint)
+        with self.assertNumQueries(6):
+            count, log_entries = import_projects("\n".join(rows))
+
+        self.assertEqual(count, 21)
+        self.assertEqual(log_entries, [
+            f"Řádek 1: Projekt 'Projekt 0' pro studenta '{student.username}' už existuje.",
+            f"Řádek 3: Projekt 'Nový' pro studenta '{student.username}' už existuje.",
+            "Řádek 4: Student 'nikdo' neexistuje.",
+            "Řádek 5: Vedoucí 'nikdo' neexistuje. Přeskakuji.",
+            "Řádek 6: Oponent 'nikdo' neexistuje. Přeskakuji.",
+            "Řádek 7: Nedostatečný počet sloupců.",
+        ])
+        project = Project.objects.get(title='Nový')
+        self.assertEqual((project.assignment, project.leader, project.opponent, project.status),
+                         ('Popis nového', self.teacher, self.opponent, 'approved'))
+        self.assertEqual((project.scheme, project.school_year, project.student_class, project.student_sort_name),
+                         (self.scheme, '2024/2025', '4.A', 'Žák0'))
+        self.assertEqual((project.max_total, project.final_total), (scheme_max_total(self.scheme), None))
+
+    def test_import_ignores_cached_scheme(self):
+        from . import reference_data
+        from .project_import import import_projects
+        from .scores import scheme_max_total
+        self.create_projects(1)
+        student = Project.objects.get().student
+        scheme = ScoringScheme.objects.create(year='2025/2026', opponent_area2_max=5)
+        self.assertEqual(reference_data.active_scheme(), self.scheme)
+        # Přepnutí aktivního schématu bez signálů - cache číselníků drží staré
+        ScoringScheme.objects.update(active=False)
+        ScoringScheme.objects.filter(pk=scheme.pk).update(active=True)
+        import_projects(f"{student.username};Nový;popis")
+        project = Project.objects.get(title='Nový')
+        self.assertEqual((project.scheme, project.school_year, project.max_total),
+                         (scheme, '2025/2026', scheme_max_total(scheme)))
+
+
+class ExportCacheMixin:
+    """Cache exportů v dočasném adresáři; exporty čtou z primární databáze (data jsou v transakci testu)."""
+
+    def setUp(self):
+        super().setUp()
+        import logging
+        import shutil
+        import tempfile
+        from .db_router import read_replica
+        from .export_cache import cache as export_cache
+        directory, export_cache.directory = export_cache.directory, tempfile.mkdtemp(prefix='export_cache_test_')
+        self.addCleanup(shutil.rmtree, export_cache.directory, ignore_errors=True)
+        self.addCleanup(setattr, export_cache, 'directory', directory)
+        primary = read_replica(False)
+        primary.__enter__()
+        self.addCleanup(primary.__exit__, None, None, None)
+        # Doby exportů (timing.py) by jinak šly do výstupu testů
+        timing_logger = logging.getLogger('apps.projects.timing')
+        self.addCleanup(setattr, timing_logger, 'disabled', timing_logger.disabled)
+        timing_logger.disabled = True
+
+
+class DocumentExportTest(ExportCacheMixin, ProjectDataMixin, TestCase):
+    """Posudky: ZIP se streamuje po dokumentech, chybějící posudek nevede na chybu 500."""
+
+    def test_zip_is_streamed(self):
+        import io
+        import zipfile
+        self.create_projects(2)
+        OpponentEvaluation.objects.filter(project__title='Projekt 1').delete()
+        User.objects.filter(pk=self.teacher.pk).update(is_staff=True)
+        self.client.force_login(self.teacher)
+
+        response = self.client.get(reverse('projects:export_documents_zip'),
+                                   {'document_type': 'opponent_eval', 'output': 'zip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), ['posudek_oponenta_zak0.docx', 'preskocene_projekty.txt'])
+        self.assertIn("Projekt 1 (zak1): Posudek oponenta neexistuje.",
+                      archive.read('preskocene_projekty.txt').decode('utf-8'))
+
+    def test_missing_evaluation_redirects_to_detail(self):
+        self.create_projects(1)
+        project = Project.objects.get()
+        OpponentEvaluation.objects.filter(project=project).delete()
+        self.client.force_login(self.opponent)
+
+        response = self.client.get(reverse('projects:export_opponent_eval', args=[project.pk]), follow=True)
+        self.assertRedirects(response, reverse('projects:detail', args=[project.pk]))
+        self.assertIn("Posudek oponenta neexistuje.", [str(m) for m in response.context['messages']])
+
+        response = self.client.get(reverse('projects:export_leader_eval', args=[project.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'],
+                         'application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+
+
+class DocxTemplateRegistryTest(SimpleTestCase):
+    """Šablona se načte jednou, export dostane kopii a změna souboru vede na nové načtení."""
+
+    def test_reload_on_mtime_change(self):
+        import os
+        import shutil
+        import tempfile
+        from docx import Document
+        from .docx_templates import TEMPLATE_DIR, DocxTemplateRegistry
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'leader_eval.docx')
+        shutil.copy(os.path.join(TEMPLATE_DIR, 'leader_eval.docx'), path)
+        registry = DocxTemplateRegistry(directory)
+
+        version = registry.version('leader_eval.docx')
+        first = registry.get('leader_eval.docx')
+        first.docx.add_paragraph("jen v kopii")
+        self.assertNotIn("jen v kopii", [p.text for p in registry.get('leader_eval.docx').docx.paragraphs])
+        self.assertEqual(registry.missing(['leader_eval.docx', 'chybi.docx']), ['chybi.docx'])
+
+        document = Document(path)
+        document.add_paragraph("nová verze")
+        document.save(path)
+        os.utime(path, ns=(version + 10**9, version + 10**9))
+        self.assertEqual(registry.version('leader_eval.docx'), version + 10**9)
+        self.assertIn("nová verze", [p.text for p in registry.get('leader_eval.docx').docx.paragraphs])
+
+
+class ExportJobQueueTest(ExportCacheMixin, ProjectDataMixin, TestCase):
+    """Fronta exportů: úlohu dostane jeden worker, opuštěná úloha se vrátí do fronty."""
+
+    def test_claim_and_requeue(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .export_jobs import claim_next_job, enqueue, requeue_stale_jobs, run_job
+        from .models import ExportJob
+        first = enqueue(self.teacher, 'control_check', {'year': '2024/2025'})
+        second = enqueue(self.teacher, 'milestones', {'year': '2024/2025'})
+        ExportJob.objects.filter(pk=first.pk).update(created_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(claim_next_job().pk, first.pk)
+        self.assertEqual(claim_next_job().pk, second.pk)
+        self.assertIsNone(claim_next_job())
+        self.assertEqual(ExportJob.objects.get(pk=first.pk).status, 'running')
+
+        # Worker spadl uprostřed první úlohy
+        ExportJob.objects.filter(pk=first.pk).update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale_jobs(), 1)
+        job = claim_next_job()
+        self.assertEqual(job.pk, first.pk)
+
+        job = run_job(job)
+        self.addCleanup(job.file.delete, save=False)
+        self.assertEqual(job.status, 'done')
+        with job.file.open('rb') as f:
+            self.assertTrue(f.read().startswith(b'%PDF'))
+
+    @override_settings(EXPORT_JOBS_ASYNC=True)
+    def test_view_enqueues(self):
+        from .models import ExportJob
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('projects:export_control_check_pdf'), {'year': '2024/2025'})
+        job = ExportJob.objects.get()
+        self.assertRedirects(response, job.get_absolute_url(), fetch_redirect_response=False)
+        self.assertEqual((job.kind, job.status, job.params), ('control_check', 'pending', {'year': '2024/2025'}))
+
+
+class ExportCacheTest(ExportCacheMixin, ProjectDataMixin, TestCase):
+    """Cache exportů: zásah bez renderu, zneplatnění změnou projektu, LRU úklid."""
+
+    def test_hit_and_invalidation(self):
+        from .documents import render_leader_eval
+        from .docx_templates import get_docx_template
+        self.create_projects(1)
+        project = Project.objects.select_related('leader_eval').get()
+        with render_leader_eval(project) as f:
+            content = f.read()
+        with mock.patch('apps.projects.documents.get_docx_template') as get_template:
+            with render_leader_eval(project) as f:
+                self.assertEqual(f.read(), content)
+        get_template.assert_not_called()
+
+        # Otevřený soubor lze dočíst, i když ho mezitím smaže změna projektu
+        f = render_leader_eval(project)
+        self.addCleanup(f.close)
+        project.title = 'Nový název'
+        project.save()
+        self.assertEqual(f.read(), content)
+        with mock.patch('apps.projects.documents.get_docx_template', wraps=get_docx_template) as get_template:
+            render_leader_eval(project).close()
+        get_template.assert_called_once()
+
+    def test_least_recently_used_files_are_evicted(self):
+        import os
+        from .export_cache import cache as export_cache
+        self.addCleanup(setattr, export_cache, 'max_bytes', export_cache.max_bytes)
+        export_cache.max_bytes = 3500
+        for i, key in enumerate(['a', 'b', 'c']):
+            export_cache.open_or_render('test', key, '.bin', lambda: b'x' * 1000).close()
+            path = export_cache.path('test', key, '.bin')
+            os.utime(path, ns=(10**18 + i, 10**18 + i))
+        # Zásah posune "a" mezi nejnověji použité
+        export_cache.open_or_render('test', 'a', '.bin', None).close()
+        export_cache.open_or_render('test', 'd', '.bin', lambda: b'x' * 1000).close()
+        remaining = sorted(name for name in os.listdir(os.path.join(export_cache.directory, 'test')))
+        self.assertEqual(remaining, ['a.bin', 'c.bin', 'd.bin'])
+
+
+class MergedExportTest(ExportCacheMixin, ProjectDataMixin, TestCase):
+    """Sloučený export: závěrečné posudky se sází jednou, DOCX se spojí do jednoho souboru."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_projects(2)
+        User.objects.filter(pk=self.teacher.pk).update(is_staff=True)
+        self.client.force_login(self.teacher)
+
+    def export(self, document_type):
+        return self.client.get(reverse('projects:export_documents_zip'),
+                               {'document_type': document_type, 'output': 'merged'})
+
+    def test_final_reports_are_laid_out_once(self):
+        with mock.patch('apps.projects.documents.render_pdf', return_value=b'%PDF-1.7') as render_pdf:
+            response = self.export('final_report')
+        self.assertEqual(response.content, b'%PDF-1.7')
+        render_pdf.assert_called_once()
+        html_string = render_pdf.call_args.args[0]
+        self.assertEqual(html_string.count('<section class="final-report">'), 2)
+        self.assertLess(html_string.index('Projekt 0'), html_string.index('Projekt 1'))
+
+    def test_docx_documents_are_merged(self):
+        import io
+        from docx import Document
+        response = self.export('leader_eval')
+        self.assertEqual(response['Content-Type'],
+                         'application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+        text = "\n".join(p.text for p in Document(io.BytesIO(response.content)).paragraphs)
+        self.assertIn('Projekt 0', text)
+        self.assertIn('Projekt 1', text)
+
+
+class PdfRendererTest(SimpleTestCase):
+    """Sdílené styly se kompilují jednou (znovu po změně souboru), soubory z media/static se čtou z paměti."""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_stylesheet_is_compiled_once(self):
+        import os
+        from .pdf import PdfRenderer
+        path = os.path.join(self.directory, 'test.css')
+        with open(path, 'w') as f:
+            f.write("body { margin: 0; }")
+        renderer = PdfRenderer(self.directory)
+
+        stylesheet = renderer.stylesheet('test.css')
+        self.assertIs(renderer.stylesheet('test.css'), stylesheet)
+        version = renderer.style_version('test.css')
+        os.utime(path, ns=(version + 10**9, version + 10**9))
+        self.assertIsNot(renderer.stylesheet('test.css'), stylesheet)
+        self.assertEqual(renderer.style_version('test.css'), version + 10**9)
+
+    def test_media_files_are_served_from_memory(self):
+        import os
+        from .pdf import BASE_URL, PdfRenderer, _local_path
+        with open(os.path.join(self.directory, 'podpis.png'), 'wb') as f:
+            f.write(b'PNG data')
+        renderer = PdfRenderer(self.directory)
+        with override_settings(MEDIA_ROOT=self.directory, MEDIA_URL='/media/'):
+            url = f"{BASE_URL}media/podpis.png"
+            self.assertEqual(renderer.url_fetcher(url)['string'], b'PNG data')
+            with mock.patch('builtins.open', side_effect=AssertionError("soubor se čte znovu")):
+                fetched = renderer.url_fetcher(url)
+            self.assertEqual((fetched['string'], fetched['mime_type']), (b'PNG data', 'image/png'))
+            # Odkazy mimo media/static adresář se z disku nečtou
+            self.assertIsNone(_local_path(f"{BASE_URL}media/../../etc/passwd"))
+            self.assertIsNone(_local_path("http://jinde.cz/media/podpis.png"))
+
+
+class ProjectsXlsxExportTest(ProjectDataMixin, TestCase):
+    """Streamovaný XLSX export má stejné buňky jako původní export přes ORM."""
+
+    @staticmethod
+    def legacy_row(project):
+        """Řádek tak, jak ho skládal původní export_projects_xlsx."""
+        def person(user, external, email, phone):
+            if user:
+                return [f"{user.first_name} {user.last_name}", "Interní", user.email, ""]
+            if external:
+                return [external, "Externí", email, phone]
+            return ["", "", "", ""]
+
+        def day(value, fmt='%d.%m.%Y'):
+            return value.strftime(fmt) if value else ""
+
+        leader_eval = getattr(project, 'leader_eval', None)
+        opponent_eval = getattr(project, 'opponent_eval', None)
+        leader = [getattr(leader_eval, f'area{i}_points') if leader_eval else 0 for i in (1, 2, 3)]
+        opponent = [getattr(opponent_eval, f'area{i}_points') if opponent_eval else 0 for i in (1, 2)]
+        controls = list(project.controls.order_by('date'))[:3]
+        control_cells = []
+        for i in range(3):
+            control_cells += [day(controls[i].date), controls[i].evaluation] if i < len(controls) else ["", ""]
+        return [
+            f"{project.student.first_name} {project.student.last_name}",
+            project.student.userprofile.class_name or "",
+            project.title, project.description[:500], project.assignment[:500],
+            *person(project.leader, project.external_leader, project.external_leader_email, project.external_leader_phone),
+            *person(project.opponent, project.external_opponent, project.external_opponent_email,
+                    project.external_opponent_phone),
+            project.get_status_display(), project.scheme.year,
+            day(project.created_at, '%d.%m.%Y %H:%M'), day(project.updated_at, '%d.%m.%Y %H:%M'),
+            day(project.delayed_submission_date), day(project.delivery_work_date),
+            day(project.delivery_documentation_date),
+            *control_cells,
+            project.portfolio_url1, project.portfolio_url2,
+            *leader, *opponent, sum(leader), sum(opponent), sum(leader) + sum(opponent),
+            leader_eval.defense_questions if leader_eval else "",
+            opponent_eval.defense_questions if opponent_eval else "",
+        ]
+
+    def test_rows_match_legacy_export(self):
+        import io
+        from openpyxl import load_workbook
+        from .models import ControlCheck
+        from .xlsx_export import HEADERS, write_projects_xlsx
+        self.create_projects(3)
+        first, second, third = Project.objects.order_by('pk')
+        ControlCheck.objects.create(project=first, date=date(2025, 1, 10), content='k', evaluation='OK')
+        ControlCheck.objects.create(project=first, date=date(2024, 12, 1), content='k', evaluation='Ano')
+        second.leader, second.external_leader, second.external_leader_phone = None, 'Ing. Externí', '777 123 456'
+        second.description = 'dlouhý popis ' * 100
+        second.save()
+        OpponentEvaluation.objects.filter(project=third).delete()
+
+        output = io.BytesIO()
+        with mock.patch('apps.projects.xlsx_export.CHUNK_SIZE', 2):  # víc dávek
+            write_projects_xlsx(output)
+        output.seek(0)
+        rows = list(load_workbook(output).active.iter_rows(values_only=True))
+
+        self.assertEqual(list(rows[0]), HEADERS)
+        expected = [self.legacy_row(project) for project in Project.objects.order_by('pk')]
+        # Prázdný řetězec se v sešitu uloží jako prázdná buňka
+        self.assertEqual([[None if v == "" else v for v in row] for row in expected],
+                         [list(row) for row in rows[1:]])
+
+
+class SignatureTest(ProjectDataMixin, TestCase):
+    """Podpis se upraví při nahrání a nový podpis se použije i bez zneplatnění cache."""
+
+    def setUp(self):
+        super().setUp()
+        import shutil
+        import tempfile
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        media_settings = override_settings(MEDIA_ROOT=media)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    @staticmethod
+    def upload(color, size=(1200, 600)):
+        import io
+        from PIL import Image, ImageDraw
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        image = Image.new('RGB', size, 'white')
+        ImageDraw.Draw(image).rectangle((100, 200, 1100, 300), fill=color)
+        output = io.BytesIO()
+        image.save(output, format='JPEG')
+        return SimpleUploadedFile('podpis.jpg', output.getvalue(), content_type='image/jpeg')
+
+    def test_upload_is_normalized_and_cached_by_file(self):
+        import io
+        from PIL import Image
+        from .models import UserPreferences
+        from .signatures import SIGNATURE_WIDTH_PX, signature_image
+        prefs = UserPreferences.objects.create(user=self.teacher, signature=self.upload('black'))
+        self.assertTrue(prefs.signature.name.endswith('.png'))
+        with prefs.signature.open('rb') as f:
+            image = Image.open(f)
+            image.load()
+        # Bílé okraje oříznuté, šířka zmenšená na tiskovou velikost
+        self.assertEqual(image.format, 'PNG')
+        self.assertEqual(image.width, SIGNATURE_WIDTH_PX)
+        self.assertLess(image.height, SIGNATURE_WIDTH_PX / 5)
+
+        user = User.objects.get(pk=self.teacher.pk)
+        first = signature_image(user)
+        with mock.patch('apps.projects.signatures.normalize_signature') as normalize:
+            self.assertEqual(signature_image(User.objects.get(pk=self.teacher.pk)), first)
+        normalize.assert_not_called()
+
+        # Nový podpis má jiný název souboru, a tedy i jiný klíč v cache
+        prefs.signature = self.upload('navy')
+        prefs.save()
+        second = signature_image(User.objects.get(pk=self.teacher.pk))
+        self.assertNotEqual(second, first)
+        image = Image.open(io.BytesIO(second))
+        red, _, blue = image.getpixel((image.width // 2, image.height // 2))[:3]
+        self.assertGreater(blue, red + 50)
+        self.assertIsNone(signature_image(self.opponent))
+
+
+class ServerTimingTest(ExportCacheMixin, ProjectDataMixin, TestCase):
+    """Exporty hlásí doby fází v hlavičce Server-Timing a v logu apps.projects.timing."""
+
+    def test_final_report_stages(self):
+        import json
+        import logging
+        self.create_projects(1)
+        project = Project.objects.get()
+        self.client.force_login(self.teacher)
+        logging.getLogger('apps.projects.timing').disabled = False  # ExportCacheMixin ho vrátí
+
+        with self.assertLogs('apps.projects.timing') as logs:
+            response = self.client.get(reverse('projects:pdf_final_report', args=[project.pk]))
+        self.assertEqual(response.status_code, 200)
+        header = response['Server-Timing']
+        for name in ('db', 'template', 'pdf', 'total', 'db-first'):
+            self.assertRegex(header, rf'(^|, ){name};dur=\d+\.\d')
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((record['export'], record['path']),
+                         ('export_final_report_pdf', reverse('projects:pdf_final_report', args=[project.pk])))
+        self.assertEqual((record['stages']['template']['count'], record['stages']['pdf']['count']), (1, 1))
+        self.assertGreater(record['stages']['db']['count'], 0)
+
+    def test_streamed_zip_is_logged_after_content(self):
+        import json
+        import logging
+        self.create_projects(2)
+        User.objects.filter(pk=self.teacher.pk).update(is_staff=True)
+        self.client.force_login(self.teacher)
+        logging.getLogger('apps.projects.timing').disabled = False
+
+        with self.assertNoLogs('apps.projects.timing'):
+            response = self.client.get(reverse('projects:export_documents_zip'),
+                                       {'document_type': 'leader_eval', 'output': 'zip'})
+        self.assertEqual(response.status_code, 200)
+        # Hlavička odchází před generováním obsahu - fáze exportu v ní nejsou
+        self.assertNotRegex(response.get('Server-Timing', ''), r'(^|, )(total|render);')
+
+        with self.assertLogs('apps.projects.timing') as logs:
+            b''.join(response.streaming_content)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((record['export'], record['streamed']), ('export_documents_zip', True))
+        self.assertEqual(record['stages']['render']['count'], 2)
+        self.assertGreater(record['stages']['db']['count'], 0)
+
+
+class ReportDataTest(ProjectDataMixin, TestCase):
+    """Souhrnné přehledy: pevný počet dotazů, kontroly a milníky seřazené podle data."""
+
+    def report_queries(self):
+        from .report_data import milestone_rows, project_details_rows
+        with CaptureQueriesContext(connection) as queries:
+            rows, teachers = project_details_rows(self.teacher, '2024/2025')
+            milestones = milestone_rows(self.teacher, '2024/2025')
+        return len(queries), rows, teachers, milestones
+
+    def test_rows_and_query_count(self):
+        from .models import ControlCheck, Milestone
+        self.create_projects(2)
+        project = Project.objects.order_by('pk').first()
+        ControlCheck.objects.create(project=project, date=date(2025, 2, 1), content='k', evaluation='Druhá')
+        ControlCheck.objects.create(project=project, date=date(2025, 1, 1), content='k', evaluation='')
+        Milestone.objects.create(project=project, title='Pozdější', deadline=date(2025, 5, 1), status='done')
+        Milestone.objects.create(project=project, title='Dřívější', deadline=date(2000, 1, 1), status='in_progress')
+        count, rows, teachers, milestones = self.report_queries()
+
+        row = rows[0]
+        self.assertEqual((row['student_name'], row['class_name'], row['title']), ('Žák0 ', '4.A', 'Projekt 0'))
+        self.assertEqual((row['control_1'], row['control_2'], row['control_3']), ('01.01.2025', 'Druhá', 'Ne'))
+        self.assertEqual((row['leader_points'], row['opponent_points']), (22, 17))
+        self.assertEqual(teachers, [{'abbreviation': 'Opo', 'fullname': 'Oponent'}])
+        self.assertEqual([(m['title'], m['row_color']) for m in milestones[0]['milestones']],
+                         [('Dřívější', 'red'), ('Pozdější', 'green')])
+
+        self.create_projects(5)
+        self.assertEqual(self.report_queries()[0], count)
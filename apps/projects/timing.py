@@ -0,0 +1,153 @@
+"""
+Měření jednotlivých fází exportu (DB, Django šablona, render DOCX, sazba PDF).
+
+Export se obalí do collect() (u views dekorátorem @server_timing), jednotlivé
+fáze se měří přes stage(). Čas SQL dotazů se sbírá přes execute_wrapper
+všech spojení s DB (včetně repliky), takže se započítá i tam, kde dotaz
+spustí šablona. Výsledek jde do hlavičky Server-Timing odpovědi a jako JSON
+do logu "apps.projects.timing" pro pozdější vyhodnocení; u streamované
+odpovědi (ZIP) se měří i generování obsahu a výsledek jde jen do logu.
+"""
+import functools
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from django.db import connections
+from django.http import FileResponse, StreamingHttpResponse
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('db', 'template', 'render', 'pdf')
+
+_current = ContextVar('export_timings', default=None)
+
+
+class Timings:
+    def __init__(self, name):
+        self.name = name
+        self.durations = dict.fromkeys(STAGES, 0.0)  # sekundy
+        self.counts = dict.fromkeys(STAGES, 0)
+        self.started = time.perf_counter()
+        self.total = None
+
+    def add(self, stage, seconds):
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('db', time.perf_counter() - started)
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def header(self):
+        """Hodnota hlavičky Server-Timing (doby v ms)."""
+        parts = []
+        for stage, seconds in self.durations.items():
+            if not self.counts[stage]:
+                continue
+            desc = f"{self.counts[stage]} queries" if stage == 'db' else f"{self.counts[stage]}x"
+            parts.append(f'{stage};dur={seconds * 1000:.1f};desc="{desc}"')
+        if self.total is not None:
+            parts.append(f"total;dur={self.total * 1000:.1f}")
+        return ", ".join(parts)
+
+    def as_dict(self):
+        return {
+            'export': self.name,
+            'total_ms': round(self.total * 1000, 1) if self.total is not None else None,
+            'stages': {
+                stage: {'ms': round(seconds * 1000, 1), 'count': self.counts[stage]}
+                for stage, seconds in self.durations.items()
+            },
+        }
+
+
+@contextmanager
+def _active(timings):
+    """Fáze a dotazy v bloku se připisují do timings."""
+    token = _current.set(timings)
+    try:
+        with ExitStack() as wrappers:
+            for conn in connections.all():
+                wrappers.enter_context(conn.execute_wrapper(timings.db_wrapper))
+            yield timings
+    finally:
+        _current.reset(token)
+
+
+def _finish(timings, extra):
+    timings.finish()
+    logger.info(json.dumps(dict(timings.as_dict(), **extra), ensure_ascii=False))
+
+
+@contextmanager
+def collect(name, **extra):
+    """Měří jeden export; po skončení zaloguje výsledek (JSON) a vrátí Timings."""
+    timings = Timings(name)
+    try:
+        with _active(timings):
+            yield timings
+    finally:
+        _finish(timings, extra)
+
+
+@contextmanager
+def stage(name):
+    """Změří fázi exportu; mimo collect() nedělá nic."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def _stream(content, timings, extra):
+    # Streamovaná odpověď se generuje až po návratu z view - každý kus se měří
+    # zvlášť, log se zapíše po posledním kusu (nebo po přerušení stahování)
+    iterator = iter(content)
+    try:
+        while True:
+            with _active(timings):
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+            yield chunk
+    finally:
+        _finish(timings, extra)
+
+
+def server_timing(view):
+    """
+    Dekorátor exportního view - přidá hlavičku Server-Timing a zaloguje fáze.
+    Streamovaná odpověď hlavičku nemá (odchází dřív, než se obsah vygeneruje),
+    do logu jde až po dogenerování celého obsahu.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        timings = Timings(view.__name__)
+        extra = {'user': request.user.pk, 'path': request.path}
+        try:
+            with _active(timings):
+                response = view(request, *args, **kwargs)
+        except BaseException:
+            _finish(timings, extra)
+            raise
+        if isinstance(response, StreamingHttpResponse) and not isinstance(response, FileResponse):
+            response.streaming_content = _stream(response.streaming_content, timings, dict(extra, streamed=True))
+            return response
+        _finish(timings, extra)
+        response['Server-Timing'] = timings.header()
+        return response
+    return wrapper
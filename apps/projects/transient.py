@@ -0,0 +1,57 @@
+"""
+Krátkodobé úložiště objemných dat jednoho uživatele (log importu projektů,
+hesla nově založených účtů).
+
+Data leží v cache "transient" (soubory sdílené všemi workery) nejdéle
+TRANSIENT_STORE_TIMEOUT sekund; v session je pod daným názvem jen náhodné
+ID záznamu, takže řádek session zůstává malý.
+"""
+import secrets
+from django.core.cache import caches
+
+
+def _store():
+    return caches['transient']
+
+
+def _cache_key(token):
+    return f"projects:transient:{token}"
+
+
+def _token(request, name, pop=False):
+    token = request.session.pop(name, None) if pop else request.session.get(name)
+    # Starší session mohou mít pod stejným názvem přímo data
+    return token if isinstance(token, str) else None
+
+
+def put(request, name, data):
+    """Uloží data a jejich ID pod názvem name do session (předchozí záznam smaže)."""
+    discard(request, name)
+    token = secrets.token_urlsafe(16)
+    _store().set(_cache_key(token), data)
+    request.session[name] = token
+    return token
+
+
+def get(request, name, default=None):
+    token = _token(request, name)
+    if token is None:
+        return default
+    data = _store().get(_cache_key(token))
+    return default if data is None else data
+
+
+def pop(request, name, default=None):
+    """Vrátí data a záznam smaže (ze session i z úložiště)."""
+    token = _token(request, name, pop=True)
+    if token is None:
+        return default
+    data = _store().get(_cache_key(token))
+    _store().delete(_cache_key(token))
+    return default if data is None else data
+
+
+def discard(request, name):
+    token = _token(request, name, pop=True)
+    if token is not None:
+        _store().delete(_cache_key(token))
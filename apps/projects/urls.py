@@ -9,7 +9,8 @@ from .views.export_views import (
     export_project_detail_pdf, export_control_check_pdf,
     export_leader_eval, export_opponent_eval,
     export_final_report_pdf, export_milestones_pdf,
-    project_details_overview, export_project_details_pdf)  # Add the new view import
+    project_details_overview, export_project_details_pdf,
+    export_documents_zip, export_job_status, export_job_download)  # Add the new view import
 from .views.import_views import (
     import_milestones_csv, import_users_csv, 
     import_projects, import_result_view,
@@ -94,6 +95,7 @@ urlpatterns = [
     path('projects/<int:pk>/export/pdf/', export_project_detail_pdf, name='export_project_pdf'),
     path('projects/export/control-check/', export_control_check_pdf, name='export_control_check_pdf'),
     path('<int:pk>/pdf-report/', export_final_report_pdf, name='pdf_final_report'),
+    path('export/documents-zip/', export_documents_zip, name='export_documents_zip'),
 
     path('update-milestone-status/<int:milestone_id>/', update_milestone_status, name='update_milestone_status'),
 
@@ -103,6 +105,8 @@ urlpatterns = [
     path('export-milestones-pdf/', export_milestones_pdf, name='export_milestones_pdf'),
     path('project-details-overview/', project_details_overview, name='project_details_overview'),
     path('project-details-pdf/', export_project_details_pdf, name='project_details_pdf'),  # Add new URL
+    path('exports/<int:pk>/', export_job_status, name='export_job'),
+    path('exports/<int:pk>/download/', export_job_download, name='export_job_download'),
     path('update-status/<int:pk>/', update_project_status, name='update_status'),
 
     path('<int:pk>/questions-leader/', LeaderQuestionsView.as_view(), name='questions_leader'),
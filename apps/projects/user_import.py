@@ -0,0 +1,200 @@
+"""
+Hromadný import uživatelů z CSV (žáci a učitelé).
+
+Řádky se nejdřív zkontrolují v paměti, existující uživatelé, jejich profily
+a členství ve skupinách se načtou najednou a zápis proběhne přes
+bulk_create / bulk_update v jedné transakci. Hesla nových účtů (PBKDF2,
+stovky ms na jedno) se hashují předem v procesech (USER_IMPORT_HASH_WORKERS).
+
+bulk operace neposílají signály - profil nového uživatele, klíče řazení
+v projektech žáků a číselníky se proto řeší tady přímo.
+"""
+import csv
+import io
+import secrets
+import string
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from apps.profiles.models import UserProfile
+from . import reference_data
+from .roles import STUDENT, TEACHER
+from .sort_keys import refresh_students
+
+# username;first_name;last_name;email;role;class_name;branch;title;school_year
+MIN_COLUMNS = 7
+USER_FIELDS = ('first_name', 'last_name', 'email')
+PROFILE_FIELDS = ('class_name', 'study_branch', 'title', 'school_year')
+ROLE_GROUPS = {'student': STUDENT, 'teacher': TEACHER}
+
+Membership = User.groups.through
+
+
+def generate_password(length=10):
+    """
+    Vygeneruje náhodné heslo o dané délce (default 10),
+    vynechává 'O', '0', 'I', 'l', aby se předešlo záměně.
+    """
+    # Základní sada znaků: ascii_letters, digits, plus pár speciálních
+    alphabet = string.ascii_letters + string.digits + "!@#$%^&*"
+
+    # Odebereme homogenní (vizuálně podobné) znaky
+    # Např. O (velké o), 0 (nula), I (velké i), l (malé L)
+    for ch in ["O", "0", "I", "l"]:
+        alphabet = alphabet.replace(ch, "")
+
+    # Vygenerujeme heslo dané délky
+    return ''.join(secrets.choice(alphabet) for _ in range(length))
+
+
+def hash_passwords(passwords):
+    """Hashe hesel ve stejném pořadí; víc hesel se rozdělí mezi procesy."""
+    workers = min(settings.USER_IMPORT_HASH_WORKERS, len(passwords))
+    if workers <= 1:
+        return [make_password(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def _field_error(model, name, value):
+    field = model._meta.get_field(name)
+    try:
+        field.run_validators(value)
+    except ValidationError as e:
+        return f"{field.verbose_name}: {' '.join(e.messages)}"
+    return None
+
+
+def _profile_values(data):
+    """Hodnoty profilu podle role (ostatní role profil nemění)."""
+    if data['role'] == 'student':
+        # Student obvykle nemá title -> ponecháme prázdné
+        return {'class_name': data['class_name'], 'study_branch': data['study_branch'],
+                'school_year': data['school_year']}
+    if data['role'] == 'teacher':
+        return {'title': data['title'], 'school_year': ""}  # Učitel nemá školní rok
+    return {}
+
+
+def parse_row(row_num, row):
+    """Jeden řádek CSV -> (slovník hodnot, None) nebo (None, chybová zpráva)."""
+    if len(row) < MIN_COLUMNS:
+        return None, f"Řádek {row_num}: Příliš málo sloupců (očekáváno aspoň {MIN_COLUMNS})."
+    row = [value.strip() for value in row]
+    data = {
+        'username': row[0],
+        'first_name': row[1],
+        'last_name': row[2],
+        'email': row[3],
+        'role': row[4].lower(),  # "student" / "teacher"
+        'class_name': row[5],
+        'study_branch': row[6] or 'E',
+        'title': row[7] if len(row) > 7 else "",  # jen pro učitele
+        'school_year': row[8] if len(row) > 8 else "",  # jen pro žáka
+    }
+    if not data['username']:
+        return None, f"Řádek {row_num}: Chybí uživatelské jméno."
+    if data['role'] == 'student' and data['study_branch'] not in dict(UserProfile.STUDY_BRANCH_CHOICES):
+        return None, f"Řádek {row_num}: Neznámý obor '{data['study_branch']}'."
+    checks = [(User, name) for name in ('username',) + USER_FIELDS]
+    checks += [(UserProfile, name) for name in _profile_values(data)]
+    for model, name in checks:
+        error = _field_error(model, name, data[name])
+        if error:
+            return None, f"Řádek {row_num}: {error}"
+    return data, None
+
+
+def import_users(file_content):
+    """
+    Naimportuje uživatele z obsahu CSV (oddělené středníkem).
+    Vrací (počet zpracovaných řádků, [{'username', 'password'} nových účtů], [chyby po řádcích]).
+    """
+    reader = csv.reader(io.StringIO(file_content), delimiter=';', quotechar='"')
+    rows, errors, seen = [], [], set()
+    for row_num, row in enumerate(reader, start=1):
+        data, error = parse_row(row_num, row)
+        if data and data['username'] in seen:
+            error = f"Řádek {row_num}: Uživatel '{data['username']}' je v souboru vícekrát."
+        if error:
+            errors.append(error)
+            continue
+        seen.add(data['username'])
+        rows.append(data)
+
+    existing = {
+        user.username: user
+        for user in User.objects.filter(username__in=seen).select_related('userprofile')
+    }
+    new_rows = [data for data in rows if data['username'] not in existing]
+    passwords = [generate_password(10) for _ in new_rows]
+    hashes = hash_passwords(passwords)
+    groups = {role: Group.objects.get(name=name) for role, name in ROLE_GROUPS.items()}
+
+    with transaction.atomic():
+        # Existující uživatelé -> update jméno, email
+        changed_users = []
+        for data in rows:
+            user = existing.get(data['username'])
+            if user and any(getattr(user, name) != data[name] for name in USER_FIELDS):
+                for name in USER_FIELDS:
+                    setattr(user, name, data[name])
+                changed_users.append(user)
+        User.objects.bulk_update(changed_users, USER_FIELDS, batch_size=500)
+
+        created = User.objects.bulk_create([
+            User(username=data['username'], password=password_hash, **{name: data[name] for name in USER_FIELDS})
+            for data, password_hash in zip(new_rows, hashes)
+        ], batch_size=500)
+        if any(user.pk is None for user in created):  # databáze bez RETURNING
+            created = list(User.objects.filter(username__in=[data['username'] for data in new_rows]))
+        users = dict(existing, **{user.username: user for user in created})
+
+        # Profily: noví uživatelé (a starší bez profilu) dostanou nový, ostatním se změní jen role
+        new_profiles, changed_profiles = [], []
+        for data in rows:
+            user = users[data['username']]
+            values = _profile_values(data)
+            if user.username not in existing:
+                new_profiles.append(UserProfile(user=user, **values))
+                continue
+            profile = getattr(user, 'userprofile', None)
+            if profile is None:
+                if values:
+                    new_profiles.append(UserProfile(user=user, **values))
+            elif any(getattr(profile, name) != value for name, value in values.items()):
+                for name, value in values.items():
+                    setattr(profile, name, value)
+                changed_profiles.append(profile)
+        UserProfile.objects.bulk_create(new_profiles, batch_size=500)
+        UserProfile.objects.bulk_update(changed_profiles, PROFILE_FIELDS, batch_size=500)
+
+        # Skupiny: žák / učitel je právě v jedné skupině své role (jako groups.set([...]))
+        targets = {users[data['username']].pk: groups[data['role']].pk for data in rows if data['role'] in groups}
+        memberships = Membership.objects.filter(user_id__in=targets).values_list('pk', 'user_id', 'group_id')
+        current = set()
+        stale = []
+        for pk, user_id, group_id in memberships:
+            if group_id == targets[user_id]:
+                current.add(user_id)
+            else:
+                stale.append(pk)
+        Membership.objects.filter(pk__in=stale).delete()
+        Membership.objects.bulk_create([
+            Membership(user_id=user_id, group_id=group_id)
+            for user_id, group_id in targets.items() if user_id not in current
+        ], batch_size=500)
+
+        refresh_students(
+            {user.pk for user in changed_users} | {profile.user_id for profile in changed_profiles}
+        )
+        transaction.on_commit(lambda: reference_data.invalidate(reference_data.TEACHERS, reference_data.CLASSES))
+
+    created_passwords = [
+        {'username': data['username'], 'password': password}
+        for data, password in zip(new_rows, passwords)
+    ]
+    return len(rows), created_passwords, errors
@@ -3,6 +3,7 @@ from django.views.generic import UpdateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from ..models import Project, LeaderEvaluation, OpponentEvaluation
+from ..roles import get_roles
 from ..forms import (
     LeaderEvaluationForm, OpponentEvaluationForm
 )
@@ -56,8 +57,8 @@ class LeaderEvalUpdateView(LoginRequiredMixin, UpdateView):
         context = super().get_context_data(**kwargs)
 
         user = self.request.user
-        context['is_teacher'] = user.groups.filter(name='Teacher').exists()
-        context['is_student'] = user.groups.filter(name='Student').exists()
+        context['is_teacher'] = get_roles(user).is_teacher
+        context['is_student'] = get_roles(user).is_student
         context['project'] = self.get_object().project
 
         return context 
@@ -115,8 +116,8 @@ class OpponentEvalUpdateView(LoginRequiredMixin, UpdateView):
         context = super().get_context_data(**kwargs)
 
         user = self.request.user
-        context['is_teacher'] = user.groups.filter(name='Teacher').exists()
-        context['is_student'] = user.groups.filter(name='Student').exists()
+        context['is_teacher'] = get_roles(user).is_teacher
+        context['is_student'] = get_roles(user).is_student
         context['project'] = self.get_object().project
 
         return context 
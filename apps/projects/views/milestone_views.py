@@ -3,6 +3,7 @@ from django.views.generic import CreateView, UpdateView
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from ..models import Project, Milestone
+from ..roles import get_roles
 from django.utils import timezone
 from ..forms import (
     MilestoneForm,StudentMilestoneForm
@@ -21,7 +22,7 @@ class MilestoneCreateView(CreateView):
 
     def dispatch(self, request, *args, **kwargs):
         # Ověřit, že user je Teacher (vedoucí) atp. 
-        if not (request.user.is_authenticated and request.user.groups.filter(name='Teacher').exists()):
+        if not (request.user.is_authenticated and get_roles(request.user).is_teacher):
             messages.error(request, "Nemáte oprávnění přidávat milníky.")
             return redirect('projects:list')
         return super().dispatch(request, *args, **kwargs)
@@ -43,8 +44,8 @@ class MilestoneCreateView(CreateView):
         context = super().get_context_data(**kwargs)
 
         user = self.request.user
-        context['is_teacher'] = user.groups.filter(name='Teacher').exists()
-        context['is_student'] = user.groups.filter(name='Student').exists()
+        context['is_teacher'] = get_roles(user).is_teacher
+        context['is_student'] = get_roles(user).is_student
         project_id = self.kwargs['project_id']
         project = get_object_or_404(Project, id=project_id)
         context['project'] = project
@@ -57,7 +58,7 @@ class MilestoneUpdateView(UpdateView):
     template_name = 'projects/milestone_form.html'
 
     def dispatch(self, request, *args, **kwargs):
-        if not (request.user.is_authenticated and request.user.groups.filter(name='Teacher').exists()):
+        if not (request.user.is_authenticated and get_roles(request.user).is_teacher):
             messages.error(request, "Nemáte oprávnění upravovat milníky.")
             milestone = self.get_object()
             return redirect('projects:detail', pk=milestone.project.id)
@@ -72,8 +73,8 @@ class MilestoneUpdateView(UpdateView):
         context = super().get_context_data(**kwargs)
 
         user = self.request.user
-        context['is_teacher'] = user.groups.filter(name='Teacher').exists()
-        context['is_student'] = user.groups.filter(name='Student').exists()
+        context['is_teacher'] = get_roles(user).is_teacher
+        context['is_student'] = get_roles(user).is_student
         milestone = self.get_object()
         project = get_object_or_404(Project, id=milestone.project.id)
         context['project'] = project
@@ -1,15 +1,21 @@
 # from urllib import request
-from django.contrib.auth.models import User
+from django.conf import settings
 from django.shortcuts import get_object_or_404, redirect
 from django.views.generic import ListView, DetailView, CreateView, UpdateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from apps.profiles.models import UserProfile
 from ..models import Milestone, Project, ControlCheck, ScoringScheme
+from ..roles import get_roles
+from .. import reference_data
+from ..search import highlight, search_terms
+from ..navigation import (
+    ORDERINGS, filter_params, filter_projects, filter_name, keyset_page,
+    save_navigation, load_navigation, neighbours,
+)
 from django.utils import timezone
 from django.utils.timezone import now
-from django.db.models import Q
+from django.db.models import Prefetch
 from ..forms import (
     ControlCheckForm,
     ProjectNotesForm, ProjectOpponentForm,
@@ -108,90 +114,49 @@ class ProjectListView(LoginRequiredMixin, ListView):
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        qs = Project.objects.all().order_by('student__userprofile__class_name', 'student__last_name')
-
-        filter_type = self.request.GET.get('filter_type', 'all')
-
-        if filter_type == 'my_projects':
-            qs = qs.filter(Q(leader=self.request.user) | Q(opponent=self.request.user))
-        elif filter_type == 'my_leading':
-            qs = qs.filter(leader=self.request.user)
-        elif filter_type == 'my_opponent':
-            qs = qs.filter(opponent=self.request.user)
-        elif filter_type == 'no_leader':
-            qs = qs.filter(leader__isnull=True)
-
-        # Zpracování parametru "Pouze moje projekty"
-        my_projects = self.request.GET.get('my_projects', '0')
-
-        if my_projects == '1':
-            qs = qs.filter(Q(leader=self.request.user) | Q(opponent=self.request.user))
-
-        # Pokud je user ve skupině 'Student', zobrazí jen své projekty
-        if user_in_group(self.request.user, 'Student'):
-            qs = qs.filter(student=self.request.user)
-        
-        # Filtr třídy (pokud není zadána, použij default)
-        class_name = self.request.GET.get('class', '')
-        if class_name:
-            qs = qs.filter(student__userprofile__class_name=class_name)
-
-        # Filtr podle stavu projektu
-        if status := self.request.GET.get('status'):
-            qs = qs.filter(status=status)
-
-        # Filtr podle vedoucího
-        if leader_id := self.request.GET.get('leader'):
-            qs = qs.filter(leader_id=leader_id)
-
-        # Filtr podle oponenta
-        if opponent_id := self.request.GET.get('opponent'):
-            qs = qs.filter(opponent_id=opponent_id)
-
-        # Řazení výsledků
-        if ordering := self.request.GET.get('ordering'):
-            qs = qs.order_by(ordering)
-
-        user = self.request.user
-        # Pokud GET parametr "year" je předán, filtrovat projekty podle ScoreBoard.year
-        selected_year = self.request.GET.get('year')
-
-        if not selected_year and hasattr(user, 'preferences'):
-            selected_year = user.preferences.default_year
-        
-        if selected_year:
-            qs = qs.filter(scheme__year=selected_year)
-        else:
-            # Výchozí: pokud je uživatel učitel, můžeme defaultně filtrovat na aktivní ScoreBoard
-            if self.request.user.groups.filter(name='Teacher').exists() or self.request.user.is_superuser:
-                try:
-                    active_scheme = ScoringScheme.objects.get(active=True)
-                    qs = qs.filter(scheme=active_scheme)
-                except ScoringScheme.DoesNotExist:
-                    pass
-
-        self.request.session['filtered_projects'] = list(qs.values_list('id', flat=True))
-        
-        filter_name = ''
-        if filter_type == 'my_projects':
-            filter_name = 'Všechny moje projekty (vedoucí i oponent)'
-        elif filter_type == 'my_leading':
-            filter_name = 'Projekty, kde jsem vedoucí'
-        elif filter_type == 'my_opponent':
-            filter_name = 'Projekty, kde jsem oponent'
-        elif filter_type == 'no_leader':
-            filter_name = 'Projekty bez určeného vedoucího'
-
-        self.request.session['filter_name'] = filter_name      
-        self.request.session["project_filter"] = filter_name
+        # Vše, co šablona u řádku potřebuje (žák + profil, vedoucí, oponent, schéma),
+        # se načte jedním dotazem - počet dotazů nezávisí na počtu projektů.
+        # Součty bodů jsou uložené přímo v projektu (leader_total, opponent_total).
+        # Filtr a řazení sdílí s navigací v detailu projektu (navigation.py).
+        self.filter_params = filter_params(self.request.GET)
+        qs = filter_projects(self.request.user, self.filter_params, Project.objects.select_related(
+            'student', 'student__userprofile', 'leader', 'opponent', 'scheme'
+        ).defer('search_vector'))
+
+        # Keyset stránkování - ?after=<id posledního řádku> / ?before=<id prvního řádku>
+        after = self.request.GET.get('after', '')
+        before = self.request.GET.get('before', '')
+        projects, self.previous_cursor, self.next_cursor = keyset_page(
+            qs, settings.PROJECT_LIST_PAGE_SIZE,
+            after=int(after) if after.isdigit() else None,
+            before=int(before) if before.isdigit() else None,
+        )
 
-        return qs
+        # Úryvky se zvýrazněným hledaným textem jen pro řádky aktuální stránky
+        if query := self.filter_params.get('q'):
+            for project in projects:
+                project.title_highlight = highlight(project.title, query)
+                project.search_snippet = highlight(project.assignment or project.description, query)
+        return projects
+
+    def page_url(self, **cursor):
+        """Odkaz na sousední stránku se stejným filtrem."""
+        query = self.request.GET.copy()
+        query.pop('after', None)
+        query.pop('before', None)
+        query.update(cursor)
+        return f"?{query.urlencode()}"
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        # Filtr pro předchozí / další projekt v detailu - podepsaná cookie místo seznamu ID v session
+        return save_navigation(self.request, response, self.filter_params)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
         # Přidáme dostupné roky z ScoreBoardu
-        context['available_years'] = ScoringScheme.objects.values_list('year', flat=True).order_by('year')
+        context['available_years'] = reference_data.school_years()
         # Uložení vybraného roku do kontextu, aby se mohl zobrazit v dropdownu
         context['selected_year'] = self.request.GET.get('year') or (self.request.user.preferences.default_year if hasattr(self.request.user, 'preferences') else "")
 
@@ -204,15 +169,26 @@ class ProjectListView(LoginRequiredMixin, ListView):
 
         # print(f"Uživatel: {self.request.user}, Preference: {context['default_my_projects']}")
 
-        context['all_teachers'] = User.objects.filter(groups__name='Teacher').order_by('last_name')
-        context['all_classes'] = UserProfile.objects.exclude(class_name='').values_list('class_name', flat=True).distinct().order_by('class_name')
+        # Číselníky pro filtry z cache (reference_data.py)
+        context['all_teachers'] = reference_data.teachers()
+        context['all_classes'] = reference_data.class_names()
 
         user = self.request.user
-        context['is_teacher'] = user.groups.filter(name='Teacher').exists()
-        context['is_student'] = user.groups.filter(name='Student').exists()
+        context['is_teacher'] = get_roles(user).is_teacher
+        context['is_student'] = get_roles(user).is_student
 
         context['active_filter'] = self.request.GET.get('filter_type', 'all')
 
+        context['search_query'] = self.filter_params.get('q', '')
+        context['orderings'] = [
+            (value, label) for value, (fields, label) in ORDERINGS.items()
+            if value != 'relevance' or search_terms(context['search_query'])
+        ]
+        # Prázdná hodnota = výchozí řazení (při hledání relevance, jinak třída a žák)
+        context['selected_ordering'] = self.filter_params.get('ordering', '')
+        context['previous_page_url'] = self.page_url(before=self.previous_cursor) if self.previous_cursor else None
+        context['next_page_url'] = self.page_url(after=self.next_cursor) if self.next_cursor else None
+
         return context
 
 
@@ -224,7 +200,7 @@ class TeacherProjectCreateView(CreateView):
 
     def dispatch(self, request, *args, **kwargs):
         # Kontrola, zda user je teacher/superuser
-        if not (request.user.is_superuser or request.user.groups.filter(name='Teacher').exists()):
+        if not (request.user.is_superuser or get_roles(request.user).is_teacher):
             messages.error(request, "Nemáte oprávnění zakládat projekt jako učitel.")
             return redirect('projects:list')
         return super().dispatch(request, *args, **kwargs)
@@ -233,13 +209,11 @@ class TeacherProjectCreateView(CreateView):
         # Při uložení:
         # 1. Nastavíme scoreboard (active=True)
         selected_year = self.request.GET.get('year') or self.request.user.userprofile.school_year
-        try:
-            # scheme = ScoringScheme.objects.get(year=selected_year)
-            scheme = ScoringScheme.objects.get(active=True)
-            form.instance.scheme = scheme
-        except ScoringScheme.DoesNotExist:
+        scheme = reference_data.active_scheme()
+        if scheme is None:
             messages.error(self.request, "Není definován aktivní scoreboard.")
             return redirect('projects:list')
+        form.instance.scheme = scheme
 
         # 2. Leader = request.user
         form.instance.leader = self.request.user
@@ -258,8 +232,8 @@ class TeacherProjectCreateView(CreateView):
         context = super().get_context_data(**kwargs)
 
         user = self.request.user
-        context['is_teacher'] = user.groups.filter(name='Teacher').exists()
-        context['is_student'] = user.groups.filter(name='Student').exists()
+        context['is_teacher'] = get_roles(user).is_teacher
+        context['is_student'] = get_roles(user).is_student
 
         return context 
 
@@ -332,8 +306,8 @@ class TeacherProjectUpdateView(UpdateView):
         context = super().get_context_data(**kwargs)
 
         user = self.request.user
-        context['is_teacher'] = user.groups.filter(name='Teacher').exists()
-        context['is_student'] = user.groups.filter(name='Student').exists()
+        context['is_teacher'] = get_roles(user).is_teacher
+        context['is_student'] = get_roles(user).is_student
 
         return context 
     
@@ -410,7 +384,7 @@ class StudentProjectUpdateView(UpdateView):
 
 def user_in_group(user, group_name):
     """Pomocná funkce, která zjistí, jestli je uživatel ve skupině group_name."""
-    return user.is_authenticated and user.groups.filter(name=group_name).exists()
+    return group_name in get_roles(user)
 
 
 @login_required
@@ -459,101 +433,98 @@ class ProjectDetailView(LoginRequiredMixin, DetailView):
     template_name = 'projects/project_detail.html'
     context_object_name = 'project'
     # Tady pak omezíme, aby student mohl vidět jen svůj projekt
+    def get_queryset(self):
+        # Projekt s lidmi, schématem a posudky jedním dotazem, kontroly a milníky jedním prefetch
+        return Project.objects.select_related(
+            'scheme',
+            'student', 'student__userprofile',
+            'leader', 'leader__userprofile',
+            'opponent', 'opponent__userprofile',
+            'leader_eval', 'opponent_eval',
+        ).prefetch_related(
+            Prefetch('controls', queryset=ControlCheck.objects.order_by('date'), to_attr='sorted_checks'),
+            'milestones',
+        )
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
-        context_object_name = 'project'
-        project = context[context_object_name]
-
-        project_ids = self.request.session.get('filtered_projects', [])
-        current_id = self.object.id
-
-        try:
-            current_index = project_ids.index(current_id)
-            context['prev_project'] = project_ids[current_index-1] if current_index > 0 else None
-            context['next_project'] = project_ids[current_index+1] if current_index < len(project_ids)-1 else None
-        except ValueError:
-            context['prev_project'] = None
-            context['next_project'] = None
-
-        # Přidáme kontrolní záznamy seřazené podle data (nejstarší první)
-        context['sorted_checks'] = project.controls.order_by('date')
-
+        roles = get_roles(user)
+        project = context['project']
+
+        # Sousední projekty podle filtru posledního zobrazeného seznamu
+        context['prev_project'] = context['next_project'] = None
+        context['project_filter'] = ''
+        params = load_navigation(self.request)
+        if params is not None:
+            context['prev_project'], context['next_project'] = neighbours(
+                filter_projects(user, params), project.pk)
+            context['project_filter'] = filter_name(params)
+
+        # Kontrolní záznamy seřazené podle data (nejstarší první) - z prefetch
+        controls = project.sorted_checks
+        context['sorted_checks'] = controls
+
+        # Body i maxima počítají z již načtených posudků a schématu
         context["leader_total_points"] = project.leader_total_points()
         context["max_leader_points"] = project.max_leader_points()
         context["opponent_total_points"] = project.opponent_total_points()
         context["max_opponent_points"] = project.max_opponent_points()
 
         # Přidání dat pro šablonu
-        context['is_teacher'] = user.groups.filter(name='Teacher').exists()
-        context['is_student'] = user.groups.filter(name='Student').exists()
+        context['is_teacher'] = roles.is_teacher
+        context['is_student'] = roles.is_student
         context['can_edit'] = (
-            (user.groups.filter(name='Student').exists() and project.student == user and project.status == 'pending_approval') or
-            (user.groups.filter(name='Teacher').exists() and project.leader == user and project.status == 'approved')
+            (roles.is_student and project.student_id == user.pk and project.status == 'pending_approval') or
+            (roles.is_teacher and project.leader_id == user.pk and project.status == 'approved')
         )
 
         # Přidání možných stavů milníků do kontextu
         context['milestone_status_choices'] = Milestone.STATUS_CHOICES
 
+        # Milníky z prefetch (stejný seznam používá i šablona přes project.milestones.all)
+        milestones = list(project.milestones.all())
+
         # Připravíme milníky s atributem `short_note`
-        milestones_with_short_notes = []
-        for milestone in project.milestones.all():
-            milestones_with_short_notes.append({
-                'title': milestone.title,
-                'deadline': milestone.deadline,
-                # 'status': milestone.get_status_display(),
-                'status': milestone.status,
-                'short_note': milestone.note[:20] + '...' if len(milestone.note) > 20 else milestone.note,
-            })
-
-        # Přidání milníků do kontextu
-        context['milestones'] = milestones_with_short_notes
+        context['milestones'] = [{
+            'title': milestone.title,
+            'deadline': milestone.deadline,
+            'status': milestone.status,
+            'short_note': milestone.note[:20] + '...' if len(milestone.note) > 20 else milestone.note,
+        } for milestone in milestones]
         context['now'] = now()
         context['year'] = project.scheme.year
-        
+
         # Výpočet informací o plnění milníků
-        milestones = project.milestones.all()
-        total_milestones = milestones.count()
-        completed_milestones = milestones.filter(status='done').count()
-        
+        total_milestones = len(milestones)
+        completed_milestones = sum(1 for milestone in milestones if milestone.status == 'done')
+
         # Výpočet procentuálního plnění (zabraňujeme dělení nulou)
         completion_percentage = 0
         if total_milestones > 0:
             completion_percentage = int((completed_milestones / total_milestones) * 100)
-            
+
         context['total_milestones'] = total_milestones
         context['completed_milestones'] = completed_milestones
         context['completion_percentage'] = completion_percentage
 
-        # Přidání informací o stavu kontrol
-        controls = project.controls.order_by('date')
+        # Stav prvních tří kontrol: 'none' (neexistuje), 'exists', 'overdue', 'evaluated'
         current_date = timezone.now().date()
-        
-        # Informace o první kontrole
-        context['control1_status'] = 'none'  # výchozí stav - kontrola neexistuje
-        context['control2_status'] = 'none'
-        context['control3_status'] = 'none'
-        
-        # Zpracování jednotlivých kontrol podle pořadí
-        if controls:
-            for i, control in enumerate(controls[:3], start=1):
-                status_key = f'control{i}_status'
-                
-                # Kontrola existuje
-                context[status_key] = 'exists'
-                
-                # Získáme datum kontroly - může být datetime nebo date
-                control_date = control.date
-                if hasattr(control_date, 'date'):  # pokud je to datetime objekt
-                    control_date = control_date.date()
-                
+        for i in range(1, 4):
+            context[f'control{i}_status'] = 'none'
+        for i, control in enumerate(controls[:3], start=1):
+            # Datum kontroly - může být datetime nebo date
+            control_date = control.date
+            if hasattr(control_date, 'date'):  # pokud je to datetime objekt
+                control_date = control_date.date()
+
+            if control.evaluation:
+                context[f'control{i}_status'] = 'evaluated'
+            elif control_date < current_date:
                 # Kontrola již měla proběhnout, ale nemá hodnocení
-                if control_date < current_date and not control.evaluation:
-                    context[status_key] = 'overdue'
-                
-                # Kontrola má hodnocení
-                elif control.evaluation:
-                    context[status_key] = 'evaluated'
+                context[f'control{i}_status'] = 'overdue'
+            else:
+                context[f'control{i}_status'] = 'exists'
 
         return context
 
@@ -663,8 +634,8 @@ class ControlCheckCreateView(LoginRequiredMixin, CreateView):
         context = super().get_context_data(**kwargs)
 
         user = self.request.user
-        context['is_teacher'] = user.groups.filter(name='Teacher').exists()
-        context['is_student'] = user.groups.filter(name='Student').exists()
+        context['is_teacher'] = get_roles(user).is_teacher
+        context['is_student'] = get_roles(user).is_student
 
         context['project'] = self.project        
 
@@ -694,8 +665,8 @@ class ControlCheckUpdateView(LoginRequiredMixin, UpdateView):
         context = super().get_context_data(**kwargs)
 
         user = self.request.user
-        context['is_teacher'] = user.groups.filter(name='Teacher').exists()
-        context['is_student'] = user.groups.filter(name='Student').exists()
+        context['is_teacher'] = get_roles(user).is_teacher
+        context['is_student'] = get_roles(user).is_student
         check = self.get_object()
         context['project'] = check.project
 
@@ -722,8 +693,8 @@ class ProjectNotesUpdateView(LoginRequiredMixin, UpdateView):
         context = super().get_context_data(**kwargs)
 
         user = self.request.user
-        context['is_teacher'] = user.groups.filter(name='Teacher').exists()
-        context['is_student'] = user.groups.filter(name='Student').exists()
+        context['is_teacher'] = get_roles(user).is_teacher
+        context['is_student'] = get_roles(user).is_student
         context['project'] = self.get_object()
 
         return context 
@@ -750,8 +721,8 @@ class ProjectAssignmentUpdateView(LoginRequiredMixin, UpdateView):
         context = super().get_context_data(**kwargs)
 
         user = self.request.user
-        context['is_teacher'] = user.groups.filter(name='Teacher').exists()
-        context['is_student'] = user.groups.filter(name='Student').exists()
+        context['is_teacher'] = get_roles(user).is_teacher
+        context['is_student'] = get_roles(user).is_student
         context['project'] = self.project
 
         return context 
@@ -765,7 +736,7 @@ def take_opponent_role(request, pk):
     project = get_object_or_404(Project, pk=pk)
 
     # Musí být učitel (nebo superuser)
-    if not request.user.groups.filter(name='Teacher').exists() and not request.user.is_superuser:
+    if not get_roles(request.user).is_teacher and not request.user.is_superuser:
         messages.error(request, "Nemáte oprávnění stát se oponentem.")
         return redirect('projects:detail', pk=pk)
 
@@ -796,8 +767,8 @@ class ProjectOpponentUpdateView(LoginRequiredMixin, UpdateView):
         context = super().get_context_data(**kwargs)
 
         user = self.request.user
-        context['is_teacher'] = user.groups.filter(name='Teacher').exists()
-        context['is_student'] = user.groups.filter(name='Student').exists()
+        context['is_teacher'] = get_roles(user).is_teacher
+        context['is_student'] = get_roles(user).is_student
         context['project'] = self.get_object()
 
         return context 
@@ -905,8 +876,8 @@ class LeaderReviewView(DetailView):
         # context['max_points'] = project.scheme.total_points if project.scheme else 0
 
         user = self.request.user
-        context['is_teacher'] = user.groups.filter(name='Teacher').exists()
-        context['is_student'] = user.groups.filter(name='Student').exists()
+        context['is_teacher'] = get_roles(user).is_teacher
+        context['is_student'] = get_roles(user).is_student
 
         return context
 
@@ -962,8 +933,8 @@ class OpponentReviewView(DetailView):
         # context['max_points'] = project.scheme.total_points if project.scheme else 0
 
         user = self.request.user
-        context['is_teacher'] = user.groups.filter(name='Teacher').exists()
-        context['is_student'] = user.groups.filter(name='Student').exists()
+        context['is_teacher'] = get_roles(user).is_teacher
+        context['is_student'] = get_roles(user).is_student
 
         return context
 
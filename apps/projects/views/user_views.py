@@ -5,6 +5,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from ..models import UserPreferences
+from ..roles import get_roles
 from ..forms import (
     UserUpdateForm, UserPreferencesForm
 )
@@ -34,8 +35,8 @@ class UserProfileUpdateView(LoginRequiredMixin, UpdateView):
         context = super().get_context_data(**kwargs)
 
         user = self.request.user
-        context['is_teacher'] = user.groups.filter(name='Teacher').exists()
-        context['is_student'] = user.groups.filter(name='Student').exists()
+        context['is_teacher'] = get_roles(user).is_teacher
+        context['is_student'] = get_roles(user).is_student
 
         return context 
     
@@ -58,8 +59,8 @@ def user_preferences_view(request):
     # Přidání informací o roli uživatele do kontextu
     context = {
         'form': form,
-        'is_teacher': request.user.groups.filter(name='Teacher').exists(),
-        'is_student': request.user.groups.filter(name='Student').exists(),
+        'is_teacher': get_roles(request.user).is_teacher,
+        'is_student': get_roles(request.user).is_student,
     }
     # return render(request, 'users/user_preferences.html', {'form': form})
     return render(request, 'users/user_preferences.html', context)
@@ -0,0 +1,163 @@
+"""
+Export všech projektů do XLSX s konstantní spotřebou paměti.
+
+Projekty se čtou po dávkách přes .values() (dlouhé texty se zkracují už
+v databázi), kontroly se pro každou dávku načtou jedním dotazem. Šířky
+sloupců se počítají průběžně; protože write-only sešit musí mít šířky
+zapsané před prvním řádkem, řádky se mezitím odkládají do dočasného
+souboru a do sešitu se zapíší až ve druhém kroku.
+"""
+import pickle
+import tempfile
+from django.db.models.functions import Substr
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+from .models import Project, ControlCheck
+
+CHUNK_SIZE = 500
+TEXT_LIMIT = 500        # zkrácení popisu a zadání pro přehlednost
+MAX_COLUMN_WIDTH = 50   # max šířka sloupce ve znacích
+
+HEADERS = [
+    "Student", "Třída", "Název projektu", "Popis", "Zadání",
+    "Vedoucí", "Interní / Externí", "E-mail vedoucího", "Telefon vedoucího",
+    "Oponent", "Interní / Externí", "E-mail oponenta", "Telefon oponenta",
+    "Stav", "Školní rok",
+    "Datum vytvoření", "Poslední aktualizace",
+    "Termín odkladu", "Datum předání výrobku", "Datum předání dokumentace",
+    # Kontroly - pro každou kontrolu datum a hodnocení
+    "Kontrola 1 - Datum", "Kontrola 1 - Hodnocení",
+    "Kontrola 2 - Datum", "Kontrola 2 - Hodnocení",
+    "Kontrola 3 - Datum", "Kontrola 3 - Hodnocení",
+    "URL 1", "URL 2",
+    "Body vedoucího (oblast 1)", "Body vedoucího (oblast 2)", "Body vedoucího (oblast 3)",
+    "Body oponenta (oblast 1)", "Body oponenta (oblast 2)",
+    "Celkem bodů vedoucího", "Celkem bodů oponenta", "Celkem bodů",
+    "Otázky vedoucího", "Otázky oponenta"
+]
+
+PROJECT_FIELDS = [
+    'id', 'title', 'status', 'school_year',
+    'student_id', 'student__first_name', 'student__last_name', 'student_class',
+    'leader_id', 'leader__first_name', 'leader__last_name', 'leader__email',
+    'external_leader', 'external_leader_email', 'external_leader_phone',
+    'opponent_id', 'opponent__first_name', 'opponent__last_name', 'opponent__email',
+    'external_opponent', 'external_opponent_email', 'external_opponent_phone',
+    'created_at', 'updated_at',
+    'delayed_submission_date', 'delivery_work_date', 'delivery_documentation_date',
+    'portfolio_url1', 'portfolio_url2', 'leader_total', 'opponent_total', 'final_total',
+    'leader_eval__id', 'leader_eval__area1_points', 'leader_eval__area2_points',
+    'leader_eval__area3_points', 'leader_eval__defense_questions',
+    'opponent_eval__id', 'opponent_eval__area1_points', 'opponent_eval__area2_points',
+    'opponent_eval__defense_questions',
+]
+
+
+def _date(value, fmt='%d.%m.%Y'):
+    return value.strftime(fmt) if value else ""
+
+
+def _person(p, role):
+    """(jméno, interní/externí, e-mail, telefon) vedoucího nebo oponenta."""
+    if p[f'{role}_id']:
+        # UserProfile telefon nemá, u interních osob zůstává prázdný
+        return f"{p[f'{role}__first_name']} {p[f'{role}__last_name']}", "Interní", p[f'{role}__email'], ""
+    if p[f'external_{role}']:
+        return p[f'external_{role}'], "Externí", p[f'external_{role}_email'], p[f'external_{role}_phone']
+    return "", "", "", ""
+
+
+def _project_chunks():
+    """Dávky projektů (slovníky z .values()) stránkované podle pk."""
+    queryset = Project.objects.annotate(
+        description_short=Substr('description', 1, TEXT_LIMIT),
+        assignment_short=Substr('assignment', 1, TEXT_LIMIT),
+    ).values(*PROJECT_FIELDS, 'description_short', 'assignment_short').order_by('pk')
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk)[:CHUNK_SIZE])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1]['id']
+
+
+def _controls_by_project(project_ids):
+    controls = {}
+    for c in ControlCheck.objects.filter(project_id__in=project_ids).order_by(
+            'project_id', 'date').values('project_id', 'date', 'evaluation'):
+        controls.setdefault(c['project_id'], []).append(c)
+    return controls
+
+
+def iter_project_rows():
+    """Řádky exportu (bez hlavičky) v pořadí podle pk projektu."""
+    status_labels = dict(Project.STATUS_CHOICES)
+    for chunk in _project_chunks():
+        controls_map = _controls_by_project([p['id'] for p in chunk])
+        for p in chunk:
+            has_leader_eval = p['leader_eval__id'] is not None
+            leader_points = [p[f'leader_eval__area{i}_points'] if has_leader_eval else 0 for i in (1, 2, 3)]
+            has_opponent_eval = p['opponent_eval__id'] is not None
+            opponent_points = [p[f'opponent_eval__area{i}_points'] if has_opponent_eval else 0 for i in (1, 2)]
+
+            controls = controls_map.get(p['id'], [])[:3]
+            control_cells = []
+            for i in range(3):
+                if i < len(controls):
+                    control_cells += [_date(controls[i]['date']), controls[i]['evaluation']]
+                else:
+                    control_cells += ["", ""]
+
+            yield [
+                f"{p['student__first_name']} {p['student__last_name']}" if p['student_id'] else "",
+                p['student_class'] if p['student_id'] else "",
+                p['title'],
+                p['description_short'] or "",
+                p['assignment_short'] or "",
+                *_person(p, 'leader'),
+                *_person(p, 'opponent'),
+                status_labels.get(p['status'], p['status']),
+                p['school_year'] or "N/A",
+                _date(p['created_at'], '%d.%m.%Y %H:%M'),
+                _date(p['updated_at'], '%d.%m.%Y %H:%M'),
+                _date(p['delayed_submission_date']),
+                _date(p['delivery_work_date']),
+                _date(p['delivery_documentation_date']),
+                *control_cells,
+                p['portfolio_url1'],
+                p['portfolio_url2'],
+                *leader_points,
+                *opponent_points,
+                p['leader_total'] or 0,
+                p['opponent_total'] or 0,
+                p['final_total'] or 0,
+                p['leader_eval__defense_questions'] or "" if has_leader_eval else "",
+                p['opponent_eval__defense_questions'] or "" if has_opponent_eval else "",
+            ]
+
+
+def write_projects_xlsx(output):
+    """Zapíše export všech projektů do souborového objektu output."""
+    widths = [min(len(h), MAX_COLUMN_WIDTH) for h in HEADERS]
+    with tempfile.TemporaryFile() as spool:
+        # 1. průchod: řádky do dočasného souboru, průběžně šířky sloupců
+        for row in iter_project_rows():
+            for i, value in enumerate(row):
+                if value is not None:
+                    widths[i] = max(widths[i], min(len(str(value)), MAX_COLUMN_WIDTH))
+            pickle.dump(row, spool, pickle.HIGHEST_PROTOCOL)
+
+        # 2. průchod: write-only sešit, šířky musí být nastavené před prvním řádkem
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Projekty")
+        for i, width in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = width + 2
+        ws.append(HEADERS)
+        spool.seek(0)
+        while True:
+            try:
+                ws.append(pickle.load(spool))
+            except EOFError:
+                break
+        wb.save(output)
@@ -1,6 +1,8 @@
+import importlib.util
 import os
 import environ
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 
 env = environ.Env()
 environ.Env.read_env()
@@ -48,10 +50,13 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'apps.projects.db_metrics.DatabaseMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.projects.roles.UserRolesMiddleware',
+    'apps.projects.db_router.ReplicaLagMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -69,6 +74,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'apps.projects.roles.roles',
             ],
         },
     },
@@ -97,9 +103,50 @@ DATABASES = {
         'PASSWORD': env('DB_PASSWORD'),
         'HOST': env('DB_HOST', default='localhost'),
         'PORT': env('DB_PORT', default='5432'),
+        # Trvalé spojení (s) přežije mezi requesty; 0 = nové spojení pro každý request
+        'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE', default=60),
+        # Před použitím trvalého spojení (i spojení z poolu) ověřit, že ještě žije
+        'CONN_HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS', default=True),
     }
 }
 
+# Volitelný pool spojení v každém workeru (psycopg 3: pip install "psycopg[binary,pool]")
+if env.bool('DB_POOL', default=False):
+    # requirements.txt obsahuje jen psycopg2, které pool nepodporuje
+    if importlib.util.find_spec('psycopg') is None or importlib.util.find_spec('psycopg_pool') is None:
+        raise ImproperlyConfigured('DB_POOL vyžaduje psycopg 3 s poolem: pip install "psycopg[binary,pool]"')
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # pool a trvalá spojení se vylučují
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': env.int('DB_POOL_MIN_SIZE', default=2),
+            'max_size': env.int('DB_POOL_MAX_SIZE', default=10),
+            'timeout': env.int('DB_POOL_TIMEOUT', default=10),  # s čekání na volné spojení
+        },
+    }
+
+# Volitelná replika pro čtení přehledů a exportů (apps/projects/db_router.py)
+if env('DB_REPLICA_HOST', default=''):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        NAME=env('DB_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        USER=env('DB_REPLICA_USER', default=DATABASES['default']['USER']),
+        PASSWORD=env('DB_REPLICA_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        HOST=env('DB_REPLICA_HOST'),
+        PORT=env('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        TEST={'MIRROR': 'default'},  # testy replikou nevytvářejí zvláštní databázi
+    )
+
+DATABASE_ROUTERS = ['apps.projects.db_router.ReplicaRouter']
+
+# Jak dlouho (s) po zápisu se uživateli čte z primární DB místo z repliky (zpoždění replikace)
+DB_REPLICA_LAG_SECONDS = env.int('DB_REPLICA_LAG_SECONDS', default=10)
+
+# Počet procesů pro hashování hesel při hromadném importu uživatelů (1 = bez procesů)
+USER_IMPORT_HASH_WORKERS = env.int('USER_IMPORT_HASH_WORKERS', default=min(4, os.cpu_count() or 1))
+
+# Po kolika requestech worker zaloguje statistiky spojení s DB (0 = nelogovat)
+DB_METRICS_LOG_EVERY = env.int('DB_METRICS_LOG_EVERY', default=500)
+
 # DATABASES = {
 #     'default': {
 #         'ENGINE': 'django.db.backends.sqlite3',
@@ -175,9 +222,80 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CKEDITOR_UPLOAD_PATH = "uploads/"
 
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # nebo 'cache' dle potřeby
+# Jak dlouho (s) drží cache číselníky (roky, učitelé, třídy, aktivní schéma);
+# změny se zneplatňují signály, timeout je pojistka pro více procesů s lokální cache
+# (aktivní schéma je ve sdílené cache 'reference')
+REFERENCE_DATA_TIMEOUT = env.int('REFERENCE_DATA_TIMEOUT', default=300)
+
+# Jak dlouho (s) drží cache připravené podpisy pro dokumenty (klíč obsahuje název souboru)
+SIGNATURE_CACHE_TIMEOUT = env.int('SIGNATURE_CACHE_TIMEOUT', default=24 * 3600)
+
+# Počet projektů na jedné stránce seznamu (keyset stránkování)
+PROJECT_LIST_PAGE_SIZE = env.int('PROJECT_LIST_PAGE_SIZE', default=50)
+
+# Fronta exportů (PDF přehledy se generují workerem: python manage.py export_worker)
+EXPORT_JOBS_ASYNC = env.bool('EXPORT_JOBS_ASYNC', default=False)
+EXPORT_JOBS_ROOT = env('EXPORT_JOBS_ROOT', default=os.path.join(BASE_DIR, 'exports'))
+EXPORT_JOBS_KEEP_DAYS = env.int('EXPORT_JOBS_KEEP_DAYS', default=2)
+
+# Cache vygenerovaných DOCX/PDF exportů (LRU, omezená velikost)
+EXPORT_CACHE_ROOT = env('EXPORT_CACHE_ROOT', default=os.path.join(BASE_DIR, 'export_cache'))
+EXPORT_CACHE_MAX_BYTES = env.int('EXPORT_CACHE_MAX_BYTES', default=200 * 1024 * 1024)
+
+# Doby jednotlivých fází exportů (JSON na řádek, logger apps.projects.timing)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'apps.projects.timing': {
+            'handlers': ['console'],
+            'level': env('EXPORT_TIMING_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+        'apps.projects.db_metrics': {
+            'handlers': ['console'],
+            'level': env('DB_METRICS_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+CACHES = {
+    # Číselníky, podpisy apod. - lokální paměť každého workeru
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Session - soubory na lokálním disku sdílené všemi workery (lokální paměť by
+    # v ostatních workerech držela i session smazanou odhlášením)
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': env('SESSION_CACHE_ROOT', default=os.path.join(BASE_DIR, 'cache', 'sessions')),
+        'OPTIONS': {'MAX_ENTRIES': env.int('SESSION_CACHE_MAX_ENTRIES', default=5000)},
+    },
+    # Krátkodobé úložiště objemných dat (logy importů, hesla), session odkazuje jen ID
+    'transient': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': env('TRANSIENT_STORE_ROOT', default=os.path.join(BASE_DIR, 'cache', 'transient')),
+        'TIMEOUT': env.int('TRANSIENT_STORE_TIMEOUT', default=3600),
+    },
+    # Číselníky, jejichž zastaralá hodnota vadí (aktivní schéma) - soubory sdílené
+    # všemi workery, zneplatnění signálem tak platí hned pro všechny
+    'reference': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': env('REFERENCE_CACHE_ROOT', default=os.path.join(BASE_DIR, 'cache', 'reference')),
+    },
+}
+
+# Session v DB s cache před ní (cached_db) a s limitem velikosti hodnot (apps/projects/sessions.py)
+SESSION_ENGINE = env('SESSION_ENGINE', default='apps.projects.sessions')
+SESSION_CACHE_ALIAS = 'sessions'
 SESSION_COOKIE_AGE = 86400  # 1 den
 SESSION_SAVE_EVERY_REQUEST = False
+# Největší povolená velikost jedné hodnoty v session (bajty JSON)
+SESSION_VALUE_MAX_BYTES = env.int('SESSION_VALUE_MAX_BYTES', default=16 * 1024)
 
 
 customColorPalette = [
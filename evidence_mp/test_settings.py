@@ -0,0 +1,28 @@
+"""
+Nastavení pro lokální testy bez PostgreSQL: primární databáze a replika
+jsou dva SQLite soubory, takže jde vyzkoušet i směrování na repliku.
+
+    python manage.py test --settings=evidence_mp.test_settings
+"""
+import os
+
+# Přihlašovací údaje k PostgreSQL se tu nepoužijí, settings je ale vyžaduje
+for name in ('DB_NAME', 'DB_USER', 'DB_PASSWORD'):
+    os.environ.setdefault(name, '')
+
+from .settings import *  # noqa: E402,F401,F403
+from .settings import BASE_DIR  # noqa: E402
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        # Zvláštní soubor (ne MIRROR) - testy replikaci dělají samy kopií primární databáze
+        'TEST': {'NAME': BASE_DIR / 'test_db_replica.sqlite3'},
+    },
+}